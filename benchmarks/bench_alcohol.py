@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de la corrección de la variable alcohol.
+
+Compara filas/segundo de la implementación original con ``.str``
+de pandas frente a la versión vectorizada con NumPy.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_alcohol.py --filas 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+import settings
+
+
+def medir(funcion, feature: pd.Series, repeticiones: int) -> float:
+    """Devuelve el mejor tiempo en segundos de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(feature)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de la corrección de la variable alcohol"
+    )
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    # Escalamos la columna alcohol del train original
+    alcohol = pd.read_csv(settings.FOLDER_DATA_RAW / settings.TRAIN_FILE, index_col=0)[
+        "alcohol"
+    ]
+    n_copias = int(np.ceil(args.filas / len(alcohol)))
+    feature = pd.concat([alcohol] * n_copias, ignore_index=True).iloc[: args.filas]
+
+    wt = WineDatasetTransformer()
+    original = wt._corregir_valores_alcohol_pandas(feature)
+    vectorizada = wt._corregir_valores_alcohol(feature)
+    assert np.array_equal(original.to_numpy(), vectorizada.to_numpy())
+
+    t_original = medir(wt._corregir_valores_alcohol_pandas, feature, args.repeticiones)
+    t_vectorizada = medir(wt._corregir_valores_alcohol, feature, args.repeticiones)
+
+    print(f"Filas: {len(feature):,}")
+    print(f"Original (pandas .str): {len(feature) / t_original:,.0f} filas/s")
+    print(f"Vectorizada (NumPy):    {len(feature) / t_vectorizada:,.0f} filas/s")
+    print(f"Aceleración: x{t_original / t_vectorizada:.1f}")
+
+
+if __name__ == "__main__":
+    main()
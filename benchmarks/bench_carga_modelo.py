@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de carga de un modelo serializado desde varios procesos.
+
+Entrena un RandomForest (500 árboles por defecto) sobre el dataset de
+train, lo guarda con ``SerializableClassifier.save`` y lo carga a la
+vez desde 1, 4 y 16 procesos, con y sin ``mmap_mode="r"``. Para cada
+caso muestra el tiempo medio de carga y la memoria de cada proceso:
+RSS, PSS (la memoria compartida se reparte entre los procesos que la
+usan) y USS (memoria privada). La suma de PSS es la memoria real que
+ocupan todos los procesos juntos.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_carga_modelo.py --procesos 1 4 16
+"""
+
+import argparse
+import multiprocessing as mp
+from multiprocessing.synchronize import Barrier
+from pathlib import Path
+import tempfile
+import time
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from aidtecsolutions.utils import leer_dataset
+from aidtecsolutions.wrappers import SerializableClassifier
+import settings
+
+
+def memoria_mb() -> dict[str, float]:
+    """RSS, PSS y USS del proceso actual en MB"""
+    campos = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == "kB":
+                campos[partes[0].rstrip(":")] = int(partes[1]) / 1024
+    return {
+        "rss": campos["Rss"],
+        "pss": campos["Pss"],
+        "uss": campos["Private_Clean"] + campos["Private_Dirty"],
+    }
+
+
+def cargar(
+    ruta: Path, mmap_mode: str | None, barrera: Barrier, cola: "mp.Queue[dict]"
+) -> None:
+    barrera.wait()
+    inicio = time.perf_counter()
+    model = SerializableClassifier.load(ruta, mmap_mode=mmap_mode)
+    segundos = time.perf_counter() - inicio
+    cola.put({"segundos": segundos, **memoria_mb()})
+    # Mantiene el modelo cargado hasta que todos hayan medido
+    barrera.wait()
+    del model
+
+
+def medir(ruta: Path, procesos: int, mmap_mode: str | None) -> dict:
+    contexto = mp.get_context("spawn")
+    barrera = contexto.Barrier(procesos)
+    cola: "mp.Queue[dict]" = contexto.Queue()
+    hijos = [
+        contexto.Process(target=cargar, args=(ruta, mmap_mode, barrera, cola))
+        for _ in range(procesos)
+    ]
+    for hijo in hijos:
+        hijo.start()
+    resultados = pd.DataFrame([cola.get() for _ in range(procesos)])
+    for hijo in hijos:
+        hijo.join()
+    return {
+        "procesos": procesos,
+        "mmap_mode": mmap_mode or "-",
+        "carga_media_s": resultados["segundos"].mean(),
+        "rss_mb": resultados["rss"].mean(),
+        "uss_mb": resultados["uss"].mean(),
+        "pss_total_mb": resultados["pss"].sum(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de carga de modelos con y sin mmap"
+    )
+    parser.add_argument("--procesos", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--arboles", type=int, default=500)
+    parser.add_argument("--max_depth", type=int, default=None)
+    parser.add_argument(
+        "--modelo", choices=["randomforest", "xgb"], default="randomforest"
+    )
+    args = parser.parse_args()
+
+    df = leer_dataset(settings.FOLDER_DATA_PROCESSED / "train_processed.csv")
+    X = df.drop(columns=[settings.TARGET_FEATURE])
+    y = df[settings.TARGET_FEATURE].rank(method="dense").astype(int) - 1
+    if args.modelo == "xgb":
+        modelo = XGBClassifier(n_estimators=args.arboles, max_depth=args.max_depth)
+    else:
+        modelo = RandomForestClassifier(
+            n_estimators=args.arboles, max_depth=args.max_depth, random_state=0
+        )
+    model = SerializableClassifier(modelo).fit(X, y)
+
+    filas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = Path(carpeta) / "model.joblib"
+        model.save(ruta)
+        print(f"Tamaño del modelo: {ruta.stat().st_size / 1024**2:.1f} MB")
+        for procesos in args.procesos:
+            for mmap_mode in (None, "r"):
+                filas.append(medir(ruta, procesos, mmap_mode))
+    resultados = pd.DataFrame(filas).set_index(["procesos", "mmap_mode"])
+    print(resultados.round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
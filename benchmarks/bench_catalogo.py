@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de ``is_valid_dataset`` con el catálogo de datasets.
+
+Crea una carpeta temporal con ``--archivos`` datasets vacíos con
+nombres como los de build_features y compara la búsqueda anterior,
+que listaba la carpeta entera, con la búsqueda en el catálogo.
+Mide también ``sincronizar``, que registra toda la carpeta de una vez,
+y una consulta por prefijo y flags.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_catalogo.py --archivos 50000
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+from typing import Any, Callable
+
+from aidtecsolutions.catalogo import CatalogoDatasets
+from aidtecsolutions.utils import is_valid_dataset
+
+FLAGS = ["corregir_alcohol", "corregir_densidad", "ratio_diox", "rbf_diox", "shuffle"]
+
+
+def medir(funcion: Callable[[], Any], repeticiones: int) -> float:
+    """Mejor tiempo de ``repeticiones`` llamadas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def is_valid_dataset_anterior(file_name: str, folder: Path) -> bool:
+    lista_archivos = [archivo.name for archivo in folder.iterdir()]
+    return file_name in lista_archivos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de is_valid_dataset con el catálogo de datasets"
+    )
+    parser.add_argument("--archivos", type=int, default=50_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        carpeta = Path(directorio)
+        for n in range(args.archivos):
+            flags = [flag for i, flag in enumerate(FLAGS) if n >> i & 1]
+            (carpeta / "-".join([f"train_{n // 32}.csv", *flags, "x.csv"])).touch()
+        buscado = "-".join(["train_0.csv", *FLAGS, "x.csv"])
+
+        with CatalogoDatasets(carpeta) as catalogo:
+            inicio = time.perf_counter()
+            catalogo.sincronizar()
+            sincronizar = time.perf_counter() - inicio
+            consulta = medir(
+                lambda: catalogo.consultar("train_1.csv", ["shuffle"]),
+                args.repeticiones,
+            )
+
+        anterior = medir(
+            lambda: is_valid_dataset_anterior(buscado, carpeta), args.repeticiones
+        )
+        nuevo = medir(lambda: is_valid_dataset(buscado, carpeta), args.repeticiones)
+        print(f"{args.archivos:,} archivos")
+        print(f"is_valid_dataset listando la carpeta: {anterior * 1000:8.3f} ms")
+        print(f"is_valid_dataset con el catálogo:     {nuevo * 1000:8.3f} ms")
+        print(f"speedup: {anterior / nuevo:.0f}x")
+        print(f"sincronizar el catálogo: {sincronizar:.2f} s")
+        print(f"consulta por prefijo y flags: {consulta * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
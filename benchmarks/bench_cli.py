@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark del arranque de los subcomandos de ``aidtec``.
+
+Lanza ``aidtec <subcomando> --help`` con ``python -X importtime`` y
+muestra los milisegundos de importación de cada subcomando, sin contar
+los módulos que el intérprete importa al arrancar, y los tres módulos
+más lentos. Con ``--presupuesto`` termina con error si algún
+subcomando lo supera. Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_cli.py --repeticiones 5
+"""
+
+import argparse
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from aidtecsolutions.cli import COMANDOS
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+
+def importaciones(*argumentos: str) -> dict[str, int]:
+    """Lanza python con -X importtime y devuelve los
+    microsegundos propios de cada módulo importado"""
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = os.pathsep.join([str(RAIZ), str(RAIZ / "src")])
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", *argumentos],
+        capture_output=True,
+        text=True,
+        cwd=RAIZ,
+        env=entorno,
+    )
+    modulos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _, nombre = linea.removeprefix("import time:").split("|")
+        modulos[nombre.strip()] = int(propio)
+    return modulos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de las importaciones de cada subcomando de aidtec"
+    )
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument(
+        "--presupuesto",
+        type=float,
+        default=None,
+        help="Milisegundos máximos por subcomando",
+    )
+    args = parser.parse_args()
+
+    arranque = importaciones("-c", "pass")
+    superados = []
+    print(f"{'subcomando':>10} {'ms':>8}  módulos más lentos")
+    for comando in COMANDOS:
+        mejor: dict[str, int] = {}
+        for _ in range(args.repeticiones):
+            modulos = importaciones("-m", "aidtecsolutions.cli", comando, "--help")
+            propios = {m: t for m, t in modulos.items() if m not in arranque}
+            if not mejor or sum(propios.values()) < sum(mejor.values()):
+                mejor = propios
+        total = sum(mejor.values()) / 1000
+        lentos = sorted(mejor, key=mejor.__getitem__, reverse=True)[:3]
+        print(f"{comando:>10} {total:>8.1f}  {', '.join(lentos)}")
+        if args.presupuesto is not None and total > args.presupuesto:
+            superados.append(comando)
+
+    if superados:
+        sys.exit(f"Superan {args.presupuesto} ms: {', '.join(superados)}")
+
+
+if __name__ == "__main__":
+    main()
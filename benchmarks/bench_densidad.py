@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de la corrección de la variable densidad.
+
+Compara filas/segundo del ``apply`` original, que divide por 10
+en un bucle ``while`` valor a valor, frente a la versión vectorizada.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_densidad.py --filas 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+
+
+def dividir_por_diez(valor: float) -> float:
+    """Implementación original de la corrección"""
+    while valor >= 10:
+        valor /= 10
+    return valor
+
+
+def corregir_densidad_original(feature: pd.Series) -> pd.Series:
+    feature_ = feature.copy()
+    feature_malos = feature_[feature_ > 2]
+    feature_[feature_malos.index] = feature_malos.apply(dividir_por_diez)
+    return feature_
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de la corrección de la variable densidad"
+    )
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument(
+        "--malos", type=float, default=0.5, help="Proporción de densidades erróneas"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    valores = rng.uniform(0.98, 1.01, args.filas)
+    malos = rng.random(args.filas) < args.malos
+    valores[malos] *= 10.0 ** rng.integers(1, 6, malos.sum())
+    feature = pd.Series(valores, name="densidad")
+
+    wt = WineDatasetTransformer()
+    inicio = time.perf_counter()
+    original = corregir_densidad_original(feature)
+    t_original = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    vectorizada = wt._corregir_valores_densidad(feature)
+    t_vectorizada = time.perf_counter() - inicio
+    assert np.array_equal(original.to_numpy(), vectorizada.to_numpy())
+
+    print(f"Filas: {len(feature):,} ({args.malos:.0%} erróneas)")
+    print(f"Original (apply + while): {len(feature) / t_original:,.0f} filas/s")
+    print(f"Vectorizada (NumPy):      {len(feature) / t_vectorizada:,.0f} filas/s")
+    print(f"Aceleración: x{t_original / t_vectorizada:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark del formato nativo de xgboost frente a pickle.
+
+Entrena un ``XGBClassifier`` sobre el dataset de train y lo guarda con
+joblib (pickle del wrapper) y con el formato nativo UBJSON más su
+manifiesto. Muestra el tamaño de cada artefacto y el tiempo de carga
+en frío, en un proceso nuevo cada vez y sin contar los imports.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_formato_modelo.py --arboles 500
+"""
+
+import argparse
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+from xgboost import XGBClassifier
+
+from aidtecsolutions.utils import leer_dataset
+from aidtecsolutions.wrappers import SerializableClassifier
+import settings
+
+CARGA = """
+import sys, time
+import xgboost
+from aidtecsolutions.wrappers import SerializableClassifier
+inicio = time.perf_counter()
+SerializableClassifier.load(sys.argv[1])
+print(time.perf_counter() - inicio)
+"""
+
+
+def carga_en_frio(ruta: Path, repeticiones: int) -> float:
+    """Mediana en segundos de cargar el modelo en procesos nuevos"""
+    tiempos = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", CARGA, str(ruta)],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for _ in range(repeticiones)
+    ]
+    return float(np.median(tiempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark del formato nativo de xgboost frente a pickle"
+    )
+    parser.add_argument("--arboles", type=int, default=500)
+    parser.add_argument("--max_depth", type=int, default=6)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    df = leer_dataset(settings.FOLDER_DATA_PROCESSED / "train_processed.csv")
+    X = df.drop(columns=[settings.TARGET_FEATURE])
+    y = df[settings.TARGET_FEATURE].rank(method="dense").astype(int) - 1
+    model = SerializableClassifier(
+        XGBClassifier(n_estimators=args.arboles, max_depth=args.max_depth)
+    ).fit(X, y)
+
+    print(f"{'formato':>8} {'tamaño (MB)':>12} {'carga en frío (ms)':>19}")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_pickle = Path(carpeta) / "model.joblib"
+        joblib.dump(model, ruta_pickle)
+        ruta_nativa = model.save(Path(carpeta) / "model_nativo.joblib")
+        for formato, rutas in (
+            ("pickle", [ruta_pickle]),
+            ("ubj", [ruta_nativa, ruta_nativa.with_suffix(".json")]),
+        ):
+            tamano = sum(ruta.stat().st_size for ruta in rutas) / 1024**2
+            carga = carga_en_frio(rutas[0], args.repeticiones) * 1000
+            print(f"{formato:>8} {tamano:>12.2f} {carga:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark del tiempo de carga de un dataset en csv, parquet y feather.
+
+Escala ``data/raw/train.csv`` (100 veces por defecto), lo guarda en
+cada formato en una carpeta temporal y mide ``leer_dataset``.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_formatos.py --escala 100
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import pandas as pd
+
+from aidtecsolutions.utils import guardar_dataset, leer_dataset
+import settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de carga de datasets en csv, parquet y feather"
+    )
+    parser.add_argument("--escala", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    df = leer_dataset(settings.FOLDER_DATA_RAW / settings.TRAIN_FILE)
+    df = pd.concat([df] * args.escala, ignore_index=True)
+    df.index.name = "muestra_id"
+    for col in settings.CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype("category")
+    print(f"Filas: {len(df):,}")
+    print(f"{'formato':>9} {'tamaño (MB)':>12} {'carga (s)':>10}")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for formato in settings.DATASET_FORMATS:
+            ruta = Path(carpeta) / f"train{formato}"
+            guardar_dataset(df, ruta)
+            tiempos = []
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                leer_dataset(ruta)
+                tiempos.append(time.perf_counter() - inicio)
+            tamano = ruta.stat().st_size / 1e6
+            print(f"{formato:>9} {tamano:>12.1f} {min(tiempos):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
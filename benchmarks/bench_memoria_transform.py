@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark del pico de memoria de ``WineDatasetTransformer.transform``.
+
+Cada configuración se mide en un proceso nuevo: genera el dataset
+sintético, ajusta el transformer, pone a cero el pico de RSS del
+proceso (``/proc/self/clear_refs``) y transforma. Muestra el pico de
+RSS durante ``transform`` por encima del RSS de partida, en MB y en
+veces el tamaño del dataset de entrada.
+
+Solo funciona en Linux. Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_memoria_transform.py --filas 2000000
+"""
+
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+import time
+from typing import Any
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from sintetico import generar_dataset
+
+# Pipeline completo y pipeline sin los pasos que crean un DataFrame nuevo
+CONFIGURACIONES: dict[str, dict[str, Any]] = {
+    "completo": dict(remove_outliers=True, standardize=True, shuffle=True),
+    "solo_filas": dict(shuffle=False),
+}
+
+
+def memoria_mb(campo: str) -> float:
+    for linea in Path("/proc/self/status").read_text().splitlines():
+        if linea.startswith(campo):
+            return int(linea.split()[1]) / 1024
+    raise RuntimeError(f"No se encuentra {campo} en /proc/self/status")
+
+
+def medir(
+    filas: int, parametros: dict[str, Any], copy: bool, cola: "mp.Queue[Any]"
+) -> None:
+    df = generar_dataset(filas)
+    tamano = df.memory_usage(deep=True).sum() / 1024**2
+    wt = WineDatasetTransformer(**parametros).fit(df.head(100_000))
+    if "copy" in wt.get_params():
+        wt.set_params(copy=copy)
+
+    # Ponemos a cero el pico (VmHWM) para medir solo transform
+    Path("/proc/self/clear_refs").write_text("5")
+    rss_inicial = memoria_mb("VmRSS")
+    inicio = time.perf_counter()
+    wt.transform(df)
+    segundos = time.perf_counter() - inicio
+    cola.put((tamano, memoria_mb("VmHWM") - rss_inicial, segundos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark del pico de memoria de transform"
+    )
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    contexto = mp.get_context("spawn")
+    print(
+        f"{'configuración':>14} {'copy':>6} {'entrada (MB)':>13} "
+        f"{'pico (MB)':>10} {'pico/entrada':>13} {'segundos':>9}"
+    )
+    for nombre, parametros in CONFIGURACIONES.items():
+        for copy in (True, False):
+            cola = contexto.Queue()
+            proceso = contexto.Process(
+                target=medir, args=(args.filas, parametros, copy, cola)
+            )
+            proceso.start()
+            tamano, pico, segundos = cola.get()
+            proceso.join()
+            print(
+                f"{nombre:>14} {str(copy):>6} {tamano:>13.0f} {pico:>10.0f} "
+                f"{pico / tamano:>12.2f}x {segundos:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
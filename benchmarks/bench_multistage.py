@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de ``MultiStageClassifier.predict``.
+
+Entrena un ``MultiStageClassifier`` con tres RandomForest sobre el dataset
+de train y compara sobre 1M de filas la predicción anterior (los dos
+modelos de la segunda etapa sobre todas las filas y ``np.where``) con
+la predicción enrutada, en un hilo y con ``n_jobs=2``.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_multistage.py --filas 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from aidtecsolutions.models.custom_models import MultiStageClassifier
+from aidtecsolutions.utils import leer_dataset
+import settings
+
+
+def predecir_todas_las_filas(modelo: MultiStageClassifier, X: np.ndarray) -> np.ndarray:
+    """Predicción de antes: los dos modelos en todas las filas"""
+    return np.where(
+        modelo.model_stage1_.predict(X),
+        modelo.clases_extreme_[modelo.model_extreme_.predict(X)],
+        modelo.clases_middle_[modelo.model_middle_.predict(X)],
+    )
+
+
+def cronometrar(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de la predicción de MultiStageClassifier"
+    )
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--arboles", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    df = leer_dataset(settings.FOLDER_DATA_PROCESSED / "train_processed.csv")
+    X_train = df.drop(columns=[settings.TARGET_FEATURE]).to_numpy()
+    y_train = df[settings.TARGET_FEATURE].to_numpy()
+
+    def bosque() -> RandomForestClassifier:
+        return RandomForestClassifier(
+            n_estimators=args.arboles, max_depth=12, random_state=0
+        )
+
+    modelo = MultiStageClassifier(bosque(), bosque(), bosque()).fit(X_train, y_train)
+
+    rng = np.random.default_rng(42)
+    X = X_train[rng.integers(0, len(X_train), args.filas)]
+    print(f"Filas: {len(X):,}, extremos: {modelo.model_stage1_.predict(X).mean():.1%}")
+
+    t_antes = cronometrar(
+        lambda: predecir_todas_las_filas(modelo, X), args.repeticiones
+    )
+    modelo.n_jobs = None
+    t_enrutado = cronometrar(lambda: modelo.predict(X), args.repeticiones)
+    modelo.n_jobs = 2
+    t_hilos = cronometrar(lambda: modelo.predict(X), args.repeticiones)
+
+    print(f"{'predict':>22} {'segundos':>9} {'speedup':>8}")
+    for nombre, segundos in (
+        ("todas las filas", t_antes),
+        ("enrutado", t_enrutado),
+        ("enrutado n_jobs=2", t_hilos),
+    ):
+        print(f"{nombre:>22} {segundos:>9.2f} {t_antes / segundos:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
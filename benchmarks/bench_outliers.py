@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de la detección de outliers fuera de memoria.
+
+Genera el dataset sintético por bloques, sin tenerlo nunca entero en
+memoria, y mide por separado:
+
+- el ajuste: muestreo de reservorio de ``max_muestras_outliers`` filas
+  sobre todos los bloques y ajuste del IsolationForest con la muestra;
+- la puntuación: ``_predecir_outliers`` de cada bloque con el umbral
+  guardado en el ajuste.
+
+No cuenta el tiempo de generar los bloques ni de crear sus features.
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_outliers.py --filas 10000000
+"""
+
+import argparse
+import time
+from typing import Iterator
+
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import (
+    WineDatasetTransformer,
+    _muestreo_reservorio,
+)
+from sintetico import generar_dataset
+
+
+def bloques_features(
+    wt: WineDatasetTransformer, filas: int, bloque: int, preparacion: list[float]
+) -> Iterator[pd.DataFrame]:
+    """Genera los bloques con sus features y apunta en
+    ``preparacion`` los segundos que cuesta cada uno"""
+    for semilla, inicio in enumerate(range(0, filas, bloque)):
+        empieza = time.perf_counter()
+        X_ = wt._crear_features(generar_dataset(min(bloque, filas - inicio), semilla))
+        preparacion.append(time.perf_counter() - empieza)
+        yield X_
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark del ajuste y la puntuación de outliers por bloques"
+    )
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--bloque", type=int, default=1_000_000)
+    parser.add_argument("--max_muestras", type=int, default=100_000)
+    parser.add_argument("--max_samples", default="auto")
+    parser.add_argument("--n_jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    max_samples = args.max_samples
+    if max_samples != "auto":
+        max_samples = float(max_samples) if "." in max_samples else int(max_samples)
+    wt = WineDatasetTransformer(
+        remove_outliers=True,
+        outliers_max_samples=max_samples,
+        outliers_n_jobs=args.n_jobs,
+    ).fit(generar_dataset(10_000))
+    wt.max_muestras_outliers = args.max_muestras
+
+    preparacion: list[float] = []
+    inicio = time.perf_counter()
+    muestra = _muestreo_reservorio(
+        bloques_features(wt, args.filas, args.bloque, preparacion),
+        wt.max_muestras_outliers,
+    )
+    muestreo = time.perf_counter() - inicio - sum(preparacion)
+    inicio = time.perf_counter()
+    wt._ajustar_isolation_forest(muestra)
+    ajuste = time.perf_counter() - inicio
+    print(
+        f"Ajuste sobre {args.filas:,} filas: muestreo {muestreo:.2f} s "
+        f"({args.filas / muestreo:,.0f} filas/s), IsolationForest con "
+        f"{len(muestra):,} filas {ajuste:.2f} s"
+    )
+
+    puntuacion = 0.0
+    outliers = 0
+    for X_ in bloques_features(wt, args.filas, args.bloque, []):
+        inicio = time.perf_counter()
+        outliers += int((wt._predecir_outliers(X_) == -1).sum())
+        puntuacion += time.perf_counter() - inicio
+    print(
+        f"Puntuación de {args.filas:,} filas: {puntuacion:.2f} s "
+        f"({args.filas / puntuacion:,.0f} filas/s), {outliers:,} outliers "
+        f"con umbral {wt.umbral_outliers_:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
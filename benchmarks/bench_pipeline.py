@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Suite de benchmarks de todo el pipeline.
+
+Genera un dataset sintético con ``sintetico.py`` (hasta 10M de filas)
+y mide:
+
+- cada paso de ``WineDatasetTransformer.transform``, como la diferencia
+  entre transformar con el paso y sin él, y el ``fit_transform`` completo
+- la cross validation de cada tipo de modelo con ``validar_cv``
+- el guardado y la carga de cada modelo
+- la predicción por lotes de todas las filas
+
+Los tiempos se guardan en un json con el commit y las versiones, y se
+pueden comparar dos json para detectar regresiones: el script termina
+con código 1 si algún tiempo empeora más que el umbral.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_pipeline.py ejecutar \\
+        --filas 1000000 --salida reports/benchmarks/actual.json \\
+        --base reports/benchmarks/base.json
+    $ PYTHONPATH=.:src python benchmarks/bench_pipeline.py comparar \\
+        reports/benchmarks/base.json reports/benchmarks/actual.json
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+import xgboost
+from xgboost import XGBClassifier
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from aidtecsolutions.models.custom_models import MultiStageClassifier
+from aidtecsolutions.models.validacion import validar_cv
+from aidtecsolutions.wrappers import SerializableClassifier
+from sintetico import generar_dataset
+import settings
+
+# Todos los pasos opcionales desactivados: solo se binariza el color
+SIN_PASOS: dict[str, Any] = dict(
+    corregir_alcohol=False,
+    corregir_densidad=False,
+    color_interactions=False,
+    densidad_alcohol_interaction=False,
+    ratio_diox=False,
+    rbf_diox=False,
+    shuffle=False,
+)
+
+# Paso -> (parámetros que necesita antes, parámetros del paso)
+PASOS: dict[str, tuple[dict[str, Any], dict[str, Any]]] = {
+    "corregir_alcohol": ({}, dict(corregir_alcohol=True)),
+    "corregir_densidad": ({}, dict(corregir_densidad=True)),
+    "color_interactions": ({}, dict(color_interactions=True)),
+    "densidad_alcohol_interaction": (
+        dict(corregir_alcohol=True),
+        dict(densidad_alcohol_interaction=True),
+    ),
+    "ratio_diox": ({}, dict(ratio_diox=True)),
+    "rbf_diox": ({}, dict(rbf_diox=True)),
+    "remove_outliers": (dict(corregir_alcohol=True), dict(remove_outliers=True)),
+    "standardize": ({}, dict(standardize=True)),
+    "log_transformation": ({}, dict(log_transformation=["cloruros", "sulfatos"])),
+    "drop_columns": ({}, dict(drop_columns=["year"])),
+    "shuffle": ({}, dict(shuffle=True)),
+}
+
+# Pipeline completo con el que se entrenan y evalúan los modelos
+PIPELINE: dict[str, Any] = dict(remove_outliers=True, standardize=True)
+
+
+def modelos() -> dict[str, Any]:
+    """Un modelo de cada tipo con pocos árboles"""
+    return {
+        "xgb": XGBClassifier(n_estimators=50, tree_method="hist"),
+        "randomforest": RandomForestClassifier(n_estimators=50, n_jobs=-1),
+        "multistage": MultiStageClassifier(
+            XGBClassifier(n_estimators=50, tree_method="hist"),
+            XGBClassifier(n_estimators=50, tree_method="hist"),
+            XGBClassifier(n_estimators=50, tree_method="hist"),
+            n_jobs=3,
+            limite_inferior=2,
+            limite_superior=4,
+        ),
+    }
+
+
+def medir(funcion: Callable[[], Any], repeticiones: int) -> float:
+    """Mejor tiempo en segundos de ``repeticiones`` llamadas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def medir_transformer(
+    df: pd.DataFrame, repeticiones: int
+) -> tuple[dict[str, float], pd.DataFrame]:
+    """Mide cada paso del transformer y el pipeline completo.
+    Devuelve los tiempos y el dataset transformado con el pipeline"""
+    tiempos: dict[str, float] = {}
+
+    def transformar(parametros: dict[str, Any]) -> float:
+        wt = WineDatasetTransformer(**{**SIN_PASOS, **parametros}).fit(df)
+        return medir(lambda: wt.transform(df), repeticiones)
+
+    base: dict[str, float] = {}
+    for paso, (previos, parametros) in PASOS.items():
+        clave = json.dumps(previos, sort_keys=True)
+        if clave not in base:
+            base[clave] = transformar(previos)
+        tiempos[f"transform/{paso}"] = (
+            transformar({**previos, **parametros}) - base[clave]
+        )
+    tiempos["transform/sin_pasos"] = base[json.dumps({})]
+
+    wt = WineDatasetTransformer(**PIPELINE)
+    tiempos["transformer/fit_transform"] = medir(
+        lambda: WineDatasetTransformer(**PIPELINE).fit_transform(df), repeticiones
+    )
+    transformado = wt.fit_transform(df)
+    tiempos["transformer/transform"] = medir(lambda: wt.transform(df), repeticiones)
+    return tiempos, transformado
+
+
+def medir_modelos(
+    df: pd.DataFrame, filas_cv: int, repeticiones: int
+) -> dict[str, float]:
+    """Cross validation, guardado, carga y predicción de cada modelo"""
+    tiempos: dict[str, float] = {}
+    X = df.drop(columns=[settings.TARGET_FEATURE])
+    y = LabelEncoder().fit_transform(df[settings.TARGET_FEATURE])
+    X_cv, y_cv = X.iloc[:filas_cv], y[:filas_cv]
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, clasificador in modelos().items():
+            modelo = SerializableClassifier(clasificador)
+            resultado = validar_cv(modelo, X_cv, y_cv)
+            tiempos[f"cv/{nombre}"] = float(
+                resultado.tiempos_fit.sum() + resultado.tiempos_predict.sum()
+            )
+
+            modelo.fit(X_cv, y_cv)
+            ruta = Path(carpeta) / f"{nombre}.joblib"
+            tiempos[f"guardar/{nombre}"] = medir(
+                lambda: modelo.save(ruta), repeticiones
+            )
+            ruta = modelo.save(ruta)
+            tiempos[f"cargar/{nombre}"] = medir(
+                lambda: SerializableClassifier.load(ruta), repeticiones
+            )
+            tiempos[f"predecir/{nombre}"] = medir(
+                lambda: modelo.predict(X), repeticiones
+            )
+    return tiempos
+
+
+def version_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(args: argparse.Namespace) -> int:
+    inicio = time.perf_counter()
+    df = generar_dataset(args.filas, args.semilla)
+    segundos_generar = time.perf_counter() - inicio
+    print(f"Generadas {len(df):,} filas en {segundos_generar:.1f}s")
+
+    tiempos, transformado = medir_transformer(df, args.repeticiones)
+    del df
+    filas_cv = min(args.filas_cv, len(transformado))
+    tiempos.update(medir_modelos(transformado, filas_cv, args.repeticiones))
+
+    resultados = {
+        "metadatos": {
+            "commit": version_commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "filas": args.filas,
+            "filas_cv": filas_cv,
+            "repeticiones": args.repeticiones,
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "versiones": {
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "sklearn": sklearn.__version__,
+                "xgboost": xgboost.__version__,
+            },
+        },
+        "tiempos": tiempos,
+    }
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    args.salida.write_text(json.dumps(resultados, indent=2))
+
+    print(f"{'medida':>40} {'segundos':>9}")
+    for nombre, segundos in tiempos.items():
+        print(f"{nombre:>40} {segundos:>9.3f}")
+    print(f"Guardados resultados en {args.salida}")
+
+    if args.base is None:
+        return 0
+    return comparar(
+        json.loads(args.base.read_text()), resultados, args.umbral, args.minimo
+    )
+
+
+def comparar(
+    base: dict[str, Any], actual: dict[str, Any], umbral: float, minimo: float
+) -> int:
+    """Compara los tiempos de dos ejecuciones. Una medida es una
+    regresión si empeora más de ``umbral`` (en tanto por uno) y más
+    de ``minimo`` segundos, para no saltar con el ruido de las medidas
+    muy cortas. Devuelve 1 si hay alguna regresión"""
+    for clave in ("filas", "filas_cv"):
+        if base["metadatos"][clave] != actual["metadatos"][clave]:
+            print(f"Aviso: las ejecuciones tienen distinto número de {clave}")
+
+    regresiones = []
+    print(f"{'medida':>40} {'base':>9} {'actual':>9} {'cambio':>8}")
+    for nombre, segundos in actual["tiempos"].items():
+        segundos_base = base["tiempos"].get(nombre)
+        if segundos_base is None:
+            continue
+        cambio = segundos / segundos_base - 1 if segundos_base > 0 else 0.0
+        marca = ""
+        if cambio > umbral and segundos - segundos_base > minimo:
+            regresiones.append(nombre)
+            marca = " <- regresión"
+        print(
+            f"{nombre:>40} {segundos_base:>9.3f} {segundos:>9.3f} "
+            f"{cambio:>+8.1%}{marca}"
+        )
+
+    if regresiones:
+        print(f"{len(regresiones)} regresiones de más del {umbral:.0%}")
+        return 1
+    print(f"Sin regresiones de más del {umbral:.0%}")
+    return 0
+
+
+def setup_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks de todo el pipeline")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    ejecutar_parser = subparsers.add_parser(
+        "ejecutar", help="Ejecuta la suite y guarda los tiempos en json"
+    )
+    ejecutar_parser.add_argument("--filas", type=int, default=1_000_000)
+    ejecutar_parser.add_argument(
+        "--filas_cv",
+        type=int,
+        default=100_000,
+        help="Filas con las que se hace la cross validation y se entrenan \
+            los modelos. La predicción usa todas las filas",
+    )
+    ejecutar_parser.add_argument("--semilla", type=int, default=42)
+    ejecutar_parser.add_argument("--repeticiones", type=int, default=3)
+    ejecutar_parser.add_argument(
+        "--salida",
+        type=Path,
+        default=settings.FOLDER_REPORTS / "benchmarks" / "actual.json",
+    )
+    ejecutar_parser.add_argument(
+        "--base", type=Path, default=None, help="json con el que comparar"
+    )
+
+    comparar_parser = subparsers.add_parser(
+        "comparar", help="Compara los tiempos de dos json"
+    )
+    comparar_parser.add_argument("base", type=Path)
+    comparar_parser.add_argument("actual", type=Path)
+
+    for subparser in (ejecutar_parser, comparar_parser):
+        subparser.add_argument(
+            "--umbral",
+            type=float,
+            default=0.2,
+            help="Empeoramiento máximo permitido en tanto por uno",
+        )
+        subparser.add_argument(
+            "--minimo",
+            type=float,
+            default=0.01,
+            help="Segundos que tiene que empeorar una medida para ser regresión",
+        )
+    return parser
+
+
+def main() -> None:
+    args = setup_parser().parse_args()
+    if args.comando == "ejecutar":
+        sys.exit(ejecutar(args))
+    sys.exit(
+        comparar(
+            json.loads(args.base.read_text()),
+            json.loads(args.actual.read_text()),
+            args.umbral,
+            args.minimo,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
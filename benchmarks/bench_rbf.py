@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de las similitudes rbf del dioxido de azufre total.
+
+Compara la implementación anterior, un ``FunctionTransformer`` con
+``rbf_kernel`` por cada centro, con el bloque vectorizado de
+``WineDatasetTransformer`` que calcula todos los centros en una sola
+pasada. Comprueba que los resultados coinciden y mide también el
+ajuste de los centros y gammas con ``rbf_centros="kde"``.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_rbf.py --filas 1000000 10000000
+"""
+
+import argparse
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import rbf_kernel
+from sklearn.preprocessing import FunctionTransformer
+
+from aidtecsolutions.features.custom_transformers import (
+    RBF_CENTROS,
+    RBF_GAMMAS,
+    WineDatasetTransformer,
+)
+from sintetico import generar_dataset
+
+COLUMNA = "dioxido de azufre total"
+
+
+def medir(funcion: Callable[[], Any], repeticiones: int) -> float:
+    """Mejor tiempo de ``repeticiones`` llamadas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def rbf_anterior(X: pd.DataFrame) -> np.ndarray:
+    """Similitudes calculadas como antes de vectorizarlas"""
+    transformers = [
+        FunctionTransformer(rbf_kernel, kw_args=dict(Y=[[centro]], gamma=gamma))
+        for centro, gamma in zip(RBF_CENTROS, RBF_GAMMAS)
+    ]
+    diox = X[[COLUMNA]]
+    return np.vstack([t.transform(diox)[:, 0] for t in transformers])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de las similitudes rbf del dioxido de azufre"
+    )
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'filas':>11} {'anterior (s)':>13} {'vectorizado (s)':>16} {'speedup':>8}")
+    for filas in args.filas:
+        df = generar_dataset(filas)
+        wt = WineDatasetTransformer().fit(df.head(1000))
+        destino = np.empty((len(RBF_CENTROS), len(df)))
+
+        wt._paso_rbf_diox(df, destino=destino)
+        np.testing.assert_allclose(destino, rbf_anterior(df), rtol=1e-12)
+        anterior = medir(lambda: rbf_anterior(df), args.repeticiones)
+        vectorizado = medir(
+            lambda: wt._paso_rbf_diox(df, destino=destino), args.repeticiones
+        )
+        print(
+            f"{filas:>11,} {anterior:>13.4f} {vectorizado:>16.4f} "
+            f"{anterior / vectorizado:>7.2f}x"
+        )
+
+    kde = WineDatasetTransformer(rbf_centros="kde")
+    segundos = medir(lambda: kde._ajustar_rbf(lambda: df[COLUMNA]), 1)
+    print(
+        f"Ajuste de las rbf con rbf_centros='kde' "
+        f"({kde.max_muestras_kde:,} muestras): "
+        f"{segundos:.2f} s, centros {np.round(kde.rbf_centros_, 1)}, "
+        f"gammas {kde.rbf_gammas_}"
+    )
+
+
+if __name__ == "__main__":
+    main()
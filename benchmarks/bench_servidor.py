@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generador de carga para el servidor de predicciones.
+
+Lanza peticiones concurrentes con filas del dataset de test contra
+un ``serve_model.py`` en marcha y muestra la latencia p50/p99 vista
+por los clientes, el throughput y las métricas del propio servidor.
+
+Uso desde la raíz del proyecto, con el servidor arrancado:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_servidor.py --clientes 16 --filas 1
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+import settings
+
+
+def cliente(url: str, cuerpos: list[str], peticiones: int) -> list[float]:
+    """Envía ``peticiones`` peticiones y devuelve la latencia de cada una"""
+    latencias = []
+    with requests.Session() as sesion:
+        for i in range(peticiones):
+            inicio = time.perf_counter()
+            respuesta = sesion.post(
+                url,
+                data=cuerpos[i % len(cuerpos)],
+                headers={"Content-Type": "application/json"},
+            )
+            respuesta.raise_for_status()
+            latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generador de carga para el servidor de predicciones"
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--filas", type=int, default=1, help="Filas por petición")
+    parser.add_argument(
+        "--datos",
+        default=str(settings.FOLDER_DATA_RAW / settings.TEST_FILE),
+        help="Dataset del que se sacan las filas. Tiene que estar en el formato \
+            que espera el servidor: sin transformar si se arrancó con \
+                --transformer y transformado si no",
+    )
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.datos, index_col=0, dtype=settings.RAW_DTYPES)
+    df = df.drop(columns=[settings.TARGET_FEATURE], errors="ignore")
+    cuerpos = [
+        json.dumps({"filas": json.loads(lote.to_json(orient="records"))})
+        for lote in (
+            df.sample(args.filas, random_state=semilla) for semilla in range(100)
+        )
+    ]
+
+    url = args.url.rstrip("/")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clientes) as pool:
+        resultados = pool.map(
+            lambda _: cliente(f"{url}/predict", cuerpos, args.peticiones),
+            range(args.clientes),
+        )
+        latencias = np.concatenate([np.array(r) for r in resultados]) * 1000
+    segundos = time.perf_counter() - inicio
+
+    total = args.clientes * args.peticiones
+    print(f"Clientes: {args.clientes}, filas por petición: {args.filas}")
+    print(f"Peticiones: {total} en {segundos:.2f}s")
+    print(f"Latencia cliente p50: {np.percentile(latencias, 50):.2f} ms")
+    print(f"Latencia cliente p99: {np.percentile(latencias, 99):.2f} ms")
+    print(f"Throughput: {total / segundos:.0f} peticiones/s")
+    print(f"Throughput: {total * args.filas / segundos:.0f} filas/s")
+    print("Métricas del servidor:")
+    print(json.dumps(requests.get(f"{url}/metricas").json(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de la latencia por llamada de ``WineDatasetTransformer.transform``.
+
+Compara ``transform`` sobre un transformer ya ajustado frente a
+reajustar en cada llamada (``fit_transform``, que es lo que hacía
+``transform`` antes) con lotes de 1, 100 y 100.000 filas.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_transform_latencia.py
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+import settings
+
+
+def latencia_ms(funcion, lote: pd.DataFrame, repeticiones: int) -> float:
+    """Devuelve la mediana en milisegundos de varias llamadas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(lote)
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos)) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de la latencia por llamada de transform"
+    )
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1, 100, 100_000])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    df = pd.read_csv(settings.FOLDER_DATA_RAW / settings.TRAIN_FILE, index_col=0)
+    parametros = dict(
+        corregir_alcohol=True,
+        corregir_densidad=True,
+        remove_outliers=True,
+        standardize=True,
+        shuffle=False,
+    )
+    wt = WineDatasetTransformer(**parametros).fit(df)
+
+    print(f"{'filas':>8} {'transform (ms)':>15} {'reajustando (ms)':>17}")
+    for tamano in args.tamanos:
+        lote = df.sample(tamano, replace=tamano > len(df), random_state=42)
+        repeticiones = max(1, args.repeticiones // max(1, tamano // 10_000))
+        t_transform = latencia_ms(wt.transform, lote, repeticiones)
+        t_reajuste = latencia_ms(
+            WineDatasetTransformer(**parametros).fit_transform, lote, repeticiones
+        )
+        print(f"{tamano:>8} {t_transform:>15.2f} {t_reajuste:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
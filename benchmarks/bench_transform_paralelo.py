@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark de escalado de ``WineDatasetTransformer.transform`` con ``n_jobs``.
+
+Genera el dataset sintético, ajusta el transformer con las primeras
+100.000 filas y mide ``transform`` con cada número de jobs. Comprueba
+que el resultado es idéntico al de ``n_jobs=None`` y muestra el
+speedup respecto a la ejecución en serie. Con ``--backend loky`` las
+particiones se transforman en procesos en lugar de hilos.
+
+Un dataset de 50 millones de filas ocupa unos 10 GB en memoria y la
+salida otro tanto. Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/bench_transform_paralelo.py \\
+        --filas 50000000 --jobs 1 2 4 8 16 32
+"""
+
+import argparse
+from contextlib import nullcontext
+import os
+import time
+
+from joblib import parallel_config
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from sintetico import generar_dataset
+
+PARAMETROS = dict(
+    corregir_alcohol=True,
+    corregir_densidad=True,
+    remove_outliers=True,
+    standardize=True,
+    shuffle=False,
+)
+
+
+def medir(
+    wt: WineDatasetTransformer, df: pd.DataFrame, repeticiones: int
+) -> tuple[float, pd.DataFrame]:
+    """Mejor tiempo de ``repeticiones`` llamadas a transform
+    y el resultado de la última"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = wt.transform(df)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de escalado de transform con n_jobs"
+    )
+    parser.add_argument("--filas", type=int, default=50_000_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--backend", choices=["threading", "loky"], default=None)
+    args = parser.parse_args()
+
+    df = generar_dataset(args.filas)
+    wt = WineDatasetTransformer(**PARAMETROS).fit(df.head(100_000))
+    print(f"{len(df):,} filas, {os.cpu_count()} núcleos disponibles")
+
+    serie, esperado = medir(wt, df, args.repeticiones)
+    print(f"{'n_jobs':>7} {'segundos':>9} {'speedup':>8}")
+    print(f"{'serie':>7} {serie:>9.2f} {1:>7.2f}x")
+    contexto = nullcontext() if args.backend is None else parallel_config(args.backend)
+    with contexto:
+        for jobs in args.jobs:
+            segundos, resultado = medir(
+                wt.set_params(n_jobs=jobs), df, args.repeticiones
+            )
+            pd.testing.assert_frame_equal(resultado, esperado, check_exact=True)
+            del resultado
+            print(f"{jobs:>7} {segundos:>9.2f} {serie / segundos:>7.2f}x")
+        wt.set_params(n_jobs=None)
+
+
+if __name__ == "__main__":
+    main()
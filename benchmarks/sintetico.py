@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generador de datasets sintéticos con el esquema de ``data/raw/train.csv``.
+
+Remuestrea con reemplazo las filas del dataset original y multiplica
+las columnas float por un ruido pequeño, de modo que hay pocas filas
+repetidas pero se mantienen las distribuciones y los valores erróneos
+de alcohol y densidad que tienen que corregir las transformaciones.
+
+Uso desde la raíz del proyecto:
+
+    $ PYTHONPATH=.:src python benchmarks/sintetico.py --filas 10000000 \\
+        --salida data/raw/train_10M.parquet
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aidtecsolutions.utils import guardar_dataset, leer_dataset
+import settings
+
+# Desviación del ruido multiplicativo de las columnas float
+RUIDO = 0.01
+
+
+def generar_dataset(
+    filas: int,
+    semilla: int = 42,
+    origen: Path = settings.FOLDER_DATA_RAW / settings.TRAIN_FILE,
+    bloque: int = 1_000_000,
+) -> pd.DataFrame:
+    """Genera ``filas`` filas sintéticas con las columnas, los tipos
+    y los valores sucios del dataset ``origen``
+
+    Parameters
+    ----------
+    filas : int
+        _description_
+    semilla : int, optional
+        _description_, by default 42
+    origen : Path, optional
+        _description_, by default settings.FOLDER_DATA_RAW / settings.TRAIN_FILE
+    bloque : int, optional
+        Filas generadas de cada vez, acota la memoria del ruido,
+        by default 1_000_000
+
+    Returns
+    -------
+    pd.DataFrame
+        _description_
+    """
+    base = leer_dataset(origen, dtype=settings.RAW_DTYPES)
+    columnas_float = base.select_dtypes("float64").columns
+    rng = np.random.default_rng(semilla)
+
+    bloques = []
+    for inicio in range(0, filas, bloque):
+        n = min(bloque, filas - inicio)
+        df = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+        df[columnas_float] *= rng.normal(1, RUIDO, size=(n, len(columnas_float)))
+        bloques.append(df)
+    df = pd.concat(bloques, ignore_index=True)
+    df.index.name = base.index.name
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Genera un dataset sintético con el esquema de train.csv"
+    )
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument(
+        "--salida",
+        type=Path,
+        required=True,
+        help="Archivo csv, parquet o feather donde guardar el dataset",
+    )
+    args = parser.parse_args()
+
+    df = generar_dataset(args.filas, args.semilla)
+    guardar_dataset(df, args.salida)
+    print(f"Guardadas {len(df):,} filas en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# Este script facilita la ejecución de convert_dataset.py con diferentes configuraciones.
+
+function convert_dataset() {
+    # Construir el comando con los argumentos pasados a este script de Bash
+    CMD="python -m aidtecsolutions.cli convert"
+
+    # Añadir flags y argumentos basado en lo que se pase a este script de Bash
+    for arg in "$@"; do
+        CMD="$CMD $arg"
+    done
+
+        # Ejecutar el comando
+        echo "Ejecutando: $CMD"
+        $CMD
+    }
+
+# Llamar a la función run_build_features con todos los argumentos pasados a este script
+convert_dataset "$@"
\ No newline at end of file
@@ -4,7 +4,7 @@
 
 function make_dataset() {
     # Construir el comando con los argumentos pasados a este script de Bash
-    CMD="python src/aidtecsolutions/data/make_dataset.py"  # Asegúrate de ajustar la ruta.
+    CMD="python -m aidtecsolutions.cli dataset"
 
     # Añadir flags y argumentos basado en lo que se pase a este script de Bash
     for arg in "$@"; do
@@ -4,7 +4,7 @@
 
 function build_features() {
     # Construir el comando con los argumentos pasados a este script de Bash
-    CMD="python src/aidtecsolutions/features/build_features.py"  # Asegúrate de ajustar la ruta.
+    CMD="python -m aidtecsolutions.cli features"
 
     # Añadir flags y argumentos basado en lo que se pase a este script de Bash
     for arg in "$@"; do
@@ -4,7 +4,7 @@
 
 function predict_model() {
     # Construir el comando con los argumentos pasados a este script de Bash
-    CMD="python src/aidtecsolutions/models/predict_model.py"  # Asegúrate de ajustar la ruta.
+    CMD="python -m aidtecsolutions.cli predict"
 
     # Añadir flags y argumentos basado en lo que se pase a este script de Bash
     for arg in "$@"; do
@@ -21,6 +21,7 @@ FOLDER_DATA_RAW = Path("data/raw")
 FOLDER_DATA_PROCESSED = Path("data/processed")
 FOLDER_DATA_INTERIM = Path("data/interim")
 FOLDER_MODELS_SERIALISED = Path("models")
+FOLDER_REPORTS = Path("reports")
 
 KOPURU_URL = 'https://kopuru.com/wp-content/uploads/2024/01'
 TRAIN_DATASET = "calidad_vino_AT-_train.csv"
@@ -33,8 +34,63 @@ RUTA_TEST_DATASET_RAW = FOLDER_DATA_RAW / TEST_DATASET
 TRAIN_FILE = 'train.csv'
 TEST_FILE = 'test.csv'
 
+# Manifiesto de los datasets que descarga make_dataset: url de origen
+# y sha256 del contenido con el que se verifica cada descarga
+DATASET_MANIFEST = {
+    TRAIN_FILE: {
+        "url": TRAIN_URL,
+        "sha256": "2b3de3a533079e28a6c8e988dc5e8155e2bad798c1a2b30a1a3f4370d2954b00",
+    },
+    TEST_FILE: {
+        "url": TEST_URL,
+        "sha256": "8643d2a57df4bcd69fdcfc0208d15ae66f3f92db648c67afaa84513318ca285e",
+    },
+}
+# Descargas: bytes escritos de cada vez, descargas simultáneas, intentos
+# extra tras un corte (reanudando lo ya descargado), segundos de espera
+# antes del primer reintento (se dobla en cada uno) y timeout en segundos
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF_SECONDS = 1.0
+DOWNLOAD_TIMEOUT = 30
+
 
 TARGET_FEATURE = 'calidad'
 LABEL_ENCODER_NAME = 'wine_label_encoder'
 
 SPLITS_FOR_CV = 5
+
+# Los modelos de joblib se cargan mapeando sus arrays desde el archivo:
+# los árboles de un random forest no pasan por una copia intermedia y
+# baja el pico de memoria de la carga (None para leerlos enteros)
+MODEL_MMAP_MODE = "r"
+# Fracción del train de cada fold que se usa como eval set
+# cuando se entrena xgboost con early stopping
+EARLY_STOPPING_VALIDATION = 0.1
+
+# Tipos forzados al leer por bloques los datasets de data/raw, para que
+# no cambien de un bloque a otro
+RAW_DTYPES = {"alcohol": "object", "color": "object"}
+CHUNK_SHUFFLE_SEED = 42
+
+# Formatos de dataset soportados según la extensión del archivo
+DATASET_FORMATS = (".csv", ".parquet", ".feather")
+# Columnas que se guardan como category en los formatos columnares
+CATEGORICAL_COLUMNS = ["color"]
+
+# Micro-batching del servidor de predicciones: filas máximas por lote
+# y milisegundos que se espera a completarlo
+SERVE_MAX_BATCH = 256
+SERVE_MAX_WAIT_MS = 5.0
+
+# Índice de la caché de datasets transformados en data/processed y
+# tamaño máximo que pueden ocupar (None para no borrar nunca)
+PROCESSED_CACHE_INDEX = ".cache_datasets.sqlite"
+PROCESSED_CACHE_MAX_MB = None
+# Carpeta dentro de data/processed con el almacén de las columnas
+# derivadas de cada dataset de data/raw
+FEATURE_STORE_FOLDER = ".columnas"
+# Índice sqlite dentro de data/raw y data/processed con el catálogo de
+# los datasets: tamaño, filas, tipos de las columnas y sha256
+DATASET_CATALOG_INDEX = ".catalogo.sqlite"
@@ -0,0 +1,405 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Catálogo de los datasets de una carpeta.
+
+Cada carpeta de datasets (``data/raw``, ``data/processed``) tiene un
+índice sqlite con el tamaño, la fecha de modificación, el número de
+filas, los tipos de las columnas y el sha256 de cada archivo. Buscar
+un dataset es una consulta por clave primaria y un ``stat`` del
+archivo para detectar entradas obsoletas, sin listar la carpeta, que
+en ``data/processed`` puede tener decenas de miles de variantes.
+
+El sha256 solo se calcula cuando se pide con ``sha256``, no al
+registrar, para no leer otra vez el archivo entero en cada carga.
+Dentro de un comando ``abrir_catalogo`` reutiliza una sola conexión
+por carpeta.
+"""
+
+import atexit
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import sqlite3
+import stat
+from types import TracebackType
+from typing import Any, Iterable
+
+from aidtecsolutions.utils import hash_archivo
+import settings
+
+_COLUMNAS = "nombre, tamano, mtime_ns, filas, columnas, sha256"
+
+
+@dataclass
+class EntradaCatalogo:
+    """Dataset registrado en el catálogo
+
+    Parameters
+    ----------
+    nombre : str
+        Nombre del archivo dentro de la carpeta
+    tamano : int
+        Bytes del archivo al registrarlo
+    mtime_ns : int
+        Fecha de modificación del archivo al registrarlo
+    filas : int | None, optional
+        _description_, by default None
+    columnas : dict[str, str] | None, optional
+        Tipo de cada columna, by default None
+    sha256 : str | None, optional
+        _description_, by default None
+    """
+
+    nombre: str
+    tamano: int
+    mtime_ns: int
+    filas: int | None = None
+    columnas: dict[str, str] | None = None
+    sha256: str | None = None
+
+    @property
+    def flags(self) -> set[str]:
+        """Partes del nombre separadas por guiones, que en los
+        datasets de build_features son las transformaciones"""
+        return set(Path(self.nombre).stem.split("-")[1:])
+
+
+class CatalogoDatasets:
+    """Índice sqlite de los datasets de una carpeta. Se usa como
+    context manager para cerrar la conexión:
+
+    >>> with CatalogoDatasets(settings.FOLDER_DATA_PROCESSED) as catalogo:
+    ...     catalogo.existe("train.csv-shuffle.csv")
+
+    Parameters
+    ----------
+    carpeta : Path
+        _description_
+    nombre_indice : str | None, optional
+        Nombre del archivo sqlite dentro de ``carpeta``. Por defecto
+        ``settings.DATASET_CATALOG_INDEX``, by default None
+    """
+
+    def __init__(self, carpeta: Path, nombre_indice: str | None = None) -> None:
+        self.carpeta = Path(carpeta)
+        self.ruta_indice = self.carpeta / (
+            nombre_indice or settings.DATASET_CATALOG_INDEX
+        )
+        # Varios comandos pueden escribir a la vez, sqlite los serializa
+        self.conexion = sqlite3.connect(self.ruta_indice, timeout=30)
+        with self.conexion:
+            self.conexion.execute(
+                """CREATE TABLE IF NOT EXISTS datasets (
+                    nombre TEXT PRIMARY KEY,
+                    tamano INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    filas INTEGER,
+                    columnas TEXT,
+                    sha256 TEXT
+                )"""
+            )
+
+    def __enter__(self) -> "CatalogoDatasets":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.conexion.close()
+
+    @staticmethod
+    def _entrada(fila: tuple[Any, ...]) -> EntradaCatalogo:
+        nombre, tamano, mtime_ns, filas, columnas, sha256 = fila
+        return EntradaCatalogo(
+            nombre=nombre,
+            tamano=tamano,
+            mtime_ns=mtime_ns,
+            filas=filas,
+            columnas=json.loads(columnas) if columnas is not None else None,
+            sha256=sha256,
+        )
+
+    @staticmethod
+    def _fila(entrada: EntradaCatalogo) -> tuple[Any, ...]:
+        columnas = None
+        if entrada.columnas is not None:
+            columnas = json.dumps(entrada.columnas, ensure_ascii=False)
+        return (
+            entrada.nombre,
+            entrada.tamano,
+            entrada.mtime_ns,
+            entrada.filas,
+            columnas,
+            entrada.sha256,
+        )
+
+    def _guardar(self, *entradas: EntradaCatalogo) -> None:
+        # Todas las entradas en una sola transacción
+        with self.conexion:
+            self.conexion.executemany(
+                f"INSERT OR REPLACE INTO datasets ({_COLUMNAS}) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._fila(entrada) for entrada in entradas],
+            )
+
+    def eliminar(self, nombres: Iterable[str]) -> None:
+        """Borra las entradas, no los archivos"""
+        with self.conexion:
+            self.conexion.executemany(
+                "DELETE FROM datasets WHERE nombre = ?",
+                [(nombre,) for nombre in nombres],
+            )
+
+    def buscar(self, nombre: str) -> EntradaCatalogo | None:
+        """Entrada del dataset o None si no está registrado. No
+        comprueba si el archivo ha cambiado, ver ``vigente``"""
+        fila = self.conexion.execute(
+            f"SELECT {_COLUMNAS} FROM datasets WHERE nombre = ?", (nombre,)
+        ).fetchone()
+        return None if fila is None else self._entrada(fila)
+
+    def vigente(self, entrada: EntradaCatalogo) -> bool:
+        """Comprueba que el archivo sigue existiendo con el tamaño
+        y la fecha de modificación con los que se registró"""
+        try:
+            estado = (self.carpeta / entrada.nombre).stat()
+        except FileNotFoundError:
+            return False
+        return (estado.st_size, estado.st_mtime_ns) == (
+            entrada.tamano,
+            entrada.mtime_ns,
+        )
+
+    def existe(self, nombre: str) -> bool:
+        """Comprueba si el dataset está en la carpeta con una
+        consulta al índice y un ``stat`` del archivo. Registra los
+        archivos que aún no estaban, sin filas, columnas ni hash, y
+        borra la entrada si el archivo ya no existe
+
+        Parameters
+        ----------
+        nombre : str
+            _description_
+
+        Returns
+        -------
+        bool
+            _description_
+        """
+        entrada = self.buscar(nombre)
+        try:
+            estado = (self.carpeta / nombre).stat()
+        except FileNotFoundError:
+            estado = None
+        if estado is None or not stat.S_ISREG(estado.st_mode):
+            if entrada is not None:
+                self.eliminar([nombre])
+            return False
+        if entrada is None or (entrada.tamano, entrada.mtime_ns) != (
+            estado.st_size,
+            estado.st_mtime_ns,
+        ):
+            self._guardar(EntradaCatalogo(nombre, estado.st_size, estado.st_mtime_ns))
+        return True
+
+    def registrar(
+        self,
+        nombre: str,
+        filas: int | None = None,
+        columnas: dict[str, str] | None = None,
+        calcular_sha256: bool = False,
+    ) -> EntradaCatalogo:
+        """Registra el dataset y, si se pasan, sus filas y columnas.
+        Si ya estaba registrado sin cambios en el archivo conserva
+        el hash y los datos que no se pasen
+
+        Parameters
+        ----------
+        nombre : str
+            _description_
+        filas : int | None, optional
+            _description_, by default None
+        columnas : dict[str, str] | None, optional
+            Tipo de cada columna, by default None
+        calcular_sha256 : bool, optional
+            Calcula el sha256 si no está registrado. Lee el
+            archivo entero, by default False
+
+        Returns
+        -------
+        EntradaCatalogo
+            _description_
+        """
+        ruta = self.carpeta / nombre
+        estado = ruta.stat()
+        registrada = self.buscar(nombre)
+        anterior = registrada
+        if anterior is None or not self.vigente(anterior):
+            anterior = EntradaCatalogo(nombre, estado.st_size, estado.st_mtime_ns)
+        entrada = EntradaCatalogo(
+            nombre=nombre,
+            tamano=estado.st_size,
+            mtime_ns=estado.st_mtime_ns,
+            filas=filas if filas is not None else anterior.filas,
+            columnas=columnas if columnas is not None else anterior.columnas,
+            sha256=anterior.sha256,
+        )
+        if entrada.sha256 is None and calcular_sha256:
+            entrada.sha256 = hash_archivo(ruta)
+        if entrada != registrada:
+            self._guardar(entrada)
+        return entrada
+
+    def sha256(self, nombre: str) -> str:
+        """sha256 del dataset. Solo lee el archivo si no estaba
+        registrado o ha cambiado desde que se calculó"""
+        return str(self.registrar(nombre, calcular_sha256=True).sha256)
+
+    def consultar(
+        self, prefijo: str = "", flags: Iterable[str] = ()
+    ) -> list[EntradaCatalogo]:
+        """Entradas cuyo nombre empieza por ``prefijo`` y que tienen
+        todas las ``flags``, ordenadas por nombre. El prefijo se
+        resuelve con el índice de la clave primaria
+
+        Parameters
+        ----------
+        prefijo : str, optional
+            Por ejemplo el dataset original, ``train.csv``, by default ""
+        flags : Iterable[str], optional
+            Transformaciones del nombre, por ejemplo
+            ``["corregir_alcohol", "shuffle"]``, by default ()
+
+        Returns
+        -------
+        list[EntradaCatalogo]
+            _description_
+        """
+        # Todos los nombres con el prefijo están en [prefijo, prefijo + max)
+        filas = self.conexion.execute(
+            f"SELECT {_COLUMNAS} FROM datasets "
+            "WHERE nombre >= ? AND nombre < ? ORDER BY nombre",
+            (prefijo, prefijo + chr(0x10FFFF)),
+        )
+        flags = set(flags)
+        entradas = (self._entrada(fila) for fila in filas)
+        return [entrada for entrada in entradas if flags <= entrada.flags]
+
+    def obsoletas(self) -> list[EntradaCatalogo]:
+        """Entradas cuyo archivo se ha borrado o modificado desde
+        que se registraron. Hace un ``stat`` por entrada"""
+        entradas = self.consultar()
+        return [entrada for entrada in entradas if not self.vigente(entrada)]
+
+    def sincronizar(self) -> tuple[list[str], list[str]]:
+        """Lista la carpeta una vez, registra sin hash los archivos
+        nuevos o modificados y borra las entradas de los archivos
+        que ya no existen
+
+        Returns
+        -------
+        tuple[list[str], list[str]]
+            Nombres registrados y nombres borrados
+        """
+        registrados = {entrada.nombre: entrada for entrada in self.consultar()}
+        nuevos = []
+        with os.scandir(self.carpeta) as archivos:
+            for archivo in archivos:
+                # Índices, cachés y descargas a medias empiezan por . o acaban en .part
+                if (
+                    archivo.name.startswith(".")
+                    or archivo.name.endswith(".part")
+                    or not archivo.is_file()
+                ):
+                    continue
+                entrada = registrados.pop(archivo.name, None)
+                estado = archivo.stat()
+                if entrada is None or (entrada.tamano, entrada.mtime_ns) != (
+                    estado.st_size,
+                    estado.st_mtime_ns,
+                ):
+                    nuevos.append(
+                        EntradaCatalogo(
+                            archivo.name, estado.st_size, estado.st_mtime_ns
+                        )
+                    )
+        self._guardar(*nuevos)
+        self.eliminar(registrados)
+        return sorted(entrada.nombre for entrada in nuevos), sorted(registrados)
+
+
+_ABIERTOS: dict[Path, CatalogoDatasets] = {}
+
+
+def abrir_catalogo(carpeta: Path) -> CatalogoDatasets:
+    """Catálogo de la carpeta con una conexión compartida por todo
+    el comando. No se usa como context manager, las conexiones se
+    cierran al salir
+
+    Parameters
+    ----------
+    carpeta : Path
+        _description_
+
+    Returns
+    -------
+    CatalogoDatasets
+        _description_
+    """
+    clave = Path(carpeta).absolute()
+    catalogo = _ABIERTOS.get(clave)
+    # Si se borra el índice la conexión seguiría escribiendo en él
+    if catalogo is None or not catalogo.ruta_indice.exists():
+        if catalogo is not None:
+            catalogo.conexion.close()
+        catalogo = _ABIERTOS[clave] = CatalogoDatasets(clave)
+    return catalogo
+
+
+@atexit.register
+def _cerrar_catalogos() -> None:
+    for catalogo in _ABIERTOS.values():
+        catalogo.conexion.close()
+    _ABIERTOS.clear()
+
+
+def registrar_dataset(
+    ruta: Path, filas: int | None = None, columnas: dict[str, str] | None = None
+) -> EntradaCatalogo:
+    """Registra un dataset en el catálogo de su carpeta, sin
+    calcular su sha256
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+    filas : int | None, optional
+        _description_, by default None
+    columnas : dict[str, str] | None, optional
+        Tipo de cada columna, by default None
+
+    Returns
+    -------
+    EntradaCatalogo
+        _description_
+    """
+    ruta = Path(ruta)
+    return abrir_catalogo(ruta.parent).registrar(
+        ruta.name, filas=filas, columnas=columnas
+    )
@@ -0,0 +1,108 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Punto de entrada ``aidtec`` con un subcomando por cada script
+del proyecto:
+
+    $ aidtec features --con train.csv --alcohol --save
+
+Solo se importa el módulo del subcomando elegido y cada módulo deja
+pandas, numpy, sklearn y xgboost para cuando los necesita, de forma
+que ``--help`` y los errores en los argumentos responden al momento"""
+
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+
+# Subcomando: (módulo con la función main, descripción)
+COMANDOS: dict[str, tuple[str, str]] = {
+    "dataset": (
+        "aidtecsolutions.data.make_dataset",
+        "Descarga los datasets train y test de la web de Kopuru",
+    ),
+    "convert": (
+        "aidtecsolutions.data.convert_dataset",
+        "Convierte un dataset entre csv, parquet y feather",
+    ),
+    "features": (
+        "aidtecsolutions.features.build_features",
+        "Aplica las transformaciones a un dataset de data/raw",
+    ),
+    "train": (
+        "aidtecsolutions.models.train_model",
+        "Entrena modelos con parámetros específicos",
+    ),
+    "predict": (
+        "aidtecsolutions.models.predict_model",
+        "Lanza predicciones con un modelo entrenado",
+    ),
+    "serve": (
+        "aidtecsolutions.models.serve_model",
+        "Servidor local de predicciones",
+    ),
+}
+
+
+def setup_parser() -> argparse.ArgumentParser:
+    """Crea el parser con el subcomando. El resto de argumentos
+    los parsea el propio subcomando
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        _description_
+    """
+    parser = argparse.ArgumentParser(
+        prog="aidtec",
+        description="Comandos del proyecto. Usa aidtec <comando> --help para ver "
+        "los argumentos de cada uno",
+        epilog="comandos:\n"
+        + "\n".join(
+            f"  {nombre:<10}{descripcion}"
+            for nombre, (_, descripcion) in COMANDOS.items()
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "comando",
+        choices=list(COMANDOS),
+        metavar="comando",
+        help="Uno de los comandos de la lista",
+    )
+    parser.add_argument(
+        "argumentos",
+        nargs=argparse.REMAINDER,
+        help="Argumentos del comando",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = setup_parser()
+    args = parser.parse_args(argv)
+
+    # settings vive en la raíz del proyecto y las rutas son relativas a
+    # ella, así que el comando se lanza desde la raíz
+    if importlib.util.find_spec("settings") is None:
+        sys.path.insert(0, os.getcwd())
+
+    modulo, _ = COMANDOS[args.comando]
+    sys.argv = [f"aidtec {args.comando}", *args.argumentos]
+    importlib.import_module(modulo).main()
+
+
+if __name__ == "__main__":
+    main()
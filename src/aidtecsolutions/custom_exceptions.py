@@ -56,3 +56,47 @@ class NonValidDataset(Exception):
     Exception : _type_
         _description_
     """
+
+
+class UnsupportedFileFormat(Exception):
+    """Cuando la extensión de un archivo no
+    corresponde con ningún formato soportado
+
+    Parameters
+    ----------
+    Exception : _type_
+        _description_
+    """
+
+
+class NonValidSpec(Exception):
+    """Cuando la especificación de una búsqueda
+    de hiperparámetros no es válida
+
+    Parameters
+    ----------
+    Exception : _type_
+        _description_
+    """
+
+
+class NonValidSchema(Exception):
+    """Cuando a un dataset le faltan columnas
+    de su esquema
+
+    Parameters
+    ----------
+    Exception : _type_
+        _description_
+    """
+
+
+class NonValidModel(Exception):
+    """Cuando un modelo no se puede guardar o
+    no coincide con su manifiesto al cargarlo
+
+    Parameters
+    ----------
+    Exception : _type_
+        _description_
+    """
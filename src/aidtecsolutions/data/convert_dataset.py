@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Script para convertir datasets entre csv, parquet y feather"""
+
+import argparse
+from pathlib import Path
+
+from aidtecsolutions.custom_exceptions import UnsupportedFileFormat
+from aidtecsolutions.utils import convertir_dataset
+
+
+def setup_parser() -> argparse.ArgumentParser:
+    """Crea el parser con los argumentos
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        _description_
+    """
+    parser = argparse.ArgumentParser(
+        description="Convierte un dataset entre csv, parquet y feather. \
+            El formato se elige por la extensión de cada archivo"
+    )
+    parser.add_argument(
+        "--origen",
+        help="Ruta del dataset a convertir, por ejemplo data/raw/train.csv",
+        type=Path,
+        required=True,
+    )
+    parser.add_argument(
+        "--destino",
+        help="Ruta del dataset convertido, por ejemplo data/raw/train.parquet",
+        type=Path,
+        required=True,
+    )
+    return parser
+
+
+def main() -> None:
+    parser = setup_parser()
+    args = parser.parse_args()
+
+    if not args.origen.exists():
+        print(f"No se encuentra el archivo {args.origen}")
+        return
+
+    try:
+        df = convertir_dataset(args.origen, args.destino)
+    except UnsupportedFileFormat as exc:
+        print(f"Error al convertir el dataset: {exc}")
+        return
+
+    print(df.dtypes)
+    print(f"Guardado dataset correctamente en {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,11 +20,18 @@
 import argparse
 
 from aidtecsolutions.custom_exceptions import DatasetDownloadError
-from aidtecsolutions.data.utils import download_dataset
+from aidtecsolutions.data.utils import descargar_datasets, descargas_manifiesto
 import settings
 
 
-def main() -> None:
+def setup_parser() -> argparse.ArgumentParser:
+    """Crea el parser con los argumentos
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        _description_
+    """
     parser = argparse.ArgumentParser(
         description="Descarga los datasets train y test de la web de Kopuru"
     )
@@ -41,20 +48,34 @@ def main() -> None:
         help="Descarga el dataset de test la web de kopuru",
         action="store_true",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.DOWNLOAD_WORKERS,
+        help="Número de descargas simultáneas",
+    )
+    return parser
+
 
+def main() -> None:
     # Parseamos los argumentos
+    parser = setup_parser()
     args = parser.parse_args()
 
+    nombres = []
     if args.train:
-        try:
-            download_dataset(settings.TRAIN_URL, settings.TRAIN_FILE)
-        except DatasetDownloadError as exc:
-            print(f"Error al descargar el dataset: {exc}")
-    elif args.test:
-        try:
-            download_dataset(settings.TEST_URL, settings.TEST_FILE)
-        except DatasetDownloadError as exc:
-            print(f"Error al descargar el dataset: {exc}")
+        nombres.append(settings.TRAIN_FILE)
+    if args.test:
+        nombres.append(settings.TEST_FILE)
+    if not nombres:
+        print("Indica el dataset a descargar con --train, --test o ambos")
+        return
+
+    # Los archivos que ya están con el sha256 del manifiesto no se descargan
+    try:
+        descargar_datasets(descargas_manifiesto(nombres), workers=args.workers)
+    except DatasetDownloadError as exc:
+        print(f"Error al descargar el dataset: {exc}")
 
 
 if __name__ == "__main__":
@@ -14,15 +14,249 @@
 
 """Scripts con funciones auxiliares relacionadas make_dataset"""
 
-import requests
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING, Iterable
 
 from aidtecsolutions.custom_exceptions import DatasetDownloadError
+from aidtecsolutions.utils import hash_archivo
 import settings
 
+# requests solo se importa al descargar para que el comando arranque rápido
+if TYPE_CHECKING:
+    import requests
+
+
+@dataclass
+class Descarga:
+    """Archivo a descargar
+
+    Parameters
+    ----------
+    url : str
+        _description_
+    nombre_archivo : str
+        Nombre con el que se guarda en la carpeta de destino
+    sha256 : str | None, optional
+        sha256 esperado del contenido. Si es None no se verifica
+        ni se evita volver a descargar el archivo, by default None
+    """
+
+    url: str
+    nombre_archivo: str
+    sha256: str | None = None
+
+
+def descargas_manifiesto(nombres: Iterable[str]) -> list[Descarga]:
+    """Descargas de los datasets de ``settings.DATASET_MANIFEST``
+
+    Parameters
+    ----------
+    nombres : Iterable[str]
+        Nombres de archivo del manifiesto
+
+    Returns
+    -------
+    list[Descarga]
+        _description_
+    """
+    return [
+        Descarga(
+            url=settings.DATASET_MANIFEST[nombre]["url"],
+            nombre_archivo=nombre,
+            sha256=settings.DATASET_MANIFEST[nombre]["sha256"],
+        )
+        for nombre in nombres
+    ]
+
+
+def _descargar_en(
+    sesion: requests.Session, url: str, parcial: Path, tamano_bloque: int
+) -> None:
+    """Descarga ``url`` en ``parcial`` por bloques. Si ``parcial`` ya
+    existe pide solo lo que falta con una cabecera Range
+
+    Raises
+    ------
+    DatasetDownloadError
+        Si el servidor responde con un error que no se arregla
+        reintentando (4xx)
+    requests.RequestException
+        Si se corta la conexión o el servidor responde 5xx
+    """
+    import requests
+
+    inicio = parcial.stat().st_size if parcial.exists() else 0
+    cabeceras = {"Range": f"bytes={inicio}-"} if inicio else {}
+    with sesion.get(
+        url, headers=cabeceras, stream=True, timeout=settings.DOWNLOAD_TIMEOUT
+    ) as respuesta:
+        # Lo descargado antes ya era el archivo completo
+        if respuesta.status_code == 416 and inicio:
+            return
+        if respuesta.status_code >= 500:
+            raise requests.HTTPError(f"Estado: {respuesta.status_code}")
+        if respuesta.status_code not in (200, 206):
+            raise DatasetDownloadError(
+                f"Error al descargar el archivo. Estado: {respuesta.status_code}"
+            )
+        # Con 200 el servidor ignora el Range y manda el archivo entero
+        reanuda = respuesta.status_code == 206
+        if reanuda and not respuesta.headers.get("Content-Range", "").startswith(
+            f"bytes {inicio}-"
+        ):
+            parcial.unlink()
+            raise requests.HTTPError("El rango recibido no es el pedido")
+        with open(parcial, "ab" if reanuda else "wb") as f:
+            for bloque in respuesta.iter_content(tamano_bloque):
+                f.write(bloque)
+
+
+def descargar_archivo(
+    sesion: requests.Session,
+    descarga: Descarga,
+    carpeta: Path,
+    tamano_bloque: int | None = None,
+    reintentos: int | None = None,
+) -> bool:
+    """Descarga un archivo en ``carpeta`` escribiéndolo por bloques
+    en un ``.part`` que se renombra al terminar. Tras un corte
+    reintenta reanudando desde lo ya escrito, también entre
+    ejecuciones. Si el sha256 no coincide borra lo descargado y
+    vuelve a empezar
+
+    Parameters
+    ----------
+    sesion : requests.Session
+        Sesión compartida entre descargas
+    descarga : Descarga
+        _description_
+    carpeta : Path
+        _description_
+    tamano_bloque : int | None, optional
+        Bytes escritos de cada vez. Por defecto
+        ``settings.DOWNLOAD_CHUNK_SIZE``, by default None
+    reintentos : int | None, optional
+        Intentos extra tras un fallo. Por defecto
+        ``settings.DOWNLOAD_RETRIES``, by default None
+
+    Returns
+    -------
+    bool
+        False si el archivo ya existía con el sha256 esperado
+        y no se ha descargado
+
+    Raises
+    -------
+    DatasetDownloadError
+        Si el servidor responde con un error 4xx o se agotan
+        los reintentos
+    """
+    import requests
+
+    tamano_bloque = tamano_bloque or settings.DOWNLOAD_CHUNK_SIZE
+    if reintentos is None:
+        reintentos = settings.DOWNLOAD_RETRIES
+
+    ruta = carpeta / descarga.nombre_archivo
+    if (
+        descarga.sha256 is not None
+        and ruta.exists()
+        and hash_archivo(ruta) == descarga.sha256
+    ):
+        print(f"{ruta} ya está descargado y verificado")
+        return False
+
+    parcial = ruta.with_name(ruta.name + ".part")
+    error = ""
+    for intento in range(reintentos + 1):
+        if intento:
+            time.sleep(settings.DOWNLOAD_BACKOFF_SECONDS * 2 ** (intento - 1))
+        print(f"GET {descarga.url}")
+        try:
+            _descargar_en(sesion, descarga.url, parcial, tamano_bloque)
+        except requests.RequestException as exc:
+            error = str(exc)
+            continue
+        if descarga.sha256 is not None and hash_archivo(parcial) != descarga.sha256:
+            parcial.unlink()
+            error = "El sha256 no coincide con el del manifiesto"
+            continue
+        os.replace(parcial, ruta)
+        print(f"Archivo guardado en {ruta}")
+        return True
+
+    raise DatasetDownloadError(
+        f"Error al descargar {descarga.url} tras {reintentos + 1} intentos. {error}"
+    )
+
+
+def descargar_datasets(
+    descargas: list[Descarga],
+    carpeta: Path | None = None,
+    workers: int | None = None,
+) -> dict[str, bool]:
+    """Descarga varios archivos a la vez con un pool de hilos que
+    comparte una ``requests.Session``
+
+    Parameters
+    ----------
+    descargas : list[Descarga]
+        _description_
+    carpeta : Path | None, optional
+        Por defecto ``settings.FOLDER_DATA_RAW``, by default None
+    workers : int | None, optional
+        Descargas simultáneas. Por defecto
+        ``settings.DOWNLOAD_WORKERS``, by default None
+
+    Returns
+    -------
+    dict[str, bool]
+        Si se ha descargado cada archivo o ya estaba verificado
+
+    Raises
+    ------
+    DatasetDownloadError
+        Con los errores de todos los archivos que han fallado,
+        después de terminar las demás descargas
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    carpeta = settings.FOLDER_DATA_RAW if carpeta is None else carpeta
+    workers = max(1, min(workers or settings.DOWNLOAD_WORKERS, len(descargas)))
+    with requests.Session() as sesion:
+        # Una conexión reutilizable por hilo
+        adaptador = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        sesion.mount("http://", adaptador)
+        sesion.mount("https://", adaptador)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futuros = {
+                descarga.nombre_archivo: pool.submit(
+                    descargar_archivo, sesion, descarga, carpeta
+                )
+                for descarga in descargas
+            }
+
+    resultados: dict[str, bool] = {}
+    errores: list[str] = []
+    for nombre, futuro in futuros.items():
+        try:
+            resultados[nombre] = futuro.result()
+        except DatasetDownloadError as exc:
+            errores.append(f"{nombre}: {exc}")
+    if errores:
+        raise DatasetDownloadError(". ".join(errores))
+    return resultados
+
 
-def download_dataset(url: str, nombre_archivo: str) -> None:
-    """Hace una solicitud GET y descarga un archivo
-    de la url. Lo guarda en data/raw
+def download_dataset(url: str, nombre_archivo: str, sha256: str | None = None) -> None:
+    """Descarga un archivo de la url. Lo guarda en data/raw
 
     Parameters
     ----------
@@ -30,6 +264,8 @@ def download_dataset(url: str, nombre_archivo: str) -> None:
         _description_
     nombre_archivo : str
         _description_
+    sha256 : str | None, optional
+        sha256 esperado del contenido, by default None
 
     Raises
     -------
@@ -37,17 +273,4 @@ def download_dataset(url: str, nombre_archivo: str) -> None:
         Si la conexión no se ha realizado
         correctamente
     """
-    respuesta = requests.get(url)
-    print(f"GET {url}")
-
-    # Verificar que la solicitud fue exitosa
-    if respuesta.status_code == 200:
-        # Abrir un archivo en modo escritura binaria
-        ruta_completa = settings.FOLDER_DATA_RAW / nombre_archivo
-        with open(ruta_completa, "wb") as f:
-            f.write(respuesta.content)
-        print(f"Archivo guardado en {ruta_completa}")
-    else:
-        err = f"Error al descargar el archivo. Estado: {respuesta.status_code}"
-        print(err)
-        raise DatasetDownloadError(err)
+    descargar_datasets([Descarga(url, nombre_archivo, sha256)], workers=1)
@@ -0,0 +1,177 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Esquema de los datasets de vinos.
+
+Declara las columnas y los tipos de los datasets de ``data/raw`` y
+``data/processed`` para que los cargadores no tengan que inferirlos y
+para comprobar las columnas antes de leer el archivo:
+
+- ``alcohol`` se queda como texto en los datos originales porque tiene
+  valores mal formados, como ``113.333.333.333.333``, que corrige
+  ``WineDatasetTransformer``;
+- ``color`` se lee como category;
+- en los datos procesados solo se declaran las columnas cuyo tipo no
+  depende de las transformaciones aplicadas. ``alcohol``, ``color`` y
+  ``year`` cambian de tipo según se corrijan, binaricen o se les
+  aplique el logaritmo, y ``calidad`` es entera en train y vacía en
+  test, así que se dejan a pandas.
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import Iterable
+
+from aidtecsolutions.custom_exceptions import NonValidSchema
+import settings
+
+INDICE = "muestra_id"
+
+COLUMNAS_FLOAT = (
+    "acidez fija",
+    "acidez volatil",
+    "acido citrico",
+    "azucar residual",
+    "cloruros",
+    "dioxido de azufre libre",
+    "dioxido de azufre total",
+    "densidad",
+    "pH",
+    "sulfatos",
+)
+
+# Columnas que crea WineDatasetTransformer
+COLUMNAS_DERIVADAS = (
+    "densidad_alcohol",
+    "SO2_l / SO2_tot",
+    "color_acidez_vol",
+    "color_dioxido_azufre",
+    "color_cloruros",
+)
+# Una por centro rbf: diox_simil_1, diox_simil_2...
+PREFIJO_DIOX_SIMIL = "diox_simil_"
+
+
+@dataclass(frozen=True)
+class Esquema:
+    """Columnas y tipos de un dataset
+
+    Parameters
+    ----------
+    nombre : str
+        _description_
+    tipos : dict[str, str]
+        Tipo de cada columna declarada. Las que no aparecen
+        se dejan a pandas
+    obligatorias : tuple[str, ...], optional
+        Columnas que tiene que tener el archivo, by default ()
+    prefijos : dict[str, str], optional
+        Tipo de las columnas cuyo nombre empieza por cada
+        prefijo, by default {}
+    """
+
+    nombre: str
+    tipos: dict[str, str]
+    obligatorias: tuple[str, ...] = ()
+    prefijos: dict[str, str] = field(default_factory=dict)
+
+    def con_obligatorias(self, *columnas: str) -> "Esquema":
+        """Copia del esquema que además exige ``columnas``"""
+        return replace(self, obligatorias=(*self.obligatorias, *columnas))
+
+    def tipo(self, columna: str) -> str | None:
+        """Tipo declarado de la columna o None si no está declarada"""
+        if columna in self.tipos:
+            return self.tipos[columna]
+        for prefijo, tipo in self.prefijos.items():
+            if columna.startswith(prefijo):
+                return tipo
+        return None
+
+    def tipos_columnas(
+        self, columnas: Iterable[str], float32: bool = False
+    ) -> dict[str, str]:
+        """Tipos declarados de las columnas que los tienen
+
+        Parameters
+        ----------
+        columnas : Iterable[str]
+            Columnas del archivo
+        float32 : bool, optional
+            Lee como float32 las columnas float64. Reduce la memoria
+            a la mitad y los modelos de árboles ya entrenan en
+            float32, by default False
+
+        Returns
+        -------
+        dict[str, str]
+            _description_
+        """
+        tipos = {}
+        for columna in columnas:
+            tipo = self.tipo(columna)
+            if tipo is None:
+                continue
+            tipos[columna] = "float32" if float32 and tipo == "float64" else tipo
+        return tipos
+
+    def validar(
+        self, columnas: Iterable[str], seleccion: Iterable[str] | None = None
+    ) -> None:
+        """Comprueba que el archivo tenga las columnas obligatorias
+        y las seleccionadas
+
+        Parameters
+        ----------
+        columnas : Iterable[str]
+            Columnas del archivo, sin el índice
+        seleccion : Iterable[str] | None, optional
+            Columnas que se van a leer, by default None
+
+        Raises
+        ------
+        NonValidSchema
+            Si falta alguna columna
+        """
+        columnas = set(columnas)
+        faltan = [col for col in self.obligatorias if col not in columnas]
+        if seleccion is not None:
+            faltan += [
+                col for col in seleccion if col not in columnas and col not in faltan
+            ]
+        if faltan:
+            raise NonValidSchema(
+                f"Faltan columnas del esquema {self.nombre}: {', '.join(faltan)}"
+            )
+
+
+RAW = Esquema(
+    nombre="raw",
+    tipos={
+        **dict.fromkeys(COLUMNAS_FLOAT, "float64"),
+        "alcohol": "object",
+        "color": "category",
+        "year": "int64",
+    },
+    # calidad no está en los datos nuevos sobre los que predecir
+    obligatorias=(*COLUMNAS_FLOAT, "alcohol", "color", "year"),
+)
+
+PROCESSED = Esquema(
+    nombre="processed",
+    tipos=dict.fromkeys((*COLUMNAS_FLOAT, *COLUMNAS_DERIVADAS), "float64"),
+    prefijos={PREFIJO_DIOX_SIMIL: "float64"},
+)
+
+# Datos procesados con los que entrenar
+PROCESSED_TRAIN = PROCESSED.con_obligatorias(settings.TARGET_FEATURE)
@@ -17,15 +17,31 @@
 
 """Scripts to turn raw data into features for modeling"""
 
-import argparse
+from __future__ import annotations
 
-import pandas as pd
+import argparse
+from pathlib import Path
+import shutil
+import time
+from typing import TYPE_CHECKING, Any
 
 import settings
+from aidtecsolutions import esquema
 from aidtecsolutions.custom_exceptions import NonValidDataset
-from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
-from aidtecsolutions.features.utils import generate_dataset_name, parse_col_name
-from aidtecsolutions.utils import is_valid_dataset, is_valid_dataframe
+from aidtecsolutions.utils import (
+    guardar_dataset,
+    is_valid_dataset,
+    is_valid_dataframe,
+    leer_dataset_por_chunks,
+    registrar_en_catalogo,
+)
+
+# Los módulos con pandas, numpy o sklearn se importan dentro de las
+# funciones para que --help y las comprobaciones de los argumentos
+# respondan sin cargarlos
+if TYPE_CHECKING:
+    from aidtecsolutions.features.cache import AlmacenColumnas, CacheDatasets
+    from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
 
 
 def setup_parser() -> argparse.ArgumentParser:
@@ -97,13 +113,225 @@ def setup_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--save",
-        help=f"Guarda el dataset en formato csv en {settings.FOLDER_DATA_PROCESSED}",
+        help=f"Guarda el dataset en {settings.FOLDER_DATA_PROCESSED}",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--formato",
+        help="Formato del dataset guardado. parquet y feather conservan los tipos \
+            y se cargan más rápido que csv",
+        choices=[formato.lstrip(".") for formato in settings.DATASET_FORMATS],
+        default="csv",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Lee, transforma y guarda el dataset por bloques de este número \
+            de filas para no cargarlo entero en memoria. Requiere --save",
+    )
+    parser.add_argument(
+        "--no_cache",
+        help="Recalcula el dataset aunque ya exista uno guardado con las mismas \
+            transformaciones sobre el mismo archivo, sin leer ni guardar \
+                columnas en el almacén de columnas",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=settings.PROCESSED_CACHE_MAX_MB,
+        help=f"Borra los datasets guardados en {settings.FOLDER_DATA_PROCESSED} \
+            usados hace más tiempo hasta que ocupen como mucho estos MB",
+    )
+    parser.add_argument(
+        "--guardar_transformer",
+        help=f"Guarda el WineDatasetTransformer ajustado en \
+            {settings.FOLDER_MODELS_SERIALISED} para reutilizarlo al servir \
+                predicciones. Siempre recalcula el dataset",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Muestra el tiempo, las filas de entrada y salida y el pico de \
+            memoria de cada paso de las transformaciones. Siempre recalcula \
+                el dataset",
         action="store_true",
     )
 
     return parser
 
 
+def mostrar_perfil(wt: WineDatasetTransformer) -> None:
+    """Imprime el informe de tiempos y memoria de cada paso
+
+    Parameters
+    ----------
+    wt : WineDatasetTransformer
+        Transformer ajustado con ``profile=True``
+    """
+    informe = wt.informe_perfil()
+    print("Perfil de las transformaciones:")
+    print(
+        informe.to_string(
+            index=False,
+            formatters={
+                "segundos": "{:.4f}".format,
+                "memoria_pico_mb": "{:.1f}".format,
+            },
+        )
+    )
+    print(f"Total: {informe['segundos'].sum():.3f}s")
+
+
+def guardar_transformer(wt: WineDatasetTransformer, args: argparse.Namespace) -> None:
+    """Guarda el transformer ajustado con el nombre del dataset
+
+    Parameters
+    ----------
+    wt : WineDatasetTransformer
+        _description_
+    args : argparse.Namespace
+        _description_
+    """
+    from aidtecsolutions.features.utils import generate_dataset_name
+    from aidtecsolutions.wrappers import SerializableTransformer
+
+    nombre = f"transformer_{Path(generate_dataset_name(args)).stem}.joblib"
+    ruta = settings.FOLDER_MODELS_SERIALISED / nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    # El transformer que se sirve no tiene que medir cada lote
+    SerializableTransformer(wt.set_params(profile=False)).save(ruta)
+    print("Guardado transformer ajustado en:")
+    print(ruta)
+
+
+def parametros_cache(
+    wt: WineDatasetTransformer, args: argparse.Namespace
+) -> dict[str, Any]:
+    """Parámetros que determinan el dataset guardado: los del
+    transformer más el formato y el modo de lectura
+
+    Parameters
+    ----------
+    wt : WineDatasetTransformer
+        _description_
+    args : argparse.Namespace
+        _description_
+
+    Returns
+    -------
+    dict[str, Any]
+        _description_
+    """
+    parametros = wt.get_params()
+    # Ni medir los pasos ni la forma de ejecutarlos cambian el dataset
+    for parametro in ("profile", "profile_callbacks", "copy", "n_jobs"):
+        parametros.pop(parametro)
+    return {
+        **parametros,
+        "formato": args.formato,
+        "chunksize": args.chunksize,
+    }
+
+
+def crear_almacen(ruta_origen: Path) -> AlmacenColumnas:
+    """Almacén de las columnas derivadas del dataset original. Sus
+    columnas se registran en la caché de datasets de data/processed,
+    así que cuentan en ``--cache_max_mb`` y se desalojan como los
+    datasets
+
+    Parameters
+    ----------
+    ruta_origen : Path
+        Ruta del dataset en data/raw
+
+    Returns
+    -------
+    AlmacenColumnas
+        _description_
+    """
+    from aidtecsolutions.features.cache import AlmacenColumnas, CacheDatasets
+
+    # El índice de la caché guarda el hash para no volver a leer el archivo
+    cache = CacheDatasets(
+        settings.FOLDER_DATA_PROCESSED, settings.PROCESSED_CACHE_INDEX
+    )
+    return AlmacenColumnas(
+        settings.FOLDER_DATA_PROCESSED / settings.FEATURE_STORE_FOLDER,
+        cache.hash_origen(ruta_origen),
+        cache=cache,
+    )
+
+
+def mostrar_almacen(almacen: AlmacenColumnas) -> None:
+    """Imprime las columnas leídas del almacén y las calculadas"""
+    if almacen.leidas:
+        print(f"Columnas leídas del almacén: {', '.join(almacen.leidas)}")
+    if almacen.calculadas:
+        print(f"Columnas calculadas y guardadas: {', '.join(almacen.calculadas)}")
+
+
+def recuperar_de_cache(
+    cache: CacheDatasets | None, clave: str, ruta_completa: Path
+) -> Path | None:
+    """Si el dataset ya está en la caché lo deja en ``ruta_completa``
+    y devuelve su ruta. Devuelve None si hay que calcularlo
+
+    Parameters
+    ----------
+    cache : CacheDatasets | None
+        _description_
+    clave : str
+        _description_
+    ruta_completa : Path
+        Ruta en la que se ha pedido guardar el dataset
+
+    Returns
+    -------
+    Path | None
+        _description_
+    """
+    if cache is None:
+        return None
+    ruta_cacheada = cache.buscar(clave)
+    if ruta_cacheada is None:
+        return None
+
+    if ruta_cacheada != ruta_completa:
+        shutil.copyfile(ruta_cacheada, ruta_completa)
+    registrar_en_catalogo(ruta_completa)
+    print("Dataset recuperado de la caché. Guardado correctamente en:")
+    print(ruta_completa)
+    return ruta_cacheada
+
+
+def mostrar_inicio(ruta: Path, filas: int = 5) -> None:
+    """Imprime las columnas y las primeras filas de un dataset
+    leyendo solo el primer bloque"""
+    inicio = next(iter(leer_dataset_por_chunks(ruta, filas)), None)
+    if inicio is not None:
+        print(inicio.columns)
+        print(inicio)
+
+
+def desalojar_cache(
+    cache: CacheDatasets, max_mb: float | None, ruta_actual: Path
+) -> None:
+    """Borra los datasets cacheados usados hace más tiempo si se
+    supera ``max_mb``. Nunca borra el dataset recién guardado"""
+    if max_mb is None:
+        return
+    tamano_actual = ruta_actual.stat().st_size
+    max_bytes = max(int(max_mb * 1024**2), tamano_actual)
+    borrados = cache.desalojar(max_bytes=max_bytes)
+    for ruta in borrados:
+        print(f"Borrado de la caché: {ruta}")
+    if borrados:
+        from aidtecsolutions.catalogo import abrir_catalogo
+
+        abrir_catalogo(cache.carpeta).eliminar(ruta.name for ruta in borrados)
+
+
 def main() -> None:
 
     # Parseamos los argumentos
@@ -123,13 +351,18 @@ def main() -> None:
         )
         return
 
-    # Verificar que se trate de un archivo válido, si lo es carga el dataset
-    try:
-        df_train = is_valid_dataframe(settings.FOLDER_DATA_RAW, dataset)
-    except NonValidDataset as exc:
-        print(f"Dataset erróneo. Error: {exc}")
+    if args.chunksize is not None and not args.save:
+        print("El modo por bloques escribe directamente el resultado. Añade --save")
         return
 
+    from aidtecsolutions.features.cache import CacheDatasets
+    from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+    from aidtecsolutions.features.utils import (
+        generate_dataset_name,
+        parse_col_name,
+        transformar_dataset_por_chunks,
+    )
+
     wt = WineDatasetTransformer(
         corregir_alcohol=args.alcohol,
         corregir_densidad=args.densidad,
@@ -140,19 +373,98 @@ def main() -> None:
         remove_outliers=args.outliers,
         standardize=args.estandarizar,
         log_transformation=args.log,
-        drop_columns=parse_col_name(args.drop),
+        drop_columns=parse_col_name(args.drop) if args.drop else None,
         shuffle=args.shuffle,
+        profile=args.profile,
     )
 
-    # Aplicamos las transformaciones pasadas por consola
-    df_train_transformed: pd.DataFrame = wt.fit_transform(df_train)
+    # Solo se cachean los datasets que se guardan
+    cache = None
+    if args.save:
+        nombre_dataset = generate_dataset_name(args)
+        ruta_completa = settings.FOLDER_DATA_PROCESSED / nombre_dataset
+        # El transformer guardado tiene que estar ajustado y el perfil
+        # necesita transformar, no se usa la caché
+        if not (args.no_cache or args.guardar_transformer or args.profile):
+            cache = CacheDatasets(
+                settings.FOLDER_DATA_PROCESSED, settings.PROCESSED_CACHE_INDEX
+            )
+            hash_origen = cache.hash_origen(settings.FOLDER_DATA_RAW / dataset)
+            parametros = parametros_cache(wt, args)
+            clave = cache.clave(hash_origen, parametros)
+
+    # La clave sale del hash guardado del original y de los parámetros,
+    # un acierto no lee el dataset original
+    if cache is not None and recuperar_de_cache(cache, clave, ruta_completa):
+        mostrar_inicio(ruta_completa)
+        return
+
+    if args.chunksize is not None:
+        inicio = time.perf_counter()
+        try:
+            filas = transformar_dataset_por_chunks(
+                wt, settings.FOLDER_DATA_RAW / dataset, ruta_completa, args.chunksize
+            )
+        except NonValidDataset as exc:
+            print(f"Dataset erróneo. Error: {exc}")
+            return
+
+        if cache is not None:
+            cache.registrar(
+                clave,
+                ruta_completa,
+                hash_origen,
+                parametros,
+                filas,
+                time.perf_counter() - inicio,
+            )
+            desalojar_cache(cache, args.cache_max_mb, ruta_completa)
+        registrar_en_catalogo(ruta_completa, filas=filas)
+        print(f"Guardado dataset correctamente ({filas} filas) en:")
+        print(ruta_completa)
+        if args.profile:
+            mostrar_perfil(wt)
+        if args.guardar_transformer:
+            guardar_transformer(wt, args)
+        return
+
+    # Verificar que se trate de un archivo válido, si lo es carga el dataset
+    try:
+        df_train = is_valid_dataframe(settings.FOLDER_DATA_RAW, dataset, esquema.RAW)
+    except NonValidDataset as exc:
+        print(f"Dataset erróneo. Error: {exc}")
+        return
+
+    # Aplicamos las transformaciones pasadas por consola. Las columnas
+    # derivadas que ya se hayan calculado antes se leen del almacén
+    almacen = None
+    if not args.no_cache:
+        almacen = crear_almacen(settings.FOLDER_DATA_RAW / dataset)
+    inicio = time.perf_counter()
+    df_train_transformed = wt.fit_transform(df_train, almacen=almacen)
+    if almacen is not None:
+        mostrar_almacen(almacen)
     print(df_train_transformed.columns)
     print(df_train_transformed.head())
+    if args.profile:
+        mostrar_perfil(wt)
+
+    if args.guardar_transformer:
+        guardar_transformer(wt, args)
 
     if args.save:
-        nombre_dataset: str = generate_dataset_name(args)
-        ruta_completa = settings.FOLDER_DATA_PROCESSED / nombre_dataset
-        df_train_transformed.to_csv(ruta_completa)
+        guardar_dataset(df_train_transformed, ruta_completa)
+        registrar_en_catalogo(ruta_completa, df_train_transformed)
+        if cache is not None:
+            cache.registrar(
+                clave,
+                ruta_completa,
+                hash_origen,
+                parametros,
+                len(df_train_transformed),
+                time.perf_counter() - inicio,
+            )
+            desalojar_cache(cache, args.cache_max_mb, ruta_completa)
 
         print("Guardado dataset correctamente en:")
         print(ruta_completa)
@@ -0,0 +1,330 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Caché de datasets transformados.
+
+Cada dataset guardado en ``data/processed`` se registra en un índice
+sqlite con una clave que depende del contenido del archivo original y
+de los parámetros del ``WineDatasetTransformer``. Si se vuelve a pedir
+la misma transformación sobre el mismo archivo se reutiliza el
+dataset guardado en lugar de recalcularlo.
+
+Además, cada columna derivada se guarda por separado en un almacén
+de columnas, de modo que una combinación nueva de parámetros solo
+calcula las columnas que no se hayan calculado antes.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+import time
+from types import TracebackType
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+from aidtecsolutions.utils import hash_archivo
+
+
+class CacheDatasets:
+    """Índice sqlite de los datasets transformados de una carpeta.
+    Varios procesos pueden usarlo a la vez: sqlite serializa las
+    escrituras y cada una modifica solo sus filas. Se usa como
+    context manager para cerrar la conexión
+
+    Parameters
+    ----------
+    carpeta : Path
+        Carpeta con los datasets transformados
+    nombre_indice : str, optional
+        Nombre del archivo sqlite del índice dentro de ``carpeta``
+    """
+
+    def __init__(
+        self, carpeta: Path, nombre_indice: str = ".cache_datasets.sqlite"
+    ) -> None:
+        self.carpeta = Path(carpeta)
+        self.ruta_indice = self.carpeta / nombre_indice
+        self.conexion = sqlite3.connect(self.ruta_indice, timeout=30)
+        with self.conexion:
+            self.conexion.execute(
+                """CREATE TABLE IF NOT EXISTS entradas (
+                    clave TEXT PRIMARY KEY,
+                    archivo TEXT NOT NULL,
+                    hash_origen TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    filas INTEGER NOT NULL,
+                    segundos REAL NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    creado REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL,
+                    aciertos INTEGER NOT NULL
+                )"""
+            )
+            self.conexion.execute(
+                """CREATE TABLE IF NOT EXISTS origenes (
+                    ruta TEXT PRIMARY KEY,
+                    tamano INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )"""
+            )
+
+    def __enter__(self) -> "CacheDatasets":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.conexion.close()
+
+    def hash_origen(self, ruta: Path) -> str:
+        """Devuelve el sha256 del dataset original. Se guarda junto
+        con el tamaño y la fecha de modificación para no volver
+        a leer el archivo si no ha cambiado"""
+        estado = Path(ruta).stat()
+        origen = self.conexion.execute(
+            "SELECT tamano, mtime_ns, sha256 FROM origenes WHERE ruta = ?",
+            (str(ruta),),
+        ).fetchone()
+        if origen is not None and origen[:2] == (estado.st_size, estado.st_mtime_ns):
+            return str(origen[2])
+
+        sha256 = hash_archivo(ruta)
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO origenes VALUES (?, ?, ?, ?)",
+                (str(ruta), estado.st_size, estado.st_mtime_ns, sha256),
+            )
+        return sha256
+
+    @staticmethod
+    def clave(hash_origen: str, parametros: dict[str, Any]) -> str:
+        """Clave de la caché a partir del hash del dataset
+        original y de los parámetros de la transformación"""
+        contenido = json.dumps(
+            {"origen": hash_origen, "parametros": parametros},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def buscar(self, clave: str) -> Path | None:
+        """Devuelve la ruta del dataset guardado con esa clave o None
+        si no existe o se ha modificado desde que se registró. Un
+        acierto solo actualiza su fila del índice"""
+        entrada = self.conexion.execute(
+            "SELECT archivo, mtime_ns FROM entradas WHERE clave = ?", (clave,)
+        ).fetchone()
+        if entrada is None:
+            return None
+        archivo, mtime_ns = entrada
+        ruta = self.carpeta / str(archivo)
+        with self.conexion:
+            if not ruta.exists() or ruta.stat().st_mtime_ns != mtime_ns:
+                # Entrada obsoleta
+                self.conexion.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+                return None
+            self.conexion.execute(
+                "UPDATE entradas SET ultimo_acceso = ?, aciertos = aciertos + 1 "
+                "WHERE clave = ?",
+                (time.time(), clave),
+            )
+        return ruta
+
+    def registrar(
+        self,
+        clave: str,
+        ruta: Path,
+        hash_origen: str,
+        parametros: dict[str, Any],
+        filas: int,
+        segundos: float,
+    ) -> None:
+        """Registra en el índice un dataset recién guardado
+
+        Parameters
+        ----------
+        clave : str
+            _description_
+        ruta : Path
+            Ruta del dataset guardado, dentro de la carpeta de la caché
+        hash_origen : str
+            sha256 del dataset original
+        parametros : dict[str, Any]
+            Parámetros de la transformación
+        filas : int
+            Número de filas del dataset guardado
+        segundos : float
+            Tiempo que ha costado calcularlo
+        """
+        estado = Path(ruta).stat()
+        ahora = time.time()
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO entradas "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    clave,
+                    Path(ruta).relative_to(self.carpeta).as_posix(),
+                    hash_origen,
+                    json.dumps(parametros, sort_keys=True, default=str),
+                    filas,
+                    segundos,
+                    estado.st_size,
+                    estado.st_mtime_ns,
+                    ahora,
+                    ahora,
+                    0,
+                ),
+            )
+
+    def desalojar(
+        self, max_bytes: int | None = None, max_entradas: int | None = None
+    ) -> list[Path]:
+        """Borra los datasets de la caché usados hace más tiempo
+        hasta que ocupen como mucho ``max_bytes`` y haya como
+        mucho ``max_entradas``. Solo se borran archivos
+        registrados en el índice.
+
+        Returns
+        -------
+        list[Path]
+            Rutas de los datasets borrados
+        """
+        borrados = []
+        with self.conexion:
+            entradas = self.conexion.execute(
+                "SELECT clave, archivo, tamano FROM entradas ORDER BY ultimo_acceso"
+            ).fetchall()
+            total_bytes = sum(tamano for _, _, tamano in entradas)
+            restantes = len(entradas)
+            for clave, archivo, tamano in entradas:
+                if not (
+                    (max_bytes is not None and total_bytes > max_bytes)
+                    or (max_entradas is not None and restantes > max_entradas)
+                ):
+                    break
+                ruta = self.carpeta / archivo
+                ruta.unlink(missing_ok=True)
+                self.conexion.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+                total_bytes -= tamano
+                restantes -= 1
+                borrados.append(ruta)
+        return borrados
+
+
+class AlmacenColumnas:
+    """Columnas derivadas de un dataset original guardadas en disco,
+    un archivo ``.npy`` por columna. Cada columna se identifica por su
+    nombre y por los parámetros de los que depende su cálculo
+
+    Parameters
+    ----------
+    carpeta : Path
+        Carpeta raíz del almacén
+    hash_origen : str
+        sha256 del dataset original. Sus columnas se guardan
+        en una subcarpeta propia
+    cache : CacheDatasets | None, optional
+        Caché en la que se registran las columnas guardadas para
+        que cuenten en su tamaño y se puedan desalojar. ``carpeta``
+        tiene que estar dentro de la carpeta de la caché,
+        by default None
+    """
+
+    def __init__(
+        self, carpeta: Path, hash_origen: str, cache: CacheDatasets | None = None
+    ):
+        self.carpeta = Path(carpeta) / hash_origen
+        self.hash_origen = hash_origen
+        self.cache = cache
+        self.leidas: list[str] = []
+        self.calculadas: list[str] = []
+
+    def _clave(self, columna: str, dependencias: dict[str, Any]) -> str:
+        contenido = json.dumps(
+            {"columna": columna, "dependencias": dependencias},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def _ruta(self, columna: str, dependencias: dict[str, Any]) -> Path:
+        return self.carpeta / f"{self._clave(columna, dependencias)}.npy"
+
+    def cargar(
+        self, columna: str, dependencias: dict[str, Any], filas: int
+    ) -> NDArray[Any] | None:
+        """Devuelve la columna guardada o None si no existe
+        o no tiene ``filas`` valores
+
+        Parameters
+        ----------
+        columna : str
+            _description_
+        dependencias : dict[str, Any]
+            Parámetros de los que depende la columna
+        filas : int
+            _description_
+
+        Returns
+        -------
+        NDArray[Any] | None
+            _description_
+        """
+        ruta = self._ruta(columna, dependencias)
+        if not ruta.exists():
+            return None
+        valores: NDArray[Any] = np.load(ruta)
+        if len(valores) != filas:
+            return None
+        if self.cache is not None:
+            # Marca la columna como usada para el desalojo
+            self.cache.buscar(f"columna-{self._clave(columna, dependencias)}")
+        self.leidas.append(columna)
+        return valores
+
+    def guardar(
+        self, columna: str, dependencias: dict[str, Any], valores: NDArray[Any]
+    ) -> None:
+        """Guarda una columna recién calculada"""
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        clave = self._clave(columna, dependencias)
+        ruta = self.carpeta / f"{clave}.npy"
+        # Escritura atómica en un temporal propio de cada proceso para
+        # no dejar columnas a medias si dos procesos guardan la misma
+        with tempfile.NamedTemporaryFile(
+            dir=self.carpeta, suffix=".tmp", delete=False
+        ) as f:
+            np.save(f, valores)
+        os.replace(f.name, ruta)
+        if self.cache is not None:
+            self.cache.registrar(
+                f"columna-{clave}",
+                ruta,
+                self.hash_origen,
+                {"columna": columna, "dependencias": dependencias},
+                len(valores),
+                0.0,
+            )
+        self.calculadas.append(columna)
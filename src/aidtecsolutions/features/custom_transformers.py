@@ -14,19 +14,190 @@
 
 """Script que recoge los transformers personalizados"""
 
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Callable, ContextManager, Iterable, Iterator
+
+from joblib import Parallel, delayed, effective_n_jobs
 import numpy as np
 from numpy.typing import NDArray
 import pandas as pd
+from scipy.stats import gaussian_kde
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.ensemble import IsolationForest
-from sklearn.metrics.pairwise import rbf_kernel
-from sklearn.preprocessing import (
-    StandardScaler,
-    FunctionTransformer,
-    OneHotEncoder,
-)
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.utils.validation import check_is_fitted
 
 from aidtecsolutions.custom_exceptions import WrongColumnName, WrongColumnType
+from aidtecsolutions.features.cache import AlmacenColumnas
+from aidtecsolutions.features.perfil import MedidaPaso, Perfilador
+
+# Modos del dioxido de azufre total y gammas de sus similitudes rbf,
+# elegidos en el análisis exploratorio
+RBF_CENTROS = (27.0, 126.0)
+RBF_GAMMAS = (0.003, 2.5e-4)
+
+
+def _muestreo_reservorio(
+    bloques: Iterable[pd.DataFrame], max_muestras: int, random_state: int = 42
+) -> pd.DataFrame:
+    """Devuelve una muestra uniforme de como mucho ``max_muestras``
+    filas de un iterable de bloques, sin cargarlos todos a la vez
+    (algoritmo R de muestreo de reservorio).
+
+    Parameters
+    ----------
+    bloques : Iterable[pd.DataFrame]
+        _description_
+    max_muestras : int
+        Número máximo de filas de la muestra
+    random_state : int, optional
+        _description_, by default 42
+
+    Returns
+    -------
+    pd.DataFrame
+        Muestra con las filas en el orden en que se leyeron
+        mientras no se supera ``max_muestras``
+    """
+    rng = np.random.default_rng(random_state)
+    muestra: pd.DataFrame | None = None
+    vistas = 0
+    for bloque in bloques:
+        if muestra is None:
+            muestra = bloque.iloc[:max_muestras].copy()
+            resto = bloque.iloc[max_muestras:]
+        elif len(muestra) < max_muestras:
+            faltan = max_muestras - len(muestra)
+            muestra = pd.concat([muestra, bloque.iloc[:faltan]])
+            resto = bloque.iloc[faltan:]
+        else:
+            resto = bloque
+        vistas += len(bloque) - len(resto)
+        if len(resto) == 0:
+            continue
+        # Cada fila t sustituye a una posición aleatoria en [0, t]
+        # si esta cae dentro del reservorio
+        posiciones = rng.integers(0, np.arange(vistas, vistas + len(resto)) + 1)
+        dentro = posiciones < max_muestras
+        # Si dos filas caen en la misma posición gana la última, como en el
+        # algoritmo secuencial
+        posiciones_dentro, ultimas = np.unique(
+            posiciones[dentro][::-1], return_index=True
+        )
+        filas = np.flatnonzero(dentro)[::-1][ultimas]
+        seleccion = np.arange(max_muestras)
+        seleccion[posiciones_dentro] = max_muestras + np.arange(len(filas))
+        muestra = pd.concat([muestra, resto.iloc[filas]]).iloc[seleccion]
+        vistas += len(resto)
+    if muestra is None:
+        raise ValueError("No hay bloques con los que muestrear")
+    return muestra
+
+
+def _densidad_kde(
+    valores: NDArray[np.float64], puntos: int = 1024
+) -> tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.float64]]:
+    """Estima la densidad de ``valores`` con un KDE gaussiano sobre
+    una rejilla que cubre del percentil 0.5 al 99.5.
+
+    Parameters
+    ----------
+    valores : NDArray[np.float64]
+        _description_
+    puntos : int, optional
+        Puntos de la rejilla, by default 1024
+
+    Returns
+    -------
+    tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.float64]]
+        La rejilla, la densidad en cada punto y su segunda derivada
+    """
+    inicio, fin = np.percentile(valores, [0.5, 99.5])
+    rejilla = np.linspace(inicio, fin, puntos)
+    densidad: NDArray[np.float64] = gaussian_kde(valores)(rejilla)
+    curvatura = np.gradient(np.gradient(densidad, rejilla), rejilla)
+    return rejilla, densidad, curvatura
+
+
+def _rbf_por_densidad(
+    valores: NDArray[np.float64],
+    centros: NDArray[np.float64] | None = None,
+    n_modos: int = 2,
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """Centros y gammas de las similitudes rbf a partir de la
+    densidad de ``valores``.
+
+    Sin ``centros`` se usan los ``n_modos`` picos más altos de la
+    densidad. La gamma de cada centro es la de la gaussiana que se
+    ajusta a la densidad en ese punto, ``gamma = -f'' / (2 f)``. Si
+    la densidad no es cóncava en un centro se usa la varianza de
+    todos los valores.
+
+    Parameters
+    ----------
+    valores : NDArray[np.float64]
+        _description_
+    centros : NDArray[np.float64] | None, optional
+        _description_, by default None
+    n_modos : int, optional
+        _description_, by default 2
+
+    Returns
+    -------
+    tuple[NDArray[np.float64], NDArray[np.float64]]
+        Centros en orden creciente y sus gammas
+
+    Raises
+    ------
+    ValueError
+        Si la densidad tiene menos de ``n_modos`` picos
+    """
+    rejilla, densidad, curvatura = _densidad_kde(valores)
+    if centros is None:
+        interior = densidad[1:-1]
+        picos = (
+            np.flatnonzero((interior > densidad[:-2]) & (interior >= densidad[2:])) + 1
+        )
+        if len(picos) < n_modos:
+            raise ValueError(
+                f"La densidad tiene {len(picos)} modos y se han pedido {n_modos}"
+            )
+        picos = np.sort(picos[np.argsort(densidad[picos])[::-1][:n_modos]])
+        centros = rejilla[picos]
+    f = np.interp(centros, rejilla, densidad)
+    f2 = np.interp(centros, rejilla, curvatura)
+    gammas = np.full(len(centros), 1 / (2 * np.var(valores)))
+    concava = (f2 < 0) & (f > 0)
+    gammas[concava] = -f2[concava] / (2 * f[concava])
+    return np.asarray(centros, dtype="float64"), gammas
+
+
+def _sin_copia(X: pd.DataFrame) -> pd.DataFrame:
+    return X
+
+
+def _columnas(X: pd.DataFrame) -> dict[str, NDArray[Any]]:
+    """Arrays de cada columna, sin copiarlos"""
+    return {nombre: serie.to_numpy() for nombre, serie in X.items()}
+
+
+def _ensamblar(columnas: dict[str, NDArray[Any]], indice: pd.Index) -> pd.DataFrame:
+    """Crea un DataFrame con los arrays de cada columna. A diferencia
+    de ``pd.concat`` y de asignar columnas, no los copia ni los
+    consolida en bloques por tipo"""
+    return pd.DataFrame(columnas, index=indice, copy=False)
+
+
+def _concatenar(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """Une por filas DataFrames con las mismas columnas copiando
+    cada columna una sola vez"""
+    columnas = {
+        nombre: np.concatenate([parte[nombre].to_numpy() for parte in partes])
+        for nombre in partes[0].columns
+    }
+    indice = partes[0].index.append([parte.index for parte in partes[1:]])
+    return _ensamblar(columnas, indice)
 
 
 class WineDatasetTransformer(TransformerMixin, BaseEstimator):
@@ -40,31 +211,72 @@ class WineDatasetTransformer(TransformerMixin, BaseEstimator):
         densidad_alcohol_interaction: bool = True,
         ratio_diox: bool = True,
         rbf_diox: bool = True,
+        rbf_centros: list[float] | str | None = None,
+        rbf_gammas: list[float] | float | None = None,
+        rbf_n_modos: int = 2,
         remove_outliers: bool = False,
+        outliers_max_samples: int | float | str = "auto",
+        outliers_n_jobs: int | None = None,
         standardize: bool = False,
         log_transformation: list[str] | None = None,
         drop_columns: list[str] | None = None,
         shuffle: bool = True,
+        profile: bool = False,
+        profile_callbacks: list[Callable[[MedidaPaso], None]] | None = None,
+        copy: bool = True,
+        n_jobs: int | None = None,
     ) -> None:
         """Inicializa los parámetros de transformación
-        a aplicar"""
+        a aplicar. Con ``profile`` se mide el tiempo, las filas
+        y el pico de memoria de cada paso (ver ``informe_perfil``)
+        y cada medida se pasa a los ``profile_callbacks``. Con
+        ``copy=False`` no se copia X: los pasos lo modifican y el
+        resultado puede compartir memoria con él. Con ``n_jobs``
+        ``transform`` reparte las filas en particiones que se
+        transforman a la vez en un pool de hilos.
+
+        Las similitudes rbf del dioxido de azufre total usan por
+        defecto ``RBF_CENTROS`` y ``RBF_GAMMAS``. Con
+        ``rbf_centros="kde"`` los centros son los ``rbf_n_modos``
+        modos de la densidad estimada en fit. Si no se pasan
+        ``rbf_gammas`` para centros propios o ajustados, las gammas
+        también se estiman con la densidad.
+
+        El IsolationForest de ``remove_outliers`` se ajusta una sola
+        vez en fit con una muestra de como mucho
+        ``max_muestras_outliers`` filas. ``outliers_max_samples`` y
+        ``outliers_n_jobs`` son su ``max_samples`` y su ``n_jobs``"""
         self.corregir_alcohol = corregir_alcohol
         self.corregir_densidad = corregir_densidad
         self.color_interactions = color_interactions
         self.densidad_alcohol_interaction = densidad_alcohol_interaction
         self.ratio_diox = ratio_diox
         self.rbf_diox = rbf_diox
-        self.sf_coords = 27, 126  # Coordenadas de los clusters
+        self.rbf_centros = rbf_centros
+        self.rbf_gammas = rbf_gammas
+        self.rbf_n_modos = rbf_n_modos
         self.isolation_forest = IsolationForest(random_state=42)
-        self.gamma_1 = 0.003
-        self.gamma_2 = 2.5e-4
         self.remove_outliers = remove_outliers
+        self.outliers_max_samples = outliers_max_samples
+        self.outliers_n_jobs = outliers_n_jobs
         self.standardize = standardize
         self.sc = StandardScaler()
         self.oh_encoder = OneHotEncoder(drop="if_binary", sparse_output=False)
-        self.log_transformation_list = log_transformation
-        self.drop_columns_list = drop_columns
+        self.log_transformation = log_transformation
+        self.drop_columns = drop_columns
         self.shuffle = shuffle
+        self.profile = profile
+        self.profile_callbacks = profile_callbacks
+        self.copy = copy
+        self.n_jobs = n_jobs
+        # Filas máximas para ajustar IsolationForest en fit_por_chunks
+        self.max_muestras_outliers = 100_000
+        # Filas puntuadas de cada vez al detectar outliers
+        self.filas_por_bloque_outliers = 100_000
+        # Filas mínimas de cada partición de transform con n_jobs
+        self.min_filas_particion = 10_000
+        # Filas máximas con las que se estima la densidad de las rbf
+        self.max_muestras_kde = 10_000
 
     def _filtrar_alcohol_malos(self, feature: pd.Series) -> pd.Series:
         """Devuelve los valores filtrados de
@@ -87,6 +299,90 @@ class WineDatasetTransformer(TransformerMixin, BaseEstimator):
         moviendo la coma hacia la izquierda de los valores
         filtrados erróneos.
 
+        Versión vectorizada: convierte la columna a un bloque de
+        bytes de ancho fijo y repara todos los valores erróneos
+        a la vez con NumPy. El resultado es idéntico bit a bit
+        al de ``_corregir_valores_alcohol_pandas``.
+
+        Parameters
+        ----------
+        feature : pd.Series
+            Variable alcohol de tipo object
+
+        Returns
+        -------
+        pd.Series
+            Devuelve la variable corregida como float64
+
+        Raises
+        ------
+        ValueError
+            Si la feature no es de tipo object ni numérica
+        """
+        if pd.api.types.is_numeric_dtype(feature):
+            # Ya viene como número (por ejemplo un lote pequeño sin valores
+            # erróneos), no hay nada que corregir
+            return feature.astype("float64")
+        if feature.dtype != "O":
+            raise ValueError("La feature debe ser de tipo object")
+
+        try:
+            valores = feature.to_numpy().astype("S")
+        except (UnicodeEncodeError, TypeError):
+            # Valores no ASCII o no convertibles: usamos la versión original
+            return self._corregir_valores_alcohol_pandas(feature)
+
+        # Matriz (n_filas, ancho) con los bytes de cada valor
+        ancho = max(valores.dtype.itemsize, 1)
+        bytes_ = valores.view(np.uint8).reshape(-1, ancho)
+        # Un valor tiene más de 5 caracteres si su sexto byte no es nulo
+        if ancho > 5:
+            malos = bytes_[:, 5] != 0
+        else:
+            malos = np.zeros(len(valores), dtype=bool)
+
+        resultado = np.empty(len(valores), dtype="float64")
+        resultado[~malos] = valores[~malos].astype("float64")
+
+        if malos.any():
+            bytes_malos = bytes_[malos]
+            # Quitamos los puntos desplazando el resto de caracteres a la izquierda
+            es_caracter = (bytes_malos != ord(".")) & (bytes_malos != 0)
+            orden = np.argsort(~es_caracter, axis=1, kind="stable")
+            caracteres = np.take_along_axis(bytes_malos, orden, axis=1)
+            n_caracteres = es_caracter.sum(axis=1)
+            # Si empieza por 8 o 9 agregamos un 0 delante
+            empieza_8_9 = (caracteres[:, 0] == ord("8")) | (
+                caracteres[:, 0] == ord("9")
+            )
+            if (n_caracteres + empieza_8_9 < 4).any():
+                return self._corregir_valores_alcohol_pandas(feature)
+
+            digitos = np.where(
+                empieza_8_9[:, None],
+                np.column_stack(
+                    [np.full(len(caracteres), ord("0"), np.uint8), caracteres[:, :3]]
+                ),
+                caracteres[:, :4],
+            )
+            # Añadimos el punto desde la posición 2: d0 d1 . d1 d2 d3
+            corregidos = np.empty((len(digitos), 6), dtype=np.uint8)
+            corregidos[:, :2] = digitos[:, :2]
+            corregidos[:, 2] = ord(".")
+            corregidos[:, 3:] = digitos[:, 1:4]
+            resultado[malos] = corregidos.view("S6").ravel().astype("float64")
+
+        return pd.Series(resultado, index=feature.index, name=feature.name)
+
+    def _corregir_valores_alcohol_pandas(self, feature: pd.Series) -> pd.Series:
+        """Corrige los valores de la variable alcohol
+        moviendo la coma hacia la izquierda de los valores
+        filtrados erróneos.
+
+        Implementación original con operaciones ``.str`` de pandas.
+        Se mantiene como referencia y como alternativa cuando la
+        versión vectorizada no puede aplicarse.
+
         Parameters
         ----------
         feature : pd.Series
@@ -127,6 +423,12 @@ class WineDatasetTransformer(TransformerMixin, BaseEstimator):
         densidad dividiendo por 10 hasta que se llegue a la
         unidad.
 
+        La escala de cada valor se calcula de una vez para toda
+        la columna con ``floor(log10)``. Las divisiones se aplican
+        de forma vectorizada y una a una para obtener exactamente
+        los mismos valores que dividir por 10 en bucle. Los valores
+        entre 2 y 10 no se modifican.
+
         Parameters
         ----------
         feature : pd.Series
@@ -137,122 +439,733 @@ class WineDatasetTransformer(TransformerMixin, BaseEstimator):
         pd.Series
             Devuelve la variable corregida
         """
-        # Copiamos la feature
-        feature_ = feature.copy()
-        # Filtramos los valores erroneos
-        feature_malos = feature_[feature_ > 2]
+        valores = feature.to_numpy(dtype="float64", copy=True)
+        # Filtramos los valores erroneos (los infinitos se dejan como están)
+        malos = np.isfinite(valores) & (valores >= 10)
+        corregidos = valores[malos]
 
-        # Creamos función que procese los valores malos
-        def dividir_por_diez(valor: float) -> float:
-            while valor >= 10:  # Mientras el valor sea igual o mayor a 10,
-                valor /= 10  # dividir entre 10.
-            return valor
+        # Número de divisiones entre 10. Restamos una porque log10 puede
+        # redondear hacia arriba justo por debajo de una potencia de 10
+        n_divisiones = np.floor(np.log10(corregidos)).astype("int64") - 1
+        for paso in range(n_divisiones.max(initial=0)):
+            corregidos[n_divisiones > paso] /= 10
 
-        feature_corregidos = feature_malos.apply(dividir_por_diez)
+        # Terminamos los que todavía sean iguales o mayores a 10
+        pendientes = corregidos >= 10
+        while pendientes.any():
+            corregidos[pendientes] /= 10
+            pendientes = corregidos >= 10
 
-        # Sustituimos los corregidos
-        feature_[feature_malos.index] = feature_corregidos
+        valores[malos] = corregidos
+        return pd.Series(valores, index=feature.index, name=feature.name)
 
-        return feature_
+    def _validar_columnas(self, X: pd.DataFrame) -> None:
+        """Comprueba que existan las columnas de las
+        transformaciones logarítmicas y de los drops
 
-    def fit(
-        self, X: NDArray[np.float_] | pd.DataFrame, y=None
-    ) -> "WineDatasetTransformer":
-        coord1, coord2 = self.sf_coords
-        self.rbf_transformer_1 = FunctionTransformer(
-            rbf_kernel, kw_args=dict(Y=[[coord1]], gamma=self.gamma_1)
-        )
-        self.rbf_transformer_2 = FunctionTransformer(
-            rbf_kernel, kw_args=dict(Y=[[coord2]], gamma=self.gamma_2)
-        )
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+
+        Raises
+        ------
+        WrongColumnName
+            Si alguna de las columnas no existe
+        """
         # Validación de logs
-        if self.log_transformation_list is not None:
-            for col in self.log_transformation_list:
+        if self.log_transformation is not None:
+            for col in self.log_transformation:
                 if col not in X:
                     raise WrongColumnName(f"La columna {col} no es correcta")
 
         # Validacion drops
-        if self.drop_columns_list is not None:
-            for col in self.drop_columns_list:
+        if self.drop_columns is not None:
+            for col in self.drop_columns:
                 if col not in X:
                     raise WrongColumnName(f"La columna {col} no es correcta")
 
-        return self
+    def _crear_features(
+        self,
+        X: pd.DataFrame,
+        copiar: bool = True,
+        almacen: AlmacenColumnas | None = None,
+    ) -> pd.DataFrame:
+        """Aplica las transformaciones que solo dependen
+        de cada fila: correcciones, binarización del color,
+        interacciones, ratio y similitudes rbf.
 
-    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
-        X_ = X.copy()
+        Las columnas nuevas se escriben en un único bloque float64
+        reservado de antemano que se une a X al final sin copiarlo.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+        copiar : bool, optional
+            Si es False los pasos modifican directamente X, by default True
+        almacen : AlmacenColumnas | None, optional
+            Almacén con las columnas ya calculadas del dataset X. Las
+            correcciones y las columnas nuevas se leen de él si están
+            y se guardan en él si no, by default None
+
+        Returns
+        -------
+        pd.DataFrame
+            Devuelve un DataFrame nuevo con las nuevas features. Las
+            columnas que no cambian pueden compartir memoria con X
+        """
+        X_ = self._paso("copia", self._copiar if copiar else _sin_copia, X)
         if self.corregir_alcohol:
-            # Corregimos alcohol
-            X_["alcohol"] = self._corregir_valores_alcohol(X_["alcohol"])
+            X_ = self._paso(
+                "corregir_alcohol",
+                self._almacenado(
+                    "corregir_alcohol",
+                    self._paso_corregir_alcohol,
+                    ["alcohol"],
+                    almacen,
+                ),
+                X_,
+            )
         if self.corregir_densidad:
-            # Corregimos densidad
-            X_["densidad"] = self._corregir_valores_densidad(X_["densidad"])
+            X_ = self._paso(
+                "corregir_densidad",
+                self._almacenado(
+                    "corregir_densidad",
+                    self._paso_corregir_densidad,
+                    ["densidad"],
+                    almacen,
+                ),
+                X_,
+            )
+        X_ = self._paso("color", self._paso_color, X_)
+
+        pasos = [
+            (activo, nombre, funcion, columnas)
+            for activo, nombre, funcion, columnas in (
+                (
+                    self.color_interactions,
+                    "color_interactions",
+                    self._paso_color_interactions,
+                    ["color_acidez_vol", "color_dioxido_azufre", "color_cloruros"],
+                ),
+                (
+                    self.densidad_alcohol_interaction,
+                    "densidad_alcohol_interaction",
+                    self._paso_densidad_alcohol,
+                    ["densidad_alcohol"],
+                ),
+                (
+                    self.ratio_diox,
+                    "ratio_diox",
+                    self._paso_ratio_diox,
+                    ["SO2_l / SO2_tot"],
+                ),
+                (
+                    self.rbf_diox,
+                    "rbf_diox",
+                    self._paso_rbf_diox,
+                    [f"diox_simil_{i}" for i in range(1, len(self.rbf_centros_) + 1)],
+                ),
+            )
+            if activo
+        ]
+        nombres = [columna for *_, columnas in pasos for columna in columnas]
+        if not nombres:
+            return X_
+
+        # Cada fila del bloque es una columna nueva, contigua en memoria
+        bloque = np.empty((len(nombres), len(X_)), dtype="float64")
+        inicio = 0
+        for _, nombre, funcion, columnas in pasos:
+            fin = inicio + len(columnas)
+            destino = bloque[inicio:fin]
+            inicio = fin
+            X_ = self._paso(
+                nombre,
+                self._almacenado(
+                    nombre,
+                    partial(funcion, destino=destino),
+                    columnas,
+                    almacen,
+                    destino,
+                ),
+                X_,
+            )
+
+        return _ensamblar({**_columnas(X_), **dict(zip(nombres, bloque))}, X_.index)
+
+    def _dependencias(self, paso: str) -> dict[str, Any]:
+        """Parámetros de los que dependen las columnas que crea
+        cada paso, además de los valores del dataset original"""
+        correcciones = {
+            "corregir_alcohol": self.corregir_alcohol,
+            "corregir_densidad": self.corregir_densidad,
+        }
+        dependencias: dict[str, dict[str, Any]] = {
+            "corregir_alcohol": {},
+            "corregir_densidad": {},
+            # El color binarizado depende de las categorías vistas en fit
+            "color_interactions": {
+                "categorias": [list(c) for c in self.oh_encoder.categories_]
+            },
+            "densidad_alcohol_interaction": correcciones,
+            "ratio_diox": {},
+            "rbf_diox": {
+                "centros": self.rbf_centros_.tolist(),
+                "gammas": self.rbf_gammas_.tolist(),
+            },
+        }
+        return {"paso": paso, **dependencias[paso]}
+
+    def _almacenado(
+        self,
+        paso: str,
+        funcion: Callable[[pd.DataFrame], pd.DataFrame],
+        columnas: list[str],
+        almacen: AlmacenColumnas | None,
+        destino: NDArray[np.float64] | None = None,
+    ) -> Callable[[pd.DataFrame], pd.DataFrame]:
+        """Envuelve un paso para leer sus columnas del almacén si ya
+        están todas y guardarlas después de calcularlas si no.
+        Con ``destino`` las columnas se leen y se escriben en ese
+        bloque en lugar de en el DataFrame"""
+        if almacen is None:
+            return funcion
+        dependencias = self._dependencias(paso)
+
+        def paso_almacenado(X_: pd.DataFrame) -> pd.DataFrame:
+            guardadas = [
+                almacen.cargar(columna, dependencias, len(X_)) for columna in columnas
+            ]
+            if all(valores is not None for valores in guardadas):
+                for i, (columna, valores) in enumerate(zip(columnas, guardadas)):
+                    if destino is None:
+                        X_[columna] = valores
+                    else:
+                        destino[i] = valores
+                return X_
+
+            X_ = funcion(X_)
+            for i, columna in enumerate(columnas):
+                calculada = X_[columna].to_numpy() if destino is None else destino[i]
+                almacen.guardar(columna, dependencias, calculada)
+            return X_
+
+        return paso_almacenado
 
+    def _copiar(self, X: pd.DataFrame) -> pd.DataFrame:
+        """Copia superficial: los pasos sustituyen columnas enteras
+        y nunca escriben sobre los arrays de X"""
+        return X.copy(deep=False)
+
+    def _paso_corregir_alcohol(self, X_: pd.DataFrame) -> pd.DataFrame:
+        X_["alcohol"] = self._corregir_valores_alcohol(X_["alcohol"])
+        return X_
+
+    def _paso_corregir_densidad(self, X_: pd.DataFrame) -> pd.DataFrame:
+        X_["densidad"] = self._corregir_valores_densidad(X_["densidad"])
+        return X_
+
+    def _paso_color(self, X_: pd.DataFrame) -> pd.DataFrame:
         # Binarizamos la variable color
-        X_["color"] = self.oh_encoder.fit_transform(X_[["color"]]).astype("int64")
-
-        if self.color_interactions:
-            # Interacciones con la variable color
-            X_["color_acidez_vol"] = X_["color"] * X_["acidez volatil"]
-            X_["color_dioxido_azufre"] = X_["color"] * X_["dioxido de azufre total"]
-            X_["color_cloruros"] = X_["color"] * X_["cloruros"]
-        if self.densidad_alcohol_interaction:
-            # Interaccion densidad alcohol
-            # Hay que verificar que se pueda multiplicar
-            if X_["alcohol"].dtype == "object":
-                raise WrongColumnType(
-                    "Seguramente tengas que corregir la variable alcohol"
-                )
-            X_["densidad_alcohol"] = X_["densidad"] * X_["alcohol"]
-        if self.ratio_diox:
-            X_["SO2_l / SO2_tot"] = (
-                X_["dioxido de azufre libre"] / X_["dioxido de azufre total"]
+        X_["color"] = self.oh_encoder.transform(X_[["color"]]).astype("int64")
+        return X_
+
+    def _paso_color_interactions(
+        self, X_: pd.DataFrame, destino: NDArray[np.float64]
+    ) -> pd.DataFrame:
+        # Interacciones con la variable color
+        color = X_["color"].to_numpy()
+        np.multiply(color, X_["acidez volatil"].to_numpy(), out=destino[0])
+        np.multiply(color, X_["dioxido de azufre total"].to_numpy(), out=destino[1])
+        np.multiply(color, X_["cloruros"].to_numpy(), out=destino[2])
+        return X_
+
+    def _paso_densidad_alcohol(
+        self, X_: pd.DataFrame, destino: NDArray[np.float64]
+    ) -> pd.DataFrame:
+        # Interaccion densidad alcohol
+        # Hay que verificar que se pueda multiplicar
+        self._comprobar_alcohol_corregido(X_)
+        np.multiply(X_["densidad"].to_numpy(), X_["alcohol"].to_numpy(), out=destino[0])
+        return X_
+
+    def _paso_ratio_diox(
+        self, X_: pd.DataFrame, destino: NDArray[np.float64]
+    ) -> pd.DataFrame:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(
+                X_["dioxido de azufre libre"].to_numpy(),
+                X_["dioxido de azufre total"].to_numpy(),
+                out=destino[0],
+            )
+        return X_
+
+    def _paso_rbf_diox(
+        self, X_: pd.DataFrame, destino: NDArray[np.float64]
+    ) -> pd.DataFrame:
+        # Similitudes con todos los modos de diox azufre total en una
+        # sola pasada sobre el bloque: exp(-gamma * (x - centro)^2)
+        diox = X_["dioxido de azufre total"].to_numpy(dtype="float64")
+        np.subtract(diox, self.rbf_centros_[:, None], out=destino)
+        np.square(destino, out=destino)
+        destino *= -self.rbf_gammas_[:, None]
+        np.exp(destino, out=destino)
+        return X_
+
+    def _paso(
+        self,
+        nombre: str,
+        funcion: Callable[[pd.DataFrame], pd.DataFrame],
+        X: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """Aplica un paso y lo mide si ``profile`` está activo"""
+        if not self.profile:
+            return funcion(X)
+        return self.perfil_.medir(nombre, funcion, X)
+
+    def _fase(self, fase: str, reiniciar: bool = False) -> ContextManager[None]:
+        """Contexto de los métodos públicos. Al ajustar se empieza
+        un perfil nuevo y al transformar se añade al del ajuste"""
+        if not self.profile:
+            return nullcontext()
+        if reiniciar or not hasattr(self, "perfil_"):
+            self.perfil_ = Perfilador(self.profile_callbacks)
+        return self.perfil_.en_fase(fase)
+
+    def informe_perfil(self) -> pd.DataFrame:
+        """Tiempo, filas de entrada y salida y pico de memoria de
+        cada paso, agregados por fase. Requiere ``profile=True``
+
+        Returns
+        -------
+        pd.DataFrame
+            _description_
+        """
+        check_is_fitted(self, "perfil_")
+        return self.perfil_.informe()
+
+    def _comprobar_alcohol_corregido(self, X_: pd.DataFrame) -> None:
+        # Hay que asegurarse de haber corregido alcohol antes
+        # Sino da error
+        if X_["alcohol"].dtype == "object":
+            raise WrongColumnType("Seguramente tengas que corregir la variable alcohol")
+
+    def _predecir_outliers(self, X_: pd.DataFrame) -> NDArray[np.int_]:
+        """Devuelve 1 para los inliers y -1 para los outliers
+        usando el IsolationForest ajustado y el umbral guardado en
+        fit. Puntúa X_ por bloques para no convertir todo el
+        DataFrame a un array de una vez"""
+        self._comprobar_alcohol_corregido(X_)
+        puntuaciones = np.empty(len(X_), dtype="float64")
+        for inicio in range(0, len(X_), self.filas_por_bloque_outliers):
+            fin = inicio + self.filas_por_bloque_outliers
+            bloque = X_.iloc[inicio:fin]
+            puntuaciones[inicio:fin] = self.isolation_forest.score_samples(bloque)
+        # Igual que IsolationForest.predict: outlier si la puntuación
+        # queda por debajo del umbral
+        outlier_pred: NDArray[np.int_] = np.where(
+            puntuaciones < self.umbral_outliers_, -1, 1
+        )
+        return outlier_pred
+
+    def _ajustar_rbf(self, leer_diox: Callable[[], pd.Series]) -> None:
+        """Fija los centros y las gammas de las similitudes rbf.
+
+        Parameters
+        ----------
+        leer_diox : Callable[[], pd.Series]
+            Devuelve la variable dioxido de azufre total. Solo se
+            llama si hay que estimar su densidad
+
+        Raises
+        ------
+        ValueError
+            Si los parámetros de las rbf no son válidos
+        """
+        if isinstance(self.rbf_centros, str) and self.rbf_centros != "kde":
+            raise ValueError(
+                f"rbf_centros tiene que ser una lista o 'kde': {self.rbf_centros}"
             )
-            # Creamos variables distancias a los modos de diox azufre total
-        if self.rbf_diox:
-            diox_simil_1 = self.rbf_transformer_1.transform(
-                X_[["dioxido de azufre total"]]
+        if not self.rbf_diox:
+            self.rbf_centros_ = np.empty(0)
+            self.rbf_gammas_ = np.empty(0)
+            return
+
+        if self.rbf_centros == "kde" or (
+            self.rbf_centros is not None and self.rbf_gammas is None
+        ):
+            diox = leer_diox().dropna().to_numpy(dtype="float64")
+            if len(diox) > self.max_muestras_kde:
+                rng = np.random.default_rng(42)
+                diox = rng.choice(diox, self.max_muestras_kde, replace=False)
+            centros = None
+            if self.rbf_centros != "kde":
+                centros = np.asarray(self.rbf_centros, dtype="float64")
+            self.rbf_centros_, self.rbf_gammas_ = _rbf_por_densidad(
+                diox, centros, self.rbf_n_modos
             )
-            diox_simil_2 = self.rbf_transformer_2.transform(
-                X_[["dioxido de azufre total"]]
+        else:
+            centros_fijos = (
+                RBF_CENTROS if self.rbf_centros is None else self.rbf_centros
             )
-            X_["diox_simil_1"] = diox_simil_1
-            X_["diox_simil_2"] = diox_simil_2
+            self.rbf_centros_ = np.asarray(centros_fijos, dtype="float64")
+            self.rbf_gammas_ = np.asarray(RBF_GAMMAS, dtype="float64")
+
+        if self.rbf_gammas is not None:
+            gammas = np.asarray(self.rbf_gammas, dtype="float64")
+            if gammas.ndim > 0 and len(gammas) != len(self.rbf_centros_):
+                raise ValueError(
+                    f"Hay {len(gammas)} rbf_gammas para "
+                    f"{len(self.rbf_centros_)} centros"
+                )
+            self.rbf_gammas_ = np.broadcast_to(gammas, self.rbf_centros_.shape).copy()
+
+    def _ajustar(
+        self,
+        X: pd.DataFrame,
+        copiar: bool = True,
+        almacen: AlmacenColumnas | None = None,
+    ) -> pd.DataFrame:
+        """Aprende todo el estado del transformer: las funciones rbf,
+        las categorías de color, el IsolationForest y la media y
+        varianza del StandardScaler.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+        copiar : bool, optional
+            Si es False crea las features modificando X, by default True
+        almacen : AlmacenColumnas | None, optional
+            _description_, by default None
+
+        Returns
+        -------
+        pd.DataFrame
+            Features de X sin eliminar outliers ni estandarizar,
+            para poder reutilizarlas en ``fit_transform``
+        """
+        self._validar_columnas(X)
+        self._ajustar_rbf(lambda: X["dioxido de azufre total"])
+        self._paso("ajustar_color", self._ajustar_color, X)
+
+        X_ = self._crear_features(X, copiar, almacen)
+        inliers = X_
         if self.remove_outliers:
-            # Hay que asegurarse de haber corregido alcohol antes
-            # Sino da error
-            if X_["alcohol"].dtype == "object":
-                raise WrongColumnType(
-                    "Seguramente tengas que corregir la variable alcohol"
+            inliers = self._paso("ajustar_outliers", self._ajustar_outliers, X_)
+        if self.standardize:
+            self._paso("ajustar_standardize", self._ajustar_standardize, inliers)
+
+        self.columnas_entrada_ = list(X.columns)
+        self.n_samples_seen_ = len(X)
+        return X_
+
+    def _ajustar_color(self, X: pd.DataFrame) -> pd.DataFrame:
+        self.oh_encoder.fit(X[["color"]])
+        return X
+
+    def _ajustar_outliers(self, X_: pd.DataFrame) -> pd.DataFrame:
+        """Ajusta el IsolationForest y devuelve los inliers"""
+        muestra = X_
+        if len(X_) > self.max_muestras_outliers:
+            # La misma muestra que se obtiene en fit_por_chunks
+            muestra = _muestreo_reservorio([X_], self.max_muestras_outliers)
+        self._ajustar_isolation_forest(muestra)
+        # Predicciones sobre el dataset de entrenamiento
+        self.outlier_pred = self._predecir_outliers(X_)
+        return X_.iloc[self.outlier_pred == 1, :]
+
+    def _ajustar_isolation_forest(self, X_: pd.DataFrame) -> pd.DataFrame:
+        self._comprobar_alcohol_corregido(X_)
+        self.isolation_forest.set_params(
+            max_samples=self.outliers_max_samples, n_jobs=self.outliers_n_jobs
+        ).fit(X_)
+        # Umbral de la puntuación por debajo del cual una fila es outlier
+        self.umbral_outliers_ = float(self.isolation_forest.offset_)
+        return X_
+
+    def _ajustar_standardize(self, inliers: pd.DataFrame) -> pd.DataFrame:
+        self.sc = StandardScaler().fit(inliers.select_dtypes("float64"))
+        return inliers
+
+    def fit(
+        self, X: pd.DataFrame, y=None, almacen: AlmacenColumnas | None = None
+    ) -> "WineDatasetTransformer":
+        """Aprende el estado de las transformaciones una sola vez.
+        Después ``transform`` solo lo aplica, de modo que el dataset
+        de test se estandariza con la media y varianza de train.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+        y : _type_, optional
+            _description_, by default None
+        almacen : AlmacenColumnas | None, optional
+            Almacén de columnas del dataset original del que se ha
+            leído X, con todas sus filas y en el mismo orden. Las
+            columnas derivadas que ya estén guardadas no se vuelven
+            a calcular, by default None
+
+        Returns
+        -------
+        WineDatasetTransformer
+            _description_
+        """
+        with self._fase("fit", reiniciar=True):
+            self._ajustar(X, almacen=almacen)
+        return self
+
+    def fit_transform(
+        self, X: pd.DataFrame, y=None, almacen: AlmacenColumnas | None = None
+    ) -> pd.DataFrame:
+        """Equivale a ``fit(X).transform(X)`` pero calcula las
+        features de X una sola vez. ``almacen`` funciona igual
+        que en ``fit``"""
+        with self._fase("fit_transform", reiniciar=True):
+            X_ = self._ajustar(X, self.copy, almacen)
+            outlier_pred = self.outlier_pred if self.remove_outliers else None
+            X_ = self._aplicar_estado(X_, outlier_pred)
+        return self._independizar(X_, X)
+
+    def fit_por_chunks(
+        self, leer_chunks: Callable[[], Iterable[pd.DataFrame]]
+    ) -> "WineDatasetTransformer":
+        """Ajusta el transformer recorriendo el dataset por bloques,
+        sin cargarlo entero en memoria.
+
+        Cada paso con estado recorre de nuevo los bloques: primero
+        las categorías de color, después el IsolationForest sobre una
+        muestra de reservorio acotada y por último el StandardScaler
+        con ``partial_fit`` sobre los inliers.
+
+        Parameters
+        ----------
+        leer_chunks : Callable[[], Iterable[pd.DataFrame]]
+            Función que devuelve un iterable nuevo de bloques del
+            dataset en cada llamada, por ejemplo
+            ``lambda: pd.read_csv(ruta, index_col=0, chunksize=n)``
+
+        Returns
+        -------
+        WineDatasetTransformer
+            _description_
+        """
+        with self._fase("fit", reiniciar=True):
+            self._ajustar_por_chunks(leer_chunks)
+        return self
+
+    def _ajustar_por_chunks(
+        self, leer_chunks: Callable[[], Iterable[pd.DataFrame]]
+    ) -> None:
+        colores = []
+        n_samples_seen = 0
+        for chunk in leer_chunks():
+            self._validar_columnas(chunk)
+            self.columnas_entrada_ = list(chunk.columns)
+            colores.append(chunk[["color"]].drop_duplicates())
+            n_samples_seen += len(chunk)
+        self.oh_encoder.fit(pd.concat(colores).drop_duplicates())
+
+        def leer_diox() -> pd.Series:
+            # Muestra acotada para estimar la densidad sin cargar el dataset
+            bloques = (chunk[["dioxido de azufre total"]] for chunk in leer_chunks())
+            muestra = _muestreo_reservorio(bloques, self.max_muestras_kde)
+            return muestra["dioxido de azufre total"]
+
+        self._ajustar_rbf(leer_diox)
+
+        def leer_features() -> Iterator[pd.DataFrame]:
+            return (self._crear_features(chunk) for chunk in leer_chunks())
+
+        if self.remove_outliers:
+            muestra = _muestreo_reservorio(leer_features(), self.max_muestras_outliers)
+            self._paso("ajustar_outliers", self._ajustar_isolation_forest, muestra)
+
+        def ajustar_standardize(X_: pd.DataFrame) -> pd.DataFrame:
+            if self.remove_outliers:
+                X_ = X_.iloc[self._predecir_outliers(X_) == 1, :]
+            self.sc.partial_fit(X_.select_dtypes("float64"))
+            return X_
+
+        if self.standardize:
+            self.sc = StandardScaler()
+            for X_ in leer_features():
+                self._paso("ajustar_standardize", ajustar_standardize, X_)
+
+        self.n_samples_seen_ = n_samples_seen
+
+    def _aplicar_estado(
+        self,
+        X_: pd.DataFrame,
+        outlier_pred: NDArray[np.int_] | None = None,
+        barajar: bool = True,
+    ) -> pd.DataFrame:
+        """Aplica sobre las features los pasos que usan el estado
+        aprendido en fit, sin modificarlo. Con ``barajar=False`` no
+        baraja aunque ``shuffle`` esté activo"""
+        if self.remove_outliers:
+
+            def quitar_outliers(X_: pd.DataFrame) -> pd.DataFrame:
+                pred = (
+                    self._predecir_outliers(X_)
+                    if outlier_pred is None
+                    else outlier_pred
                 )
-            self.outlier_pred = self.isolation_forest.fit_predict(X_)
-            X_ = X_.iloc[self.outlier_pred == 1, :].reset_index(drop=True)
+                # El filtrado ya es una copia, cambiamos el índice sin copiar
+                inliers = X_.take(np.flatnonzero(pred == 1))
+                inliers.index = pd.RangeIndex(len(inliers))
+                return inliers
 
+            X_ = self._paso("remove_outliers", quitar_outliers, X_)
         if self.standardize:
-            # Hay que verificar si hay columnas tipo objeto
-            X_ = pd.concat(
-                [
-                    pd.DataFrame(
-                        self.sc.fit_transform(X_.select_dtypes("float64")),
-                        columns=self.sc.feature_names_in_,
-                        index=X_.index,
-                    ),
-                    X_.select_dtypes("object"),
-                    X_.select_dtypes("int64"),
-                ],
-                axis=1,
-            )
+            X_ = self._paso("standardize", self._paso_standardize, X_)
+        if self.log_transformation is not None:
+            X_ = self._paso("log_transformation", self._paso_log, X_)
+        if self.drop_columns is not None:
+            X_ = self._paso("drop_columns", self._paso_drop, X_)
+        if self.shuffle and barajar:
+            X_ = self._paso("shuffle", self._paso_shuffle, X_)
+        return X_
 
-        if self.log_transformation_list is not None:
-            for col in self.log_transformation_list:
-                X_[col] = X_[col].apply(np.log)
+    def _paso_standardize(self, X_: pd.DataFrame) -> pd.DataFrame:
+        # Estandarizamos las mismas columnas float que en fit. El resto
+        # (objetos, enteros o floats que no estaban en fit, como la
+        # calidad vacía del dataset de test) se dejan como están
+        columnas = list(self.sc.feature_names_in_)
+        # Mismas operaciones que StandardScaler.transform, pero sobre un
+        # solo bloque nuevo en el que cada columna es contigua
+        escaladas = np.empty((len(columnas), len(X_)), dtype="float64")
+        for fila, columna in zip(escaladas, columnas):
+            fila[:] = X_[columna].to_numpy()
+        escaladas -= self.sc.mean_[:, None]
+        escaladas /= self.sc.scale_[:, None]
 
-        if self.drop_columns_list is not None:
-            X_ = X_.drop(columns=self.drop_columns_list)
+        tipos = X_.dtypes.drop(columnas)
+        resto = (
+            list(tipos.index[tipos == "object"])
+            + list(tipos.index[tipos == "int64"])
+            + list(tipos.index[(tipos != "object") & (tipos != "int64")])
+        )
+        return _ensamblar(
+            {
+                **dict(zip(columnas, escaladas)),
+                **{nombre: X_[nombre].to_numpy() for nombre in resto},
+            },
+            X_.index,
+        )
 
-        if self.shuffle:
-            X_ = X_.sample(len(X_), random_state=42)
+    def _paso_log(self, X_: pd.DataFrame) -> pd.DataFrame:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for col in self.log_transformation or []:
+                X_[col] = np.log(X_[col].to_numpy())
+        return X_
+
+    def _paso_drop(self, X_: pd.DataFrame) -> pd.DataFrame:
+        # del no copia el resto de columnas, a diferencia de drop
+        for col in self.drop_columns or []:
+            del X_[col]
+        return X_
+
+    def _paso_shuffle(self, X_: pd.DataFrame) -> pd.DataFrame:
+        return X_.sample(len(X_), random_state=42)
 
+    def _independizar(self, X_: pd.DataFrame, X: pd.DataFrame) -> pd.DataFrame:
+        """Con ``copy=True`` el resultado no puede compartir memoria
+        con X. Solo se copia si ningún paso ha creado ya columnas
+        nuevas para todo el DataFrame (outliers, estandarización
+        o barajado)"""
+        if not self.copy:
+            return X_
+        columnas = _columnas(X_)
+        compartidas = [
+            nombre
+            for nombre in X.columns.intersection(X_.columns)
+            if np.may_share_memory(columnas[nombre], X[nombre].to_numpy())
+        ]
+        if not compartidas:
+            return X_
+        for nombre in compartidas:
+            columnas[nombre] = columnas[nombre].copy()
+        return _ensamblar(columnas, X_.index)
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        """Aplica las transformaciones con el estado aprendido
+        en ``fit``. No modifica el transformer, por lo que se
+        puede llamar tantas veces como se quiera, por ejemplo
+        con lotes pequeños al servir predicciones.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+
+        Returns
+        -------
+        pd.DataFrame
+            _description_
+        """
+        check_is_fitted(self, "n_samples_seen_")
+        with self._fase("transform"):
+            particiones = self._particiones(len(X))
+            if particiones > 1:
+                X_ = self._transformar_en_paralelo(X, particiones)
+            else:
+                X_ = self._aplicar_estado(self._crear_features(X, self.copy))
+        return self._independizar(X_, X)
+
+    def _particiones(self, filas: int) -> int:
+        """Número de particiones de ``transform``: una por job
+        con al menos ``min_filas_particion`` filas cada una"""
+        if self.n_jobs is None:
+            return 1
+        jobs: int = effective_n_jobs(self.n_jobs)
+        return max(1, min(jobs, filas // self.min_filas_particion))
+
+    def _transformar_en_paralelo(
+        self, X: pd.DataFrame, particiones: int
+    ) -> pd.DataFrame:
+        """Transforma particiones consecutivas de filas a la vez y las
+        une en el orden original. Todos los pasos salvo el barajado
+        dependen solo de cada fila y del estado ajustado, por lo que el
+        resultado es idéntico al de transformar X de una vez.
+
+        Por defecto usa hilos, que comparten el estado ajustado sin
+        copiarlo. Con ``joblib.parallel_config(backend="loky")`` se usan
+        procesos. Si ``profile`` está activo las particiones se
+        transforman una a una para que las medidas no se mezclen.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            _description_
+        particiones : int
+            _description_
+
+        Returns
+        -------
+        pd.DataFrame
+            _description_
+        """
+
+        def transformar(parte: pd.DataFrame) -> pd.DataFrame:
+            # Cada partición es una vista de X: siempre trabajamos
+            # sobre una copia superficial para no modificarla
+            return self._aplicar_estado(self._crear_features(parte), barajar=False)
+
+        limites = np.linspace(0, len(X), particiones + 1).astype("int64")
+        partes = Parallel(n_jobs=1 if self.profile else particiones, prefer="threads")(
+            delayed(transformar)(X.iloc[inicio:fin])
+            for inicio, fin in zip(limites[:-1], limites[1:])
+        )
+        X_ = _concatenar(partes)
+        if self.remove_outliers:
+            # Igual que al quitar los outliers de todo X de una vez
+            X_.index = pd.RangeIndex(len(X_))
+        if self.shuffle:
+            X_ = self._paso("shuffle", self._paso_shuffle, X_)
         return X_
 
     def get_feature_names_out(self, names=None):
@@ -0,0 +1,137 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Medición del tiempo, las filas y la memoria de cada
+paso de las transformaciones"""
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+import time
+import tracemalloc
+from typing import Callable, Iterator
+
+import pandas as pd
+
+
+@dataclass
+class MedidaPaso:
+    """Medida de un paso de las transformaciones
+
+    Parameters
+    ----------
+    paso : str
+        _description_
+    fase : str
+        Método del transformer en el que se ejecutó el paso:
+        fit, fit_transform o transform
+    segundos : float
+        _description_
+    filas_entrada : int
+        _description_
+    filas_salida : int
+        _description_
+    memoria_pico_mb : float
+        Memoria máxima reservada durante el paso por encima
+        de la que había al empezarlo
+    """
+
+    paso: str
+    fase: str
+    segundos: float
+    filas_entrada: int
+    filas_salida: int
+    memoria_pico_mb: float
+
+
+class Perfilador:
+    """Guarda las medidas de los pasos y se las pasa a los callbacks
+    según se producen, por ejemplo para enviarlas a un sistema
+    de métricas
+
+    Parameters
+    ----------
+    callbacks : list[Callable[[MedidaPaso], None]] | None, optional
+        _description_, by default None
+    """
+
+    def __init__(
+        self, callbacks: list[Callable[[MedidaPaso], None]] | None = None
+    ) -> None:
+        self.callbacks = callbacks or []
+        self.medidas: list[MedidaPaso] = []
+        self.fase = ""
+
+    @contextmanager
+    def en_fase(self, fase: str) -> Iterator[None]:
+        """Mide con tracemalloc los pasos ejecutados dentro del bloque.
+        Si tracemalloc ya estaba activo lo deja activo al terminar"""
+        self.fase = fase
+        iniciado = not tracemalloc.is_tracing()
+        if iniciado:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            if iniciado:
+                tracemalloc.stop()
+
+    def medir(
+        self,
+        paso: str,
+        funcion: Callable[[pd.DataFrame], pd.DataFrame],
+        X: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """Ejecuta ``funcion(X)`` y guarda su medida"""
+        memoria_inicial = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        X_ = funcion(X)
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] - memoria_inicial
+        medida = MedidaPaso(
+            paso=paso,
+            fase=self.fase,
+            segundos=segundos,
+            filas_entrada=len(X),
+            filas_salida=len(X_),
+            memoria_pico_mb=max(pico, 0) / 1024**2,
+        )
+        self.medidas.append(medida)
+        for callback in self.callbacks:
+            callback(medida)
+        return X_
+
+    def informe(self) -> pd.DataFrame:
+        """Agrega las medidas por fase y paso. Con varios bloques o
+        varias llamadas suma los tiempos y las filas y se queda con
+        el pico de memoria más alto
+
+        Returns
+        -------
+        pd.DataFrame
+            _description_
+        """
+        columnas = list(MedidaPaso.__dataclass_fields__)
+        medidas = pd.DataFrame([asdict(m) for m in self.medidas], columns=columnas)
+        return (
+            medidas.groupby(["fase", "paso"], sort=False)
+            .agg(
+                llamadas=("segundos", "size"),
+                segundos=("segundos", "sum"),
+                filas_entrada=("filas_entrada", "sum"),
+                filas_salida=("filas_salida", "sum"),
+                memoria_pico_mb=("memoria_pico_mb", "max"),
+            )
+            .reset_index()
+        )
@@ -16,12 +16,22 @@
 
 
 import argparse
+from pathlib import Path
+import tempfile
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from aidtecsolutions.utils import EscritorDataset, leer_dataset_por_chunks
+import settings
 
 
 def generate_dataset_name(args: argparse.Namespace) -> str:
     """Devuelve el nombre de archivo para
-    guardar el dataset como csv en función
-    de las transformaciones realizadas
+    guardar el dataset en función de las
+    transformaciones realizadas y del formato
 
     Parameters
     ----------
@@ -68,7 +78,8 @@ def generate_dataset_name(args: argparse.Namespace) -> str:
         name_parts.append(f"log_transformation={'-'.join(args.log)}")
 
     # Unir todas las partes con guiones bajos
-    return "-".join(name_parts) + ".csv"
+    formato = getattr(args, "formato", "csv")
+    return "-".join(name_parts) + f".{formato}"
 
 
 def parse_col_name(col_names: list[str]) -> list[str]:
@@ -87,3 +98,114 @@ def parse_col_name(col_names: list[str]) -> list[str]:
         _description_
     """
     return [str(col.replace("_", " ")).strip() for col in col_names]
+
+
+def transformar_dataset_por_chunks(
+    wt: WineDatasetTransformer,
+    ruta_entrada: Path,
+    ruta_salida: Path,
+    chunksize: int,
+) -> int:
+    """Ajusta el transformer y transforma un dataset por bloques,
+    añadiendo cada bloque transformado a ``ruta_salida``. La
+    memoria usada depende de ``chunksize`` y no del tamaño
+    del archivo. Los formatos de entrada y salida se eligen
+    por la extensión de cada archivo.
+
+    Si el transformer baraja, el barajado global se hace
+    repartiendo las filas al azar en archivos temporales y
+    barajando después cada uno de ellos en memoria.
+
+    Parameters
+    ----------
+    wt : WineDatasetTransformer
+        Transformer sin ajustar
+    ruta_entrada : Path
+        _description_
+    ruta_salida : Path
+        _description_
+    chunksize : int
+        Número de filas de cada bloque
+
+    Returns
+    -------
+    int
+        Número de filas escritas
+    """
+
+    def leer_chunks() -> Iterator[pd.DataFrame]:
+        return leer_dataset_por_chunks(ruta_entrada, chunksize, settings.RAW_DTYPES)
+
+    wt.fit_por_chunks(leer_chunks)
+
+    if not wt.shuffle:
+        return _escribir_chunks_transformados(wt, leer_chunks(), ruta_salida)
+
+    # Barajado externo: repartimos las filas al azar en tantas particiones
+    # temporales como bloques y después barajamos cada una en memoria
+    n_particiones = max(1, -(-wt.n_samples_seen_ // chunksize))
+    rng = np.random.default_rng(settings.CHUNK_SHUFFLE_SEED)
+    with tempfile.TemporaryDirectory(dir=ruta_salida.parent) as carpeta_temporal:
+        particiones = [
+            Path(carpeta_temporal) / f"particion_{n}.csv" for n in range(n_particiones)
+        ]
+        filas = 0
+        for chunk in leer_chunks():
+            chunk_ = _transformar_chunk(wt, chunk, filas)
+            filas += len(chunk_)
+            destinos = rng.integers(0, n_particiones, size=len(chunk_))
+            for n_particion, parte in chunk_.groupby(destinos):
+                ruta_particion = particiones[n_particion]
+                parte.to_csv(
+                    ruta_particion, mode="a", header=not ruta_particion.exists()
+                )
+            tipos = chunk_.dtypes
+
+        def leer_particiones() -> Iterator[pd.DataFrame]:
+            for ruta_particion in particiones:
+                if not ruta_particion.exists():
+                    continue
+                particion = pd.read_csv(
+                    ruta_particion,
+                    index_col=0,
+                    dtype=tipos.to_dict(),
+                    float_precision="round_trip",
+                )
+                yield particion[tipos.index].sample(
+                    frac=1, random_state=settings.CHUNK_SHUFFLE_SEED
+                )
+
+        return _escribir_chunks(leer_particiones(), ruta_salida)
+
+
+def _transformar_chunk(
+    wt: WineDatasetTransformer, chunk: pd.DataFrame, desplazamiento: int
+) -> pd.DataFrame:
+    """Transforma un bloque. Al eliminar outliers el transformer
+    reinicia el índice, así que lo desplazamos para que no se
+    repita entre bloques"""
+    chunk_ = wt.transform(chunk)
+    if wt.remove_outliers:
+        chunk_.index = chunk_.index + desplazamiento
+    return chunk_
+
+
+def _escribir_chunks_transformados(
+    wt: WineDatasetTransformer, chunks: Iterator[pd.DataFrame], ruta_salida: Path
+) -> int:
+    def transformar() -> Iterator[pd.DataFrame]:
+        filas = 0
+        for chunk in chunks:
+            chunk_ = _transformar_chunk(wt, chunk, filas)
+            filas += len(chunk_)
+            yield chunk_
+
+    return _escribir_chunks(transformar(), ruta_salida)
+
+
+def _escribir_chunks(chunks: Iterator[pd.DataFrame], ruta_salida: Path) -> int:
+    """Escribe los bloques uno detrás de otro en un único archivo"""
+    with EscritorDataset(ruta_salida) as escritor:
+        for chunk in chunks:
+            escritor.escribir(chunk)
+    return escritor.filas
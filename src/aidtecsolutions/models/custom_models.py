@@ -12,41 +12,147 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from joblib import Parallel, delayed
 import numpy as np
 from numpy.typing import NDArray
 import pandas as pd
-from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
 from sklearn.utils.validation import check_is_fitted
 
 
+def _filas(
+    X: NDArray[np.float_] | pd.DataFrame, indices: NDArray[np.int_]
+) -> NDArray[np.float_] | pd.DataFrame:
+    return X.iloc[indices] if isinstance(X, pd.DataFrame) else X[indices]
+
+
 class MultiStageClassifier(BaseEstimator, ClassifierMixin):
     def __init__(
-        self, model_stage1=None, model_extreme=None, model_middle=None
+        self,
+        model_stage1=None,
+        model_extreme=None,
+        model_middle=None,
+        n_jobs: int | None = None,
+        limite_inferior: int = 5,
+        limite_superior: int = 7,
     ) -> None:
         """inicializa los modelos de las 3 etapas.
-        Tienen que ser modelos con la firma de Scikit-Learn"""
+        Tienen que ser modelos con la firma de Scikit-Learn.
+        Las clases menores que ``limite_inferior`` o mayores que
+        ``limite_superior`` son extremas. Con ``n_jobs`` mayor que 1
+        los modelos se entrenan a la vez en hilos y los de la segunda
+        etapa predicen a la vez en dos hilos"""
         self.model_stage1 = model_stage1
         self.model_extreme = model_extreme
         self.model_middle = model_middle
+        self.n_jobs = n_jobs
+        self.limite_inferior = limite_inferior
+        self.limite_superior = limite_superior
 
     def fit(
         self, X: NDArray[np.float_] | pd.DataFrame, y: NDArray[np.float_] | pd.DataFrame
     ) -> "MultiStageClassifier":
-        self.model_stage1_ = self.model_stage1.fit(X, (y < 5) | (y > 7))
-        self.model_extreme_ = self.model_extreme.fit(
-            X[(y < 5) | (y > 7)], y[(y < 5) | (y > 7)]
+        """Entrena los tres modelos, que son independientes entre sí.
+        Cada modelo de la segunda etapa aprende con las clases
+        codificadas de 0 a n-1, para poder usar xgboost"""
+        y = np.asarray(y)
+        extremos = (y < self.limite_inferior) | (y > self.limite_superior)
+        indices_extreme = np.flatnonzero(extremos)
+        indices_middle = np.flatnonzero(~extremos)
+        self.clases_extreme_, y_extreme = np.unique(
+            y[indices_extreme], return_inverse=True
+        )
+        self.clases_middle_, y_middle = np.unique(
+            y[indices_middle], return_inverse=True
         )
-        self.model_middle_ = self.model_middle.fit(
-            X[(y >= 5) & (y <= 7)], y[(y >= 5) & (y <= 7)]
+
+        # Los hilos no limitan los hilos propios de cada modelo
+        (
+            self.model_stage1_,
+            self.model_extreme_,
+            self.model_middle_,
+        ) = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(clone(modelo).fit)(X_etapa, y_etapa)
+            for modelo, X_etapa, y_etapa in (
+                (self.model_stage1, X, extremos),
+                (self.model_extreme, _filas(X, indices_extreme), y_extreme),
+                (self.model_middle, _filas(X, indices_middle), y_middle),
+            )
+        )
+        self.classes_ = np.unique(
+            np.concatenate([self.clases_extreme_, self.clases_middle_])
         )
         return self
 
+    def _ejecutar_etapa2(
+        self,
+        extreme: Callable[[], NDArray[Any] | None],
+        middle: Callable[[], NDArray[Any] | None],
+    ) -> tuple[NDArray[Any] | None, NDArray[Any] | None]:
+        """Ejecuta los dos modelos de la segunda etapa, en paralelo
+        si ``n_jobs`` es mayor que 1. xgboost y los árboles de sklearn
+        liberan el GIL al predecir"""
+        if self.n_jobs is not None and self.n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futuro_extreme = pool.submit(extreme)
+                futuro_middle = pool.submit(middle)
+                return futuro_extreme.result(), futuro_middle.result()
+        return extreme(), middle()
+
     def predict(self, X: NDArray[np.float_] | pd.DataFrame) -> NDArray[np.float_]:
+        """Cada fila solo se predice con el modelo de la segunda
+        etapa al que la envía el modelo de la primera"""
         # Usar check_is_fitted para asegurar que el modelo ha sido ajustado
         check_is_fitted(self, ["model_stage1_", "model_extreme_", "model_middle_"])
 
-        stage1_pred = self.model_stage1_.predict(X)
-        final_pred = np.where(
-            stage1_pred, self.model_extreme_.predict(X), self.model_middle_.predict(X)
+        stage1_pred = self.model_stage1_.predict(X).astype(bool)
+        indices_extreme = np.flatnonzero(stage1_pred)
+        indices_middle = np.flatnonzero(~stage1_pred)
+
+        pred_extreme, pred_middle = self._ejecutar_etapa2(
+            lambda: (
+                self.model_extreme_.predict(_filas(X, indices_extreme))
+                if len(indices_extreme)
+                else None
+            ),
+            lambda: (
+                self.model_middle_.predict(_filas(X, indices_middle))
+                if len(indices_middle)
+                else None
+            ),
         )
+
+        final_pred = np.empty(len(stage1_pred), dtype=self.classes_.dtype)
+        if pred_extreme is not None:
+            final_pred[indices_extreme] = self.clases_extreme_[pred_extreme]
+        if pred_middle is not None:
+            final_pred[indices_middle] = self.clases_middle_[pred_middle]
         return final_pred
+
+    def predict_proba(self, X: NDArray[np.float_] | pd.DataFrame) -> NDArray[np.float_]:
+        """Probabilidad de cada clase de ``classes_``:
+        P(extremo) * P(clase | extremo) para las clases del modelo
+        extremo y (1 - P(extremo)) * P(clase | medio) para las del
+        modelo medio. Necesita los dos modelos en todas las filas.
+
+        ``predict`` enruta con la predicción de la primera etapa, así
+        que no siempre coincide con el argmax de estas probabilidades.
+        """
+        check_is_fitted(self, ["model_stage1_", "model_extreme_", "model_middle_"])
+
+        columna_extreme = list(self.model_stage1_.classes_).index(True)
+        p_extreme = self.model_stage1_.predict_proba(X)[:, [columna_extreme]]
+        proba_extreme, proba_middle = self._ejecutar_etapa2(
+            lambda: self.model_extreme_.predict_proba(X),
+            lambda: self.model_middle_.predict_proba(X),
+        )
+
+        proba = np.zeros((len(p_extreme), len(self.classes_)))
+        columnas_extreme = np.searchsorted(self.classes_, self.clases_extreme_)
+        columnas_middle = np.searchsorted(self.classes_, self.clases_middle_)
+        proba[:, columnas_extreme] += p_extreme * proba_extreme
+        proba[:, columnas_middle] += (1 - p_extreme) * proba_middle
+        return proba
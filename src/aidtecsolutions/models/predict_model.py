@@ -14,17 +14,29 @@
 
 """Script para usar los modelos y lanzar predicciones"""
 
-import argparse
-
-import numpy as np
-from numpy.typing import NDArray
-import pandas as pd
+from __future__ import annotations
 
-from aidtecsolutions.custom_exceptions import NonValidDataset
-from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
-from aidtecsolutions.utils import is_valid_dataset, is_valid_dataframe
+import argparse
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from aidtecsolutions import esquema
+from aidtecsolutions.custom_exceptions import NonValidDataset, UnsupportedFileFormat
+from aidtecsolutions.utils import (
+    formato_dataset,
+    guardar_dataset,
+    is_valid_dataset,
+    is_valid_dataframe,
+    leer_dataset,
+)
 import settings
 
+# pandas y los wrappers de sklearn se importan al predecir para que
+# --help y las comprobaciones de los argumentos respondan sin cargarlos
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+
 
 class PredictModel:
     """Clase que representa la funcionalidad de
@@ -63,9 +75,16 @@ class PredictModel:
             help="Mergea las predicciones junto con el dataset `test.csv`\
                 que debe estar en data/raw. \
                     Guarda en data/processed el nuevo dataframe con el nombre\
-                        especificado.",
+                        especificado. El formato (csv, parquet o feather)\
+                            se elige por la extensión.",
             type=str,
         )
+        parser.add_argument(
+            "--float32",
+            help="Lee las columnas float del dataset como float32. Ocupa la\
+                mitad de memoria y los modelos de árboles ya predicen en float32",
+            action="store_true",
+        )
         return parser
 
     def main(self) -> None:
@@ -81,24 +100,37 @@ class PredictModel:
             )
             return
 
-        # Comprobamos que esté bien el archivo y sea válido
-        try:
-            self.df_test = is_valid_dataframe(settings.FOLDER_DATA_PROCESSED, args.data)
-        except NonValidDataset as exc:
-            print(f"Dataset erróneo. Error: {exc}")
-            return
-
         # Comprobamos que el archivo del modelo exista
         self.model_filename: str = args.model
         if not (settings.FOLDER_MODELS_SERIALISED / self.model_filename).exists():
             print(
-                f"No se encuentra el modelo {args.modelo} en {settings.FOLDER_MODELS_SERIALISED}"
+                f"No se encuentra el modelo {args.model} en {settings.FOLDER_MODELS_SERIALISED}"
+            )
+            return
+
+        # Comprobamos que esté bien el archivo y sea válido
+        try:
+            self.df_test = is_valid_dataframe(
+                settings.FOLDER_DATA_PROCESSED,
+                args.data,
+                esquema.PROCESSED,
+                float32=args.float32,
             )
+        except NonValidDataset as exc:
+            print(f"Dataset erróneo. Error: {exc}")
             return
 
+        import pandas as pd
+
+        from aidtecsolutions.wrappers import (
+            SerializableClassifier,
+            SerializableTransformer,
+        )
+
         # Cargamos modelo y label encoders
         self.model: SerializableClassifier = SerializableClassifier.load(
-            settings.FOLDER_MODELS_SERIALISED / self.model_filename
+            settings.FOLDER_MODELS_SERIALISED / self.model_filename,
+            mmap_mode=settings.MODEL_MMAP_MODE,
         )
         self.label_encoders: SerializableTransformer = SerializableTransformer.load(
             settings.FOLDER_MODELS_SERIALISED
@@ -116,17 +148,16 @@ class PredictModel:
 
         if args.merge is not None:
             y_test_w_preds_filename: str = args.merge
-            if ".csv" not in y_test_w_preds_filename:
-                print("El nombre de archivo no es válido. Debes pasar un .csv")
+            try:
+                formato_dataset(Path(y_test_w_preds_filename))
+            except UnsupportedFileFormat as exc:
+                print(f"El nombre de archivo no es válido. {exc}")
                 return
             if not (settings.FOLDER_DATA_RAW / settings.TEST_FILE).exists():
                 print(f"No se encuentra {settings.TEST_FILE} en data/raw")
                 return
 
-            y_test = pd.read_csv(
-                (settings.FOLDER_DATA_RAW / settings.TEST_FILE),
-                index_col=0,
-            )
+            y_test = leer_dataset(settings.FOLDER_DATA_RAW / settings.TEST_FILE)
             # Adecuamos los índices
             y_test_ = y_test.copy()
             self.df_preds.index = y_test_.index
@@ -134,9 +165,15 @@ class PredictModel:
             y_test_[settings.TARGET_FEATURE] = self.df_preds
             print(y_test_)
             # Guardamos
-            y_test_.to_csv(settings.FOLDER_DATA_PROCESSED / y_test_w_preds_filename)
+            guardar_dataset(
+                y_test_, settings.FOLDER_DATA_PROCESSED / y_test_w_preds_filename
+            )
             print("Guardadas correctamente en data/processed las predicciones.")
 
 
-if __name__ == "__main__":
+def main() -> None:
     PredictModel().main()
+
+
+if __name__ == "__main__":
+    main()
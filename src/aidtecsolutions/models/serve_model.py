@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Servidor local de predicciones.
+
+Carga una sola vez el modelo, el label encoder y, opcionalmente, el
+``WineDatasetTransformer`` ajustado, y atiende peticiones HTTP con
+filas en json o csv. Las filas de peticiones simultáneas se agrupan
+en lotes antes de llamar a ``predict``.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+import settings
+
+# numpy, pandas y los wrappers de sklearn se importan al usarlos para
+# que --help y las comprobaciones de los argumentos respondan sin cargarlos
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+    import pandas as pd
+
+    from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+
+
+class MicroBatcher:
+    """Agrupa las filas de varias peticiones en un solo lote
+    hasta llegar a ``max_filas`` o hasta que pasen ``espera_ms``
+    desde la primera petición del lote
+
+    Parameters
+    ----------
+    predecir : Callable[[pd.DataFrame], NDArray[Any]]
+        Función que recibe un lote y devuelve una predicción por fila
+    max_filas : int, optional
+        _description_, by default settings.SERVE_MAX_BATCH
+    espera_ms : float, optional
+        _description_, by default settings.SERVE_MAX_WAIT_MS
+    """
+
+    def __init__(
+        self,
+        predecir: Callable[[pd.DataFrame], NDArray[Any]],
+        max_filas: int = settings.SERVE_MAX_BATCH,
+        espera_ms: float = settings.SERVE_MAX_WAIT_MS,
+    ) -> None:
+        self.predecir_lote = predecir
+        self.max_filas = max_filas
+        self.espera = espera_ms / 1000
+        self._cola: queue.Queue[tuple[pd.DataFrame, Future[Any], float]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencias: deque[float] = deque(maxlen=10_000)
+        self._peticiones = 0
+        self._filas = 0
+        self._lotes = 0
+        self._inicio = time.perf_counter()
+        self._parado = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def predecir(self, X: pd.DataFrame) -> NDArray[Any]:
+        """Encola las filas y espera a su predicción"""
+        futuro: Future[Any] = Future()
+        self._cola.put((X, futuro, time.perf_counter()))
+        prediccion: NDArray[Any] = futuro.result()
+        return prediccion
+
+    def _bucle(self) -> None:
+        while not self._parado.is_set():
+            try:
+                primera = self._cola.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            lote = [primera]
+            filas = len(primera[0])
+            limite = time.perf_counter() + self.espera
+            while filas < self.max_filas:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    peticion = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(peticion)
+                filas += len(peticion[0])
+            self._procesar(lote)
+
+    def _procesar(self, lote: list[tuple[pd.DataFrame, Future[Any], float]]) -> None:
+        import pandas as pd
+
+        try:
+            preds = self.predecir_lote(
+                pd.concat([X for X, _, _ in lote], ignore_index=True)
+            )
+        except Exception as exc:
+            if len(lote) > 1:
+                # Repetimos una a una para que solo fallen las peticiones erróneas
+                for peticion in lote:
+                    self._procesar([peticion])
+            else:
+                lote[0][1].set_exception(exc)
+            return
+
+        ahora = time.perf_counter()
+        inicio_fila = 0
+        with self._lock:
+            for X, futuro, llegada in lote:
+                fin_fila = inicio_fila + len(X)
+                futuro.set_result(preds[inicio_fila:fin_fila])
+                inicio_fila = fin_fila
+                self._latencias.append(ahora - llegada)
+            self._peticiones += len(lote)
+            self._filas += inicio_fila
+            self._lotes += 1
+
+    def metricas(self) -> dict[str, float]:
+        """Latencias p50 y p99 en milisegundos de las últimas
+        peticiones y throughput desde que arrancó el servidor"""
+        import numpy as np
+
+        with self._lock:
+            latencias = np.array(self._latencias) * 1000
+            segundos = time.perf_counter() - self._inicio
+            return {
+                "peticiones": self._peticiones,
+                "filas": self._filas,
+                "lotes": self._lotes,
+                "filas_por_lote": self._filas / max(self._lotes, 1),
+                "p50_ms": float(np.percentile(latencias, 50)) if len(latencias) else 0,
+                "p99_ms": float(np.percentile(latencias, 99)) if len(latencias) else 0,
+                "filas_por_segundo": self._filas / segundos,
+            }
+
+    def cerrar(self) -> None:
+        self._parado.set()
+        self._hilo.join()
+
+
+class ServicioPrediccion:
+    """Modelo, label encoder y transformer cargados en memoria
+
+    Parameters
+    ----------
+    model : SerializableClassifier
+        _description_
+    label_encoder : SerializableTransformer
+        _description_
+    transformer : SerializableTransformer | None, optional
+        ``WineDatasetTransformer`` ajustado. Si no se pasa, las filas
+        recibidas tienen que estar ya transformadas, by default None
+    """
+
+    def __init__(
+        self,
+        model: SerializableClassifier,
+        label_encoder: SerializableTransformer,
+        transformer: SerializableTransformer | None = None,
+    ) -> None:
+        self.model = model
+        self.label_encoder = label_encoder
+        self.transformer = None
+        if transformer is not None:
+            # Al servir hay que devolver una predicción por fila y en orden
+            self.transformer = transformer.transformer.set_params(
+                shuffle=False, remove_outliers=False
+            )
+
+    def predecir(self, X: pd.DataFrame) -> NDArray[Any]:
+        """Transforma las filas si hay transformer y devuelve
+        las predicciones con las etiquetas originales"""
+        if self.transformer is not None:
+            X = X.reindex(columns=self.transformer.columnas_entrada_)
+            if X["alcohol"].dtype == "object":
+                X["alcohol"] = X["alcohol"].astype(str)
+            X = self.transformer.transform(X)
+        X = X.drop(columns=[settings.TARGET_FEATURE], errors="ignore")
+        columnas = getattr(self.model, "feature_names_in_", None)
+        if columnas is not None:
+            X = X[list(columnas)]
+        preds: NDArray[Any] = self.label_encoder.inverse_transform(
+            self.model.predict(X)
+        )
+        return preds
+
+
+def leer_filas(cuerpo: bytes, content_type: str) -> pd.DataFrame:
+    """Convierte el cuerpo de una petición en un DataFrame. Admite
+    csv con cabecera o json con una lista de filas o ``{"filas": [...]}``"""
+    import pandas as pd
+
+    if content_type.startswith("text/csv"):
+        return pd.read_csv(io.BytesIO(cuerpo), dtype=settings.RAW_DTYPES)
+    datos = json.loads(cuerpo)
+    if isinstance(datos, dict):
+        datos = datos["filas"]
+    return pd.DataFrame(datos)
+
+
+class PrediccionHandler(BaseHTTPRequestHandler):
+    """Atiende ``POST /predict``, ``GET /metricas`` y ``GET /salud``"""
+
+    server: "ServidorPrediccion"
+    # Conexiones persistentes: cada cliente no abre una conexión por petición
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo salen en dos escrituras, sin Nagle no se retrasan
+    disable_nagle_algorithm = True
+
+    def _responder(self, codigo: int, contenido: dict[str, Any]) -> None:
+        cuerpo = json.dumps(contenido).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self) -> None:
+        if self.path == "/metricas":
+            self._responder(200, self.server.batcher.metricas())
+        elif self.path == "/salud":
+            self._responder(200, {"estado": "ok"})
+        else:
+            self._responder(404, {"error": f"Ruta no encontrada: {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._responder(404, {"error": f"Ruta no encontrada: {self.path}"})
+            return
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            X = leer_filas(cuerpo, self.headers.get("Content-Type", ""))
+        except Exception as exc:
+            self._responder(400, {"error": f"Filas no válidas: {exc}"})
+            return
+        try:
+            preds = self.server.batcher.predecir(X)
+        except Exception as exc:
+            self._responder(422, {"error": f"Error al predecir: {exc}"})
+            return
+        self._responder(200, {"predicciones": preds.tolist()})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Sin un log por petición, penaliza la latencia
+        pass
+
+
+class ServidorPrediccion(ThreadingHTTPServer):
+    """Servidor HTTP con un hilo por conexión que comparte
+    un único ``MicroBatcher``"""
+
+    daemon_threads = True
+
+    def __init__(self, direccion: tuple[str, int], batcher: MicroBatcher) -> None:
+        super().__init__(direccion, PrediccionHandler)
+        self.batcher = batcher
+
+
+def setup_parser() -> argparse.ArgumentParser:
+    """Configura el parser
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        _description_
+    """
+    parser = argparse.ArgumentParser(
+        description="Servidor local de predicciones con el modelo cargado en memoria"
+    )
+    parser.add_argument(
+        "--model",
+        help="El archivo del modelo de /models con el que hacer las predicciones",
+        required=True,
+    )
+    parser.add_argument(
+        "--transformer",
+        help="Archivo de /models con el WineDatasetTransformer ajustado, \
+            guardado con build_features --guardar_transformer. Si no se pasa \
+                las filas tienen que llegar ya transformadas",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="_description_")
+    parser.add_argument("--port", type=int, default=8000, help="_description_")
+    parser.add_argument(
+        "--max_lote",
+        type=int,
+        default=settings.SERVE_MAX_BATCH,
+        help="Número máximo de filas por lote",
+    )
+    parser.add_argument(
+        "--espera_ms",
+        type=float,
+        default=settings.SERVE_MAX_WAIT_MS,
+        help="Milisegundos que se espera a completar un lote",
+    )
+    return parser
+
+
+def main() -> None:
+
+    parser = setup_parser()
+    args = parser.parse_args()
+
+    rutas = [settings.FOLDER_MODELS_SERIALISED / args.model]
+    if args.transformer is not None:
+        rutas.append(settings.FOLDER_MODELS_SERIALISED / args.transformer)
+    for ruta in rutas:
+        if not ruta.exists():
+            print(f"No se encuentra {ruta.name} en {settings.FOLDER_MODELS_SERIALISED}")
+            return
+
+    from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+
+    servicio = ServicioPrediccion(
+        SerializableClassifier.load(rutas[0], mmap_mode=settings.MODEL_MMAP_MODE),
+        SerializableTransformer.load(
+            settings.FOLDER_MODELS_SERIALISED
+            / (settings.LABEL_ENCODER_NAME + ".joblib")
+        ),
+        SerializableTransformer.load(rutas[1]) if len(rutas) > 1 else None,
+    )
+    batcher = MicroBatcher(servicio.predecir, args.max_lote, args.espera_ms)
+    servidor = ServidorPrediccion((args.host, args.port), batcher)
+    print(f"Sirviendo predicciones en http://{args.host}:{args.port}/predict")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        batcher.cerrar()
+        print(json.dumps(batcher.metricas(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Búsqueda de hiperparámetros en paralelo.
+
+Evalúa en cross validation todas las configuraciones de una
+especificación (grid o random search) en un único proceso, con un
+pool de procesos que comparte el dataset ya cargado y codificado.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+import pandas as pd
+from scipy import stats
+from sklearn.base import ClassifierMixin
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from threadpoolctl import threadpool_limits
+from xgboost import XGBClassifier
+
+from aidtecsolutions.custom_exceptions import NonValidSpec
+from aidtecsolutions.models.validacion import validar_cv
+import settings
+
+MODELOS: dict[str, type[ClassifierMixin]] = {
+    "xgb": XGBClassifier,
+    "randomforest": RandomForestClassifier,
+}
+
+DISTRIBUCIONES = {
+    "uniform": lambda minimo, maximo: stats.uniform(minimo, maximo - minimo),
+    "loguniform": stats.loguniform,
+    "randint": lambda minimo, maximo: stats.randint(minimo, maximo + 1),
+}
+
+# Estado de cada proceso del pool. Se rellena una sola vez por proceso
+# en _inicializar_worker para no serializar el dataset en cada tarea
+_X: pd.DataFrame | None = None
+_y: NDArray[np.int_] | None = None
+_hilos = 1
+
+
+def cargar_spec(ruta: Path) -> list[dict[str, Any]]:
+    """Lee una especificación de búsqueda en yaml o json.
+    Puede ser un único diccionario o una lista de ellos:
+
+    .. code-block:: yaml
+
+        modelo: xgb
+        busqueda: random  # grid por defecto
+        n_iter: 20
+        semilla: 42
+        parametros:
+          max_depth: [3, 6, 9]
+          learning_rate: {distribucion: loguniform, min: 0.01, max: 0.3}
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        _description_
+
+    Raises
+    ------
+    NonValidSpec
+        Si el archivo no existe, no tiene una extensión soportada
+        o el contenido no es válido
+    """
+    ruta = Path(ruta)
+    if not ruta.exists():
+        raise NonValidSpec(f"No existe el archivo {ruta}")
+    with open(ruta, encoding="utf-8") as f:
+        if ruta.suffix in (".yaml", ".yml"):
+            import yaml
+
+            spec = yaml.safe_load(f)
+        elif ruta.suffix == ".json":
+            spec = json.load(f)
+        else:
+            raise NonValidSpec(f"Formato de especificación no soportado: {ruta.suffix}")
+
+    specs = spec if isinstance(spec, list) else [spec]
+    for spec in specs:
+        if not isinstance(spec, dict) or spec.get("modelo") not in MODELOS:
+            raise NonValidSpec(
+                f"Cada búsqueda debe indicar un modelo de {list(MODELOS)}"
+            )
+        if spec.get("busqueda", "grid") not in ("grid", "random"):
+            raise NonValidSpec("La búsqueda debe ser grid o random")
+        if not isinstance(spec.get("parametros", {}), dict):
+            raise NonValidSpec("Los parámetros deben ser un diccionario")
+        if "n_jobs" in spec.get("parametros", {}):
+            raise NonValidSpec(
+                "n_jobs no se puede indicar en los parámetros: "
+                "los hilos de cada modelo los reparte la búsqueda con --workers"
+            )
+    return specs
+
+
+def _parsear_valores(valores: Any) -> Any:
+    """Convierte los valores de un parámetro de la especificación
+    en una lista o en una distribución de scipy"""
+    if isinstance(valores, dict):
+        try:
+            distribucion = DISTRIBUCIONES[valores["distribucion"]]
+            return distribucion(valores["min"], valores["max"])
+        except KeyError as exc:
+            raise NonValidSpec(f"Distribución no válida: {valores}") from exc
+    if isinstance(valores, list):
+        return valores
+    return [valores]
+
+
+def generar_configuraciones(
+    specs: list[dict[str, Any]]
+) -> list[tuple[str, dict[str, Any]]]:
+    """Devuelve la lista de configuraciones (modelo, parámetros)
+    a evaluar
+
+    Parameters
+    ----------
+    specs : list[dict[str, Any]]
+        _description_
+
+    Returns
+    -------
+    list[tuple[str, dict[str, Any]]]
+        _description_
+    """
+    configuraciones = []
+    for spec in specs:
+        parametros = {
+            nombre: _parsear_valores(valores)
+            for nombre, valores in spec.get("parametros", {}).items()
+        }
+        if spec.get("busqueda", "grid") == "random":
+            combinaciones = ParameterSampler(
+                parametros,
+                n_iter=spec.get("n_iter", 10),
+                random_state=spec.get("semilla", 42),
+            )
+        else:
+            if any(not isinstance(v, list) for v in parametros.values()):
+                raise NonValidSpec("La búsqueda grid solo admite listas de valores")
+            combinaciones = ParameterGrid(parametros)
+        for combinacion in combinaciones:
+            # Pasamos los tipos de numpy a tipos de python para el json
+            combinacion = {
+                k: v.item() if isinstance(v, np.generic) else v
+                for k, v in combinacion.items()
+            }
+            configuraciones.append((spec["modelo"], combinacion))
+    return configuraciones
+
+
+def crear_modelo(modelo: str, parametros: dict[str, Any], hilos: int) -> Any:
+    """Instancia el clasificador con sus parámetros limitando
+    los hilos que puede usar"""
+    return MODELOS[modelo](**{**parametros, "n_jobs": hilos})
+
+
+def repartir_cpus(n_configuraciones: int, workers: int | None) -> tuple[int, int]:
+    """Reparte las cpus entre procesos del pool e hilos por proceso
+    para que ``workers * hilos`` no supere las cpus disponibles
+
+    Returns
+    -------
+    tuple[int, int]
+        Número de procesos y de hilos por proceso
+    """
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus, max(n_configuraciones, 1))
+    return workers, max(1, cpus // workers)
+
+
+def _inicializar_worker(X: pd.DataFrame, y: NDArray[np.int_], hilos: int) -> None:
+    global _X, _y, _hilos
+    _X, _y, _hilos = X, y, hilos
+    # Limita también los hilos de BLAS/OpenMP que no controla n_jobs
+    threadpool_limits(hilos)
+
+
+def evaluar_configuracion(modelo: str, parametros: dict[str, Any]) -> dict[str, Any]:
+    """Evalúa en cross validation una configuración con el dataset
+    compartido del proceso
+
+    Returns
+    -------
+    dict[str, Any]
+        Fila de la tabla de resultados
+    """
+    if _X is None or _y is None:
+        raise RuntimeError("El proceso no se ha inicializado con el dataset")
+    inicio = time.perf_counter()
+    resultado: dict[str, Any] = {
+        "modelo": modelo,
+        "parametros": json.dumps(parametros, sort_keys=True),
+    }
+    fraccion_validacion = None
+    if parametros.get("early_stopping_rounds") is not None:
+        fraccion_validacion = settings.EARLY_STOPPING_VALIDATION
+    try:
+        resultado_cv = validar_cv(
+            crear_modelo(modelo, parametros, _hilos),
+            _X,
+            _y,
+            n_jobs=1,
+            fraccion_validacion=fraccion_validacion,
+        )
+        scores = resultado_cv.scores
+        if resultado_cv.mejores_iteraciones:
+            # Mediana de las rondas de boosting de los folds
+            resultado["rondas"] = int(
+                np.median(np.array(resultado_cv.mejores_iteraciones) + 1)
+            )
+    except Exception as exc:
+        resultado["error"] = str(exc)
+        scores = np.full(settings.SPLITS_FOR_CV, np.nan)
+    resultado["accuracy_media"] = scores.mean()
+    resultado["accuracy_std"] = scores.std()
+    for fold, score in enumerate(scores, start=1):
+        resultado[f"fold_{fold}"] = score
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def ejecutar_sweep(
+    X: pd.DataFrame,
+    y: NDArray[np.int_],
+    configuraciones: list[tuple[str, dict[str, Any]]],
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """Evalúa todas las configuraciones en un pool de procesos
+
+    Parameters
+    ----------
+    X : pd.DataFrame
+        _description_
+    y : np.ndarray
+        Target ya codificado
+    configuraciones : list[tuple[str, dict[str, Any]]]
+        _description_
+    workers : int | None, optional
+        Número de procesos. Por defecto tantos como cpus
+
+    Returns
+    -------
+    pd.DataFrame
+        Tabla de resultados ordenada de mejor a peor accuracy media
+    """
+    workers, hilos = repartir_cpus(len(configuraciones), workers)
+    print(
+        f"Evaluando {len(configuraciones)} configuraciones con {workers} procesos "
+        f"de {hilos} hilos ..."
+    )
+    resultados = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_inicializar_worker,
+        initargs=(X, y, hilos),
+    ) as pool:
+        futuros = [
+            pool.submit(evaluar_configuracion, modelo, parametros)
+            for modelo, parametros in configuraciones
+        ]
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            print(
+                f"[{i}/{len(futuros)}] {resultado['modelo']} {resultado['parametros']}"
+                f" -> {resultado['accuracy_media']:.3%} ({resultado['segundos']:.1f}s)"
+            )
+
+    return (
+        pd.DataFrame(resultados)
+        .sort_values("accuracy_media", ascending=False)
+        .reset_index(drop=True)
+    )
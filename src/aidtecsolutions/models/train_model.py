@@ -16,24 +16,120 @@
 
 """Script para entrenar modelos"""
 
+from __future__ import annotations
+
 import argparse
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import (
-    cross_val_score,
-    StratifiedKFold,
-    cross_val_predict,
-)
-from sklearn.metrics import classification_report
-from sklearn.preprocessing import LabelEncoder
-from xgboost import XGBClassifier
-
-from aidtecsolutions.custom_exceptions import NonValidDataset
-from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
-from aidtecsolutions.models.utils import generate_model_name
+from aidtecsolutions import esquema
+from aidtecsolutions.custom_exceptions import NonValidDataset, NonValidSpec
+from aidtecsolutions.models.utils import NOMBRES_MODELOS, generate_model_name
 from aidtecsolutions.utils import is_valid_dataset, is_valid_dataframe
 import settings
 
+# numpy, pandas, sklearn y xgboost se importan dentro de las funciones
+# para que --help y las comprobaciones de los argumentos respondan
+# sin cargarlos
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+    import pandas as pd
+
+    from aidtecsolutions.models.custom_models import MultiStageClassifier
+
+
+def parametro(valor: str) -> str:
+    """Valida un hiperparámetro de la forma ``clave=valor``"""
+    clave, separador, _ = valor.partition("=")
+    if not separador or not clave:
+        raise argparse.ArgumentTypeError(
+            f"{valor} no es válido. El formato es clave=valor"
+        )
+    return valor
+
+
+def parsear_parametros(valores: list[str] | None) -> dict[str, Any]:
+    """Convierte una lista de ``clave=valor`` en un diccionario.
+    Los valores se leen como json y si no son json válido se
+    quedan como texto
+
+    Parameters
+    ----------
+    valores : list[str] | None
+        _description_
+
+    Returns
+    -------
+    dict[str, Any]
+        _description_
+    """
+    parametros: dict[str, Any] = {}
+    for valor in valores or []:
+        clave, _, texto = valor.partition("=")
+        try:
+            parametros[clave] = json.loads(texto)
+        except json.JSONDecodeError:
+            parametros[clave] = texto
+    return parametros
+
+
+def crear_multistage(
+    args: argparse.Namespace, clases: NDArray[np.int_]
+) -> MultiStageClassifier:
+    """Crea el ``MultiStageClassifier`` con los modelos y parámetros
+    de cada etapa. Los límites entre clases extremas y medias se
+    traducen a las clases codificadas por el label encoder
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        _description_
+    clases : NDArray[np.int_]
+        Clases originales ordenadas, las del label encoder
+
+    Returns
+    -------
+    MultiStageClassifier
+        _description_
+
+    Raises
+    ------
+    ValueError
+        Si algún límite no es una de las clases
+    """
+    import numpy as np
+
+    from aidtecsolutions.models.custom_models import MultiStageClassifier
+    from aidtecsolutions.models.sweep import MODELOS
+
+    codificados = {}
+    for limite in ("limite_inferior", "limite_superior"):
+        valor = getattr(args, limite)
+        indice = int(np.searchsorted(clases, valor))
+        # Fuera de las clases el índice caería en la clase siguiente
+        if indice == len(clases) or clases[indice] != valor:
+            raise ValueError(
+                f"--{limite} {valor} no es una de las clases del dataset: "
+                f"{', '.join(str(clase) for clase in clases)}"
+            )
+        codificados[limite] = indice
+
+    modelos = {
+        etapa: MODELOS[getattr(args, etapa)](
+            **parsear_parametros(getattr(args, f"{etapa}_params"))
+        )
+        for etapa in ("stage1", "extreme", "middle")
+    }
+    return MultiStageClassifier(
+        model_stage1=modelos["stage1"],
+        model_extreme=modelos["extreme"],
+        model_middle=modelos["middle"],
+        n_jobs=args.n_jobs,
+        **codificados,
+    )
+
 
 def setup_parser() -> argparse.ArgumentParser:
     """Configura el parser
@@ -59,6 +155,12 @@ def setup_parser() -> argparse.ArgumentParser:
         help="Guarda el modelo serializado con joblib en /models",
         action="store_true",
     )
+    parser.add_argument(
+        "--float32",
+        help="Lee las columnas float del dataset como float32. Ocupa la mitad \
+            de memoria y los modelos de árboles ya entrenan en float32",
+        action="store_true",
+    )
     # Creamos subparser para los modelos
     subparsers = parser.add_subparsers(
         title="models",
@@ -104,6 +206,44 @@ def setup_parser() -> argparse.ArgumentParser:
     xgb_parser.add_argument(
         "--n_estimators", type=int, default=100, help="Number of trees"
     )
+    xgb_parser.add_argument(
+        "--early_stopping_rounds",
+        type=int,
+        default=None,
+        help="Para el entrenamiento de cada fold si la métrica del eval set \
+            no mejora en este número de rondas. El modelo guardado con --save \
+                usa la mediana de la mejor iteración de los folds",
+    )
+    xgb_parser.add_argument(
+        "--eval_metric",
+        type=str,
+        default=None,
+        help="Métrica del eval set para el early stopping. \
+            Por defecto mlogloss",
+        choices=["mlogloss", "merror", "auc"],
+    )
+    xgb_parser.add_argument(
+        "--validacion",
+        type=float,
+        default=None,
+        help=f"Fracción del train de cada fold usada como eval set con \
+            --early_stopping_rounds. Por defecto \
+                {settings.EARLY_STOPPING_VALIDATION}",
+    )
+    xgb_parser.add_argument(
+        "--tree_method",
+        type=str,
+        default=None,
+        help="The tree construction algorithm used in XGBoost. \
+            hist is the fastest one",
+        choices=["hist", "approx", "exact", "auto"],
+    )
+    xgb_parser.add_argument(
+        "--nthread",
+        type=int,
+        default=None,
+        help="Number of parallel threads used to run xgboost",
+    )
 
     # Subparser para RandomForest
     rf_parser = subparsers.add_parser(
@@ -142,9 +282,155 @@ def setup_parser() -> argparse.ArgumentParser:
                         can be provided in the same order as the columns of y",
         choices=["balanced", "balanced_subsample", None],
     )
+
+    # Subparser para el clasificador en dos etapas
+    multistage_parser = subparsers.add_parser(
+        "multistage",
+        help="Entrena un MultiStageClassifier: un modelo decide si la \
+            calidad es extrema o media y otro modelo de cada grupo la predice",
+    )
+    for etapa, descripcion in (
+        ("stage1", "que separa calidades extremas de medias"),
+        ("extreme", "de las calidades extremas"),
+        ("middle", "de las calidades medias"),
+    ):
+        multistage_parser.add_argument(
+            f"--{etapa}",
+            type=str,
+            default="xgb",
+            help=f"Modelo {descripcion}",
+            choices=list(NOMBRES_MODELOS),
+        )
+        multistage_parser.add_argument(
+            f"--{etapa}_params",
+            type=parametro,
+            nargs="+",
+            default=None,
+            metavar="CLAVE=VALOR",
+            help=f"Hiperparámetros del modelo {descripcion}. \
+                Por ejemplo max_depth=4 n_jobs=2",
+        )
+    multistage_parser.add_argument(
+        "--limite_inferior",
+        type=int,
+        default=5,
+        help="Las calidades menores que este límite son extremas",
+    )
+    multistage_parser.add_argument(
+        "--limite_superior",
+        type=int,
+        default=7,
+        help="Las calidades mayores que este límite son extremas",
+    )
+    multistage_parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=None,
+        help="Número de hilos para entrenar las tres etapas a la vez. \
+            Cada modelo mantiene sus propios hilos (n_jobs en sus params)",
+    )
+
+    # Subparser para la búsqueda de hiperparámetros
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Evalúa en paralelo todas las configuraciones de una \
+            especificación yaml o json (grid o random search)",
+    )
+    sweep_parser.add_argument(
+        "--spec",
+        type=Path,
+        required=True,
+        help="Archivo yaml o json con los modelos y parámetros a probar",
+    )
+    sweep_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Número de procesos en paralelo. Por defecto uno por cpu. \
+            Las cpus restantes se reparten como hilos de cada modelo",
+    )
+    sweep_parser.add_argument(
+        "--salida",
+        type=Path,
+        default=settings.FOLDER_REPORTS / "sweep.csv",
+        help="Archivo csv donde guardar la tabla de resultados",
+    )
     return parser
 
 
+def sweep(args: argparse.Namespace, df_train: pd.DataFrame) -> None:
+    """Ejecuta la búsqueda de hiperparámetros y guarda la tabla
+    de resultados. Con ``--save`` entrena y guarda la mejor
+    configuración en el dataset completo
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        _description_
+    df_train : pd.DataFrame
+        _description_
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    from aidtecsolutions.models.sweep import (
+        cargar_spec,
+        crear_modelo,
+        ejecutar_sweep,
+        generar_configuraciones,
+    )
+    from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+
+    try:
+        configuraciones = generar_configuraciones(cargar_spec(args.spec))
+    except NonValidSpec as exc:
+        print(f"Especificación errónea. Error: {exc}")
+        return
+
+    X = df_train.drop(columns=[settings.TARGET_FEATURE])
+    y = df_train[settings.TARGET_FEATURE]
+
+    label_encoder_serial = SerializableTransformer(LabelEncoder())
+    y_encoded = label_encoder_serial.fit_transform(y)
+
+    resultados = ejecutar_sweep(X, y_encoded, configuraciones, workers=args.workers)
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    resultados.to_csv(args.salida, index=False)
+    print(
+        resultados[["modelo", "parametros", "accuracy_media", "segundos"]]
+        .head()
+        .to_string(index=False)
+    )
+    print("Guardados resultados en:")
+    print(args.salida)
+
+    if args.save:
+        mejor = resultados.iloc[0]
+        parametros = json.loads(mejor["parametros"])
+        if parametros.get("early_stopping_rounds") is not None:
+            # Sin eval set en el dataset completo, fijamos las rondas
+            parametros["n_estimators"] = int(mejor["rondas"])
+            parametros["early_stopping_rounds"] = None
+        model = SerializableClassifier(crear_modelo(mejor["modelo"], parametros, -1))
+        model.fit(X, y_encoded)
+        try:
+            model_filename = generate_model_name(
+                argparse.Namespace(data=args.data, model=mejor["modelo"], **parametros)
+            )
+            ruta_modelo = model.save(
+                settings.FOLDER_MODELS_SERIALISED / model_filename,
+                clases_etiquetas=label_encoder_serial.classes_.tolist(),
+            )
+            label_encoder_serial.save(
+                settings.FOLDER_MODELS_SERIALISED
+                / (settings.LABEL_ENCODER_NAME + ".joblib")
+            )
+        except Exception as exc:
+            print(f"Se ha producido un error al guardar el modelo: {exc}")
+        else:
+            print("Guardado correctamente el mejor modelo:")
+            print(ruta_modelo.name)
+
+
 def main() -> None:
 
     # Parseamos los argumentos
@@ -160,63 +446,119 @@ def main() -> None:
 
     # Comprobamos que esté bien el archivo y sea válido
     try:
-        df_train = is_valid_dataframe(settings.FOLDER_DATA_PROCESSED, args.data)
+        df_train = is_valid_dataframe(
+            settings.FOLDER_DATA_PROCESSED,
+            args.data,
+            esquema.PROCESSED_TRAIN,
+            float32=args.float32,
+        )
     except NonValidDataset as exc:
         print(f"Dataset erróneo. Error: {exc}")
         return
 
+    if args.model == "sweep":
+        sweep(args, df_train)
+        return
+
+    import numpy as np
+    from sklearn.metrics import classification_report
+    from sklearn.preprocessing import LabelEncoder
+
+    from aidtecsolutions.models.validacion import validar_cv
+    from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+
+    X = df_train.drop(columns=[settings.TARGET_FEATURE])
+    y = df_train[settings.TARGET_FEATURE]
+
+    # Codificamos labels
+    label_encoder = LabelEncoder()
+    label_encoder_serial = SerializableTransformer(label_encoder)
+    y_encoded = label_encoder_serial.fit_transform(y)
+
     print(f"Validando modelo con CV y {settings.SPLITS_FOR_CV} splits ...")
     if args.model == "xgb":
+        from xgboost import XGBClassifier
+
         model = XGBClassifier(
             n_estimators=args.n_estimators,
             gamma=args.gamma,
             max_depth=args.max_depth,
             alpha=args.alpha,
             learning_rate=args.learning_rate,
+            early_stopping_rounds=args.early_stopping_rounds,
+            eval_metric=args.eval_metric,
+            tree_method=args.tree_method,
+            n_jobs=args.nthread,
         )
     elif args.model == "randomforest":
+        from sklearn.ensemble import RandomForestClassifier
+
         model = RandomForestClassifier(
             n_estimators=args.n_estimators,
             criterion=args.criterion,
             max_depth=args.max_depth,
             class_weight=args.class_weight,
         )
+    elif args.model == "multistage":
+        try:
+            model = crear_multistage(args, label_encoder_serial.classes_)
+        except TypeError as exc:
+            print(f"Parámetros de etapa erróneos. Error: {exc}")
+            return
+        except ValueError as exc:
+            print(f"Límites erróneos. Error: {exc}")
+            return
     model_name = model
     print(model_name)
 
     model = SerializableClassifier(model)
 
-    X = df_train.drop(columns=[settings.TARGET_FEATURE])
-    y = df_train[settings.TARGET_FEATURE]
-
-    # Codificamos labels
-    label_encoder = LabelEncoder()
-    label_encoder_serial = SerializableTransformer(label_encoder)
-    y_encoded = label_encoder_serial.fit_transform(y)
-
-    # Usamos cross validation para estimar una accuracy media
-    results_cv = cross_val_score(
+    # Una sola pasada de cross validation: cada fold se entrena una vez
+    # y da tanto la accuracy como las predicciones out-of-fold
+    early_stopping = getattr(args, "early_stopping_rounds", None) is not None
+    fraccion_validacion = None
+    if early_stopping:
+        fraccion_validacion = args.validacion or settings.EARLY_STOPPING_VALIDATION
+    resultado_cv = validar_cv(
         model,
         X,
         y_encoded,
-        n_jobs=-1,
-        scoring="accuracy",
-        cv=StratifiedKFold(n_splits=settings.SPLITS_FOR_CV),
-    )
-
-    y_preds = cross_val_predict(
-        model,
-        X,
-        y_encoded,
-        cv=StratifiedKFold(n_splits=settings.SPLITS_FOR_CV),
-        n_jobs=-1,
+        n_splits=settings.SPLITS_FOR_CV,
+        fraccion_validacion=fraccion_validacion,
     )
 
     print(f"Resultados de modelo {model_name}")
     print(
-        f"Accuracy media en CV con {settings.SPLITS_FOR_CV} splits: {results_cv.mean():.3%}"
+        f"Accuracy media en CV con {settings.SPLITS_FOR_CV} splits: "
+        f"{resultado_cv.scores.mean():.3%}"
+    )
+    print(
+        f"Tiempo medio por fold: entrenamiento {resultado_cv.tiempos_fit.mean():.2f}s, "
+        f"predicción {resultado_cv.tiempos_predict.mean():.2f}s"
+    )
+    print(
+        classification_report(
+            y_true=y_encoded, y_pred=resultado_cv.y_pred, zero_division=0
+        )
     )
-    print(classification_report(y_true=y_encoded, y_pred=y_preds, zero_division=0))
+
+    if early_stopping:
+        # Rondas por fold: la mejor iteración empieza a contar en 0
+        rondas = np.array(resultado_cv.mejores_iteraciones) + 1
+        n_estimators = int(np.median(rondas))
+        print(f"Rondas de boosting por fold con early stopping: {rondas.tolist()}")
+        print(
+            f"Rondas ahorradas por fold: {args.n_estimators - rondas.mean():.0f} "
+            f"de {args.n_estimators} ({1 - rondas.mean() / args.n_estimators:.1%})"
+        )
+        print(f"El modelo final se entrena con la mediana: {n_estimators} rondas")
+        # El modelo final no tiene eval set, fijamos las rondas
+        model.classifier.set_params(
+            n_estimators=n_estimators, early_stopping_rounds=None
+        )
+        # El nombre del modelo guardado recoge las rondas usadas
+        args.n_estimators = n_estimators
+        args.early_stopping_rounds = None
 
     # Solo entrenamos el modelo si han pasado '--save'
     if args.save:
@@ -225,7 +567,10 @@ def main() -> None:
         # Guardamos
         try:
             model_filename = generate_model_name(args)
-            model.save(settings.FOLDER_MODELS_SERIALISED / model_filename)
+            ruta_modelo = model.save(
+                settings.FOLDER_MODELS_SERIALISED / model_filename,
+                clases_etiquetas=label_encoder_serial.classes_.tolist(),
+            )
             # Guardamos también los label encoders
             label_encoder_serial.save(
                 settings.FOLDER_MODELS_SERIALISED
@@ -235,7 +580,7 @@ def main() -> None:
             print(f"Se ha producido un error al guardar el modelo: {exc}")
         else:
             print("Guardado correctamente modelo:")
-            print(model_filename)
+            print(ruta_modelo.name)
 
 
 if __name__ == "__main__":
@@ -13,12 +13,33 @@
 # limitations under the License.
 
 import argparse
+import hashlib
+
+# Claves de ``sweep.MODELOS``. Se repiten aquí para crear el parser
+# de train_model sin importar sklearn ni xgboost
+NOMBRES_MODELOS = ("xgb", "randomforest")
+
+# Opciones que cambian cómo se entrena o se guarda pero no el modelo
+# resultante, no forman parte del nombre
+OPCIONES_EJECUCION = (
+    "save",
+    "float32",
+    "nthread",
+    "n_jobs",
+    "validacion",
+    "eval_metric",
+)
+# Límite de la mayoría de sistemas de archivos, en bytes
+MAX_LONGITUD_NOMBRE = 255
 
 
 def generate_model_name(args: argparse.Namespace) -> str:
     """Crea el nombre de archivo del modelo
     para parsearlo en función de los
-    argumentos pasados
+    argumentos pasados. Las opciones de
+    ``OPCIONES_EJECUCION`` no forman parte del nombre y, si
+    pasa de ``MAX_LONGITUD_NOMBRE`` bytes, el dataset se
+    recorta y se completa con su hash
 
     Parameters
     ----------
@@ -30,11 +51,26 @@ def generate_model_name(args: argparse.Namespace) -> str:
     str
         _description_
     """
-    filename_parts = ["model"]
-    for key, value in vars(args).items():
-        if (value is not None) and (key != "save"):
-            part = f"{key}={value}"
-            filename_parts.append(part)
-
-    filename = "_".join(filename_parts) + ".joblib"
+    partes = {
+        key: "-".join(str(v) for v in value) if isinstance(value, list) else value
+        for key, value in vars(args).items()
+        if value is not None and key not in OPCIONES_EJECUCION
+    }
+    filename = _unir_partes(partes)
+    exceso = len(filename.encode("utf-8")) - MAX_LONGITUD_NOMBRE
+    if exceso > 0 and "data" in partes:
+        # Recortamos el dataset y añadimos su hash para no confundir
+        # datasets con el mismo principio
+        data = str(partes["data"]).encode("utf-8")
+        resumen = hashlib.sha256(data).hexdigest()[:12]
+        recorte = max(len(data) - exceso - len(resumen) - 1, 0)
+        partes["data"] = f"{data[:recorte].decode('utf-8', errors='ignore')}~{resumen}"
+        filename = _unir_partes(partes)
+    if len(filename.encode("utf-8")) > MAX_LONGITUD_NOMBRE:
+        resumen = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+        filename = _unir_partes({"model": partes.get("model"), "hash": resumen})
     return filename
+
+
+def _unir_partes(partes: dict[str, object]) -> str:
+    return "_".join(["model", *(f"{k}={v}" for k, v in partes.items())]) + ".joblib"
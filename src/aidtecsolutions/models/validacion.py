@@ -0,0 +1,178 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Validación cruzada en una sola pasada.
+
+Cada fold se entrena una única vez y de él se obtienen tanto la
+accuracy como las predicciones out-of-fold, en lugar de llamar a
+``cross_val_score`` y a ``cross_val_predict`` por separado.
+"""
+
+from dataclasses import dataclass, field
+import time
+from typing import Any
+
+from joblib import Parallel, delayed
+import numpy as np
+from numpy.typing import NDArray
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+import settings
+
+
+@dataclass
+class ResultadoCV:
+    """Resultados de una validación cruzada
+
+    Attributes
+    ----------
+    scores : NDArray[np.float_]
+        Accuracy de cada fold
+    y_pred : NDArray[Any]
+        Predicciones out-of-fold de todo el dataset
+    tiempos_fit : NDArray[np.float_]
+        Segundos de entrenamiento de cada fold
+    tiempos_predict : NDArray[np.float_]
+        Segundos de predicción de cada fold
+    modelos : list[Any]
+        Modelos entrenados en cada fold si se han pedido
+    mejores_iteraciones : list[int]
+        Mejor iteración de cada fold en los modelos con early stopping
+    """
+
+    scores: NDArray[np.float_]
+    y_pred: NDArray[Any]
+    tiempos_fit: NDArray[np.float_]
+    tiempos_predict: NDArray[np.float_]
+    modelos: list[Any] = field(default_factory=list)
+    mejores_iteraciones: list[int] = field(default_factory=list)
+
+
+def _filas(X: NDArray[Any] | pd.DataFrame, indices: NDArray[np.int_]) -> Any:
+    return X.iloc[indices] if isinstance(X, pd.DataFrame) else X[indices]
+
+
+def _separar_validacion(
+    train: NDArray[np.int_], y: NDArray[Any], fraccion: float
+) -> tuple[NDArray[np.int_], NDArray[np.int_]]:
+    """Separa una parte de los índices de train como eval set,
+    estratificada si todas las clases tienen muestras suficientes"""
+    try:
+        train, validacion = train_test_split(
+            train, test_size=fraccion, stratify=y[train], random_state=42
+        )
+    except ValueError:
+        train, validacion = train_test_split(train, test_size=fraccion, random_state=42)
+    return train, validacion
+
+
+def _ajustar_fold(
+    modelo: Any,
+    X: NDArray[Any] | pd.DataFrame,
+    y: NDArray[Any],
+    train: NDArray[np.int_],
+    test: NDArray[np.int_],
+    fraccion_validacion: float | None = None,
+) -> tuple[Any, NDArray[Any], float, float]:
+    modelo = clone(modelo)
+    fit_params: dict[str, Any] = {}
+    if fraccion_validacion is not None:
+        train, validacion = _separar_validacion(train, y, fraccion_validacion)
+        fit_params = {
+            "eval_set": [(_filas(X, validacion), y[validacion])],
+            "verbose": False,
+        }
+    inicio = time.perf_counter()
+    modelo.fit(_filas(X, train), y[train], **fit_params)
+    tiempo_fit = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    y_pred = modelo.predict(_filas(X, test))
+    tiempo_predict = time.perf_counter() - inicio
+    return modelo, y_pred, tiempo_fit, tiempo_predict
+
+
+def validar_cv(
+    modelo: Any,
+    X: NDArray[Any] | pd.DataFrame,
+    y: NDArray[Any],
+    n_splits: int = settings.SPLITS_FOR_CV,
+    n_jobs: int | None = None,
+    devolver_modelos: bool = False,
+    fraccion_validacion: float | None = None,
+) -> ResultadoCV:
+    """Entrena una vez el modelo en cada fold de un
+    ``StratifiedKFold`` y devuelve la accuracy de cada fold,
+    las predicciones out-of-fold y los tiempos
+
+    Parameters
+    ----------
+    modelo : Any
+        Clasificador con la firma de Scikit-Learn. No se modifica,
+        cada fold entrena un clon
+    X : NDArray[Any] | pd.DataFrame
+        _description_
+    y : NDArray[Any]
+        _description_
+    n_splits : int, optional
+        _description_, by default settings.SPLITS_FOR_CV
+    n_jobs : int | None, optional
+        Folds entrenados en paralelo. Por defecto se entrenan de
+        uno en uno porque los modelos ya usan todos los hilos con
+        su propio ``n_jobs``; si se paraleliza conviene limitarlos
+        para no pedir más hilos que cpus, by default None
+    devolver_modelos : bool, optional
+        Guarda los modelos de cada fold, por ejemplo para
+        ensamblarlos, by default False
+    fraccion_validacion : float | None, optional
+        Si se pasa, cada fold separa esta fracción de su train
+        como eval set para el early stopping de xgboost, by default None
+
+    Returns
+    -------
+    ResultadoCV
+        _description_
+    """
+    y = np.asarray(y)
+    folds = list(StratifiedKFold(n_splits=n_splits).split(X, y))
+    resultados = Parallel(n_jobs=n_jobs)(
+        delayed(_ajustar_fold)(modelo, X, y, train, test, fraccion_validacion)
+        for train, test in folds
+    )
+
+    y_pred = np.empty(len(y), dtype=resultados[0][1].dtype)
+    scores, tiempos_fit, tiempos_predict = [], [], []
+    modelos, mejores_iteraciones = [], []
+    for (_, test), (modelo_fold, pred_fold, t_fit, t_predict) in zip(folds, resultados):
+        y_pred[test] = pred_fold
+        scores.append(accuracy_score(y[test], pred_fold))
+        tiempos_fit.append(t_fit)
+        tiempos_predict.append(t_predict)
+        if devolver_modelos:
+            modelos.append(modelo_fold)
+        mejor_iteracion = getattr(modelo_fold, "best_iteration", None)
+        if fraccion_validacion is not None and mejor_iteracion is not None:
+            mejores_iteraciones.append(int(mejor_iteracion))
+
+    return ResultadoCV(
+        scores=np.array(scores),
+        y_pred=y_pred,
+        tiempos_fit=np.array(tiempos_fit),
+        tiempos_predict=np.array(tiempos_predict),
+        modelos=modelos,
+        mejores_iteraciones=mejores_iteraciones,
+    )
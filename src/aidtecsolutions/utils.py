@@ -14,16 +14,29 @@
 
 " Script con funciones auxiliares para todo el proyectos"
 
+from __future__ import annotations
+
+import csv
+import hashlib
+import importlib.util
 from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Iterator
+
+from aidtecsolutions.custom_exceptions import NonValidDataset, UnsupportedFileFormat
+import settings
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
 
-from aidtecsolutions.custom_exceptions import NonValidDataset
+    from aidtecsolutions.esquema import Esquema
 
 
 def is_valid_dataset(file_name: str, folder: Path) -> bool:
     """Comprueba que el archivo esté en un determinado
-    directorio
+    directorio. Lo busca en el catálogo de la carpeta sin
+    listarla. Si la carpeta aún no tiene catálogo comprueba
+    solo el archivo, sin crear el índice
 
     Parameters
     ----------
@@ -37,11 +50,48 @@ def is_valid_dataset(file_name: str, folder: Path) -> bool:
     bool
         _description_
     """
-    lista_archivos = [archivo.name for archivo in folder.iterdir()]
-    return file_name in lista_archivos
+    import sqlite3
+
+    from aidtecsolutions.catalogo import abrir_catalogo
+
+    if not (Path(folder) / settings.DATASET_CATALOG_INDEX).is_file():
+        return (Path(folder) / file_name).is_file()
+    try:
+        return abrir_catalogo(folder).existe(file_name)
+    except sqlite3.Error:
+        # Carpeta inexistente o de solo lectura
+        return (Path(folder) / file_name).is_file()
+
+
+def hash_archivo(ruta: Path, tamano_bloque: int = 1 << 20) -> str:
+    """Devuelve el sha256 del contenido de un archivo
+    leyéndolo por bloques
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+    tamano_bloque : int, optional
+        Bytes leídos en cada iteración, by default 1 MiB
+
+    Returns
+    -------
+    str
+        _description_
+    """
+    sha256 = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        while bloque := f.read(tamano_bloque):
+            sha256.update(bloque)
+    return sha256.hexdigest()
 
 
-def is_valid_dataframe(file_name_path: Path, file_name: str) -> pd.DataFrame:
+def is_valid_dataframe(
+    file_name_path: Path,
+    file_name: str,
+    esquema: Esquema | None = None,
+    float32: bool = False,
+) -> pd.DataFrame:
     """Comprueba si un dataset es válido
 
     Parameters
@@ -50,6 +100,13 @@ def is_valid_dataframe(file_name_path: Path, file_name: str) -> pd.DataFrame:
         _description_
     file_name : str
         _description_
+    esquema : Esquema | None, optional
+        Esquema con el que comprobar las columnas antes de leer
+        y con los tipos de cada una. Sin esquema pandas infiere
+        los tipos, by default None
+    float32 : bool, optional
+        Lee como float32 las columnas float64 del esquema,
+        by default False
 
     Returns
     -------
@@ -62,8 +119,345 @@ def is_valid_dataframe(file_name_path: Path, file_name: str) -> pd.DataFrame:
         Si el dataset no es válido
     """
     try:
-        df = pd.read_csv(file_name_path / file_name, index_col=0)
+        df = leer_dataset(file_name_path / file_name, esquema=esquema, float32=float32)
     except Exception as err:
         raise NonValidDataset(f"El dataset no es válido. Error: {err}")
+
+    registrar_en_catalogo(file_name_path / file_name, df)
+    return df
+
+
+def registrar_en_catalogo(
+    ruta: Path, df: pd.DataFrame | None = None, filas: int | None = None
+) -> None:
+    """Registra el dataset con sus filas y columnas en el catálogo
+    de su carpeta, sin calcular su sha256. Si el catálogo no se
+    puede escribir no hace nada
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+    df : pd.DataFrame | None, optional
+        Contenido del dataset. Si es None solo se registran el
+        tamaño y ``filas``, by default None
+    filas : int | None, optional
+        Filas del dataset cuando no se pasa ``df``, by default None
+    """
+    import sqlite3
+
+    from aidtecsolutions.catalogo import registrar_dataset
+
+    columnas = None
+    if df is not None:
+        filas = len(df)
+        columnas = {str(col): str(tipo) for col, tipo in df.dtypes.items()}
+    try:
+        registrar_dataset(ruta, filas=filas, columnas=columnas)
+    except sqlite3.Error:
+        pass
+
+
+def formato_dataset(ruta: Path) -> str:
+    """Devuelve el formato de un dataset a partir de
+    la extensión del archivo
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+
+    Returns
+    -------
+    str
+        Extensión del archivo, por ejemplo ``.parquet``
+
+    Raises
+    ------
+    UnsupportedFileFormat
+        Si la extensión no es de un formato soportado
+    """
+    formato = Path(ruta).suffix.lower()
+    if formato not in settings.DATASET_FORMATS:
+        raise UnsupportedFileFormat(
+            f"Formato {formato!r} no soportado. "
+            f"Formatos válidos: {', '.join(settings.DATASET_FORMATS)}"
+        )
+    return formato
+
+
+def columnas_dataset(ruta: Path) -> tuple[list[str], list[str]]:
+    """Devuelve las columnas de un dataset leyendo solo la
+    cabecera del csv o el schema de parquet y feather
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+
+    Returns
+    -------
+    tuple[list[str], list[str]]
+        Columnas del índice y resto de columnas
+    """
+    formato = formato_dataset(ruta)
+    if formato == ".csv":
+        with open(ruta, newline="", encoding="utf-8") as f:
+            cabecera = next(csv.reader(f), [])
+        return cabecera[:1], cabecera[1:]
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if formato == ".parquet":
+        schema = pq.read_schema(ruta)
+    else:
+        with pa.OSFile(str(ruta)) as archivo:
+            schema = pa.ipc.open_file(archivo).schema
+    # Los RangeIndex no se guardan como columna
+    indices = [
+        col
+        for col in (schema.pandas_metadata or {}).get("index_columns", [])
+        if isinstance(col, str)
+    ]
+    return indices, [col for col in schema.names if col not in indices]
+
+
+def leer_dataset(
+    ruta: Path,
+    esquema: Esquema | None = None,
+    columnas: list[str] | None = None,
+    float32: bool = False,
+    **kwargs: Any,
+) -> pd.DataFrame:
+    """Carga un dataset en csv, parquet o feather según
+    su extensión. Los formatos columnares guardan los tipos
+    y el índice, por lo que no hay que volver a inferirlos.
+
+    Con ``esquema`` o ``columnas`` comprueba antes de leer que el
+    archivo tenga las columnas y lee solo las pedidas con los
+    tipos del esquema. Los csv se leen entonces con el motor
+    de pyarrow si está instalado.
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+    esquema : Esquema | None, optional
+        Por ejemplo ``aidtecsolutions.esquema.RAW``, by default None
+    columnas : list[str] | None, optional
+        Columnas a leer además del índice. Por defecto
+        todas, by default None
+    float32 : bool, optional
+        Lee como float32 las columnas float64 del esquema,
+        by default False
+    **kwargs : Any
+        Argumentos extra para la función de lectura de pandas
+
+    Returns
+    -------
+    pd.DataFrame
+        _description_
+
+    Raises
+    ------
+    NonValidSchema
+        Si el archivo no tiene las columnas obligatorias del
+        esquema o las de ``columnas``
+    """
+    # pandas se importa al leer para que los comandos arranquen rápido
+    import pandas as pd
+
+    formato = formato_dataset(ruta)
+    if esquema is None and columnas is None:
+        if formato == ".parquet":
+            return pd.read_parquet(ruta, **kwargs)
+        if formato == ".feather":
+            return pd.read_feather(ruta, **kwargs)
+        return pd.read_csv(ruta, index_col=0, **kwargs)
+
+    from aidtecsolutions.esquema import Esquema
+
+    esquema = esquema or Esquema(nombre="vacío", tipos={})
+    indices, nombres = columnas_dataset(ruta)
+    esquema.validar(nombres, columnas)
+    seleccion = nombres if columnas is None else columnas
+    tipos = esquema.tipos_columnas(seleccion, float32=float32)
+    if columnas is not None:
+        kwargs["usecols" if formato == ".csv" else "columns"] = [*indices, *columnas]
+
+    if formato == ".csv":
+        # El motor de pyarrow no admite todas las opciones de read_csv
+        if "engine" not in kwargs and set(kwargs) <= {"usecols"}:
+            if importlib.util.find_spec("pyarrow") is not None:
+                kwargs["engine"] = "pyarrow"
+        return pd.read_csv(ruta, index_col=0, dtype=tipos, **kwargs)
+
+    if formato == ".parquet":
+        df = pd.read_parquet(ruta, **kwargs)
     else:
-        return df
+        df = pd.read_feather(ruta, **kwargs)
+    distintos = {col: tipo for col, tipo in tipos.items() if df[col].dtype != tipo}
+    return df.astype(distintos) if distintos else df
+
+
+def guardar_dataset(df: pd.DataFrame, ruta: Path) -> None:
+    """Guarda un dataset en csv, parquet o feather según
+    su extensión
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        _description_
+    ruta : Path
+        _description_
+    """
+    with EscritorDataset(ruta) as escritor:
+        escritor.escribir(df)
+
+
+def convertir_dataset(origen: Path, destino: Path) -> pd.DataFrame:
+    """Convierte un dataset entre csv, parquet y feather según
+    las extensiones de los archivos. Las columnas de
+    ``settings.CATEGORICAL_COLUMNS`` se guardan como category.
+
+    Parameters
+    ----------
+    origen : Path
+        _description_
+    destino : Path
+        _description_
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataset convertido
+    """
+    formato_dataset(destino)
+    df = leer_dataset(origen)
+    for col in settings.CATEGORICAL_COLUMNS:
+        if col in df and df[col].dtype == "object":
+            df[col] = df[col].astype("category")
+    guardar_dataset(df, destino)
+    return df
+
+
+def leer_dataset_por_chunks(
+    ruta: Path, chunksize: int, dtype: dict[str, str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """Lee un dataset por bloques de como mucho ``chunksize`` filas
+
+    Parameters
+    ----------
+    ruta : Path
+        _description_
+    chunksize : int
+        Número de filas de cada bloque
+    dtype : dict[str, str] | None, optional
+        Tipos a forzar en todos los bloques al leer un csv.
+        Los formatos columnares ya guardan los tipos, by default None
+
+    Yields
+    ------
+    Iterator[pd.DataFrame]
+        Bloques del dataset
+
+    Raises
+    ------
+    NonValidDataset
+        Si el dataset no es válido
+    """
+    try:
+        formato = formato_dataset(ruta)
+        if formato == ".csv":
+            import pandas as pd
+
+            with pd.read_csv(
+                ruta, index_col=0, chunksize=chunksize, dtype=dtype
+            ) as lector:
+                yield from lector
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if formato == ".parquet":
+            archivo = pq.ParquetFile(ruta)
+            schema = archivo.schema_arrow
+            lotes = archivo.iter_batches(batch_size=chunksize)
+        else:
+            lector_ipc = pa.ipc.open_file(ruta)
+            schema = lector_ipc.schema
+            lotes = (
+                lote
+                for n in range(lector_ipc.num_record_batches)
+                for lote in pa.Table.from_batches([lector_ipc.get_batch(n)]).to_batches(
+                    max_chunksize=chunksize
+                )
+            )
+        for lote in lotes:
+            # Reconstruimos la tabla con el schema para conservar el índice
+            yield pa.Table.from_batches([lote], schema=schema).to_pandas()
+    except Exception as err:
+        raise NonValidDataset(f"El dataset no es válido. Error: {err}")
+
+
+class EscritorDataset:
+    """Escribe un dataset por bloques en csv, parquet o feather
+    según la extensión del archivo. Todos los bloques deben
+    tener las mismas columnas y tipos.
+
+    Se usa como context manager:
+
+    >>> with EscritorDataset(ruta) as escritor:
+    ...     for chunk in chunks:
+    ...         escritor.escribir(chunk)
+    """
+
+    def __init__(self, ruta: Path) -> None:
+        self.ruta = Path(ruta)
+        self.formato = formato_dataset(self.ruta)
+        self.filas = 0
+        self._escritor: Any = None
+        self._schema: Any = None
+
+    def __enter__(self) -> "EscritorDataset":
+        return self
+
+    def escribir(self, chunk: pd.DataFrame) -> None:
+        """Añade un bloque al final del archivo"""
+        if self.formato == ".csv":
+            chunk.to_csv(
+                self.ruta,
+                mode="w" if self.filas == 0 else "a",
+                header=self.filas == 0,
+            )
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabla = pa.Table.from_pandas(
+                chunk, schema=self._schema, preserve_index=True
+            )
+            if self._escritor is None:
+                self._schema = tabla.schema
+                if self.formato == ".parquet":
+                    self._escritor = pq.ParquetWriter(self.ruta, self._schema)
+                else:
+                    # Misma compresión por defecto que pandas.to_feather
+                    self._escritor = pa.ipc.new_file(
+                        self.ruta,
+                        self._schema,
+                        options=pa.ipc.IpcWriteOptions(compression="lz4"),
+                    )
+            self._escritor.write_table(tabla)
+        self.filas += len(chunk)
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._escritor is not None:
+            self._escritor.close()
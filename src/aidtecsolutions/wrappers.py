@@ -14,8 +14,12 @@
 
 """Script para las clases wrappers de objetos de sklearn"""
 
+import importlib
+import json
 import joblib
 from pathlib import Path
+import platform
+import re
 from typing import cast, Any
 
 import numpy as np
@@ -24,15 +28,179 @@ import pandas as pd
 from sklearn.base import BaseEstimator, ClassifierMixin, TransformerMixin
 from sklearn.utils.validation import check_is_fitted
 
+from aidtecsolutions.custom_exceptions import NonValidModel
+
+
+FORMATO_XGBOOST = "xgboost-ubj"
+
+
+def _es_xgboost(modelo: Any) -> bool:
+    # Sin importar xgboost si el modelo no lo usa
+    return type(modelo).__module__.split(".")[0] == "xgboost"
+
+
+def _parametros_json(modelo: Any) -> dict[str, Any]:
+    """Parámetros del modelo que se guardan en el manifiesto.
+    Tienen que poder escribirse en json tal cual, convertirlos a
+    texto reconstruiría otro modelo al cargarlo
+
+    Raises
+    ------
+    NonValidModel
+        Si algún parámetro no se puede escribir en json
+    """
+    parametros = modelo.get_params()
+    no_serializables = []
+    for nombre, valor in parametros.items():
+        try:
+            json.dumps(valor)
+        except (TypeError, ValueError):
+            no_serializables.append(nombre)
+    if no_serializables:
+        raise NonValidModel(
+            "Parámetros que no se pueden guardar en el manifiesto: "
+            f"{', '.join(no_serializables)}"
+        )
+    return cast(dict[str, Any], parametros)
+
+
+def _version(version: str) -> tuple[int, ...]:
+    # Solo major.minor, el formato UBJSON no cambia entre parches
+    return tuple(int(parte) for parte in re.findall(r"\d+", version)[:2])
+
+
+def _guardar_xgboost(
+    modelo: Any, model_path: Path, clases_etiquetas: list[Any] | None
+) -> Path:
+    """Guarda un modelo de xgboost en su formato nativo UBJSON
+    y un manifiesto json con lo necesario para reconstruirlo
+
+    Parameters
+    ----------
+    modelo : Any
+        Modelo de xgboost con la api de sklearn ya entrenado
+    model_path : Path
+        _description_
+    clases_etiquetas : list[Any] | None
+        Etiquetas originales del label encoder
+
+    Returns
+    -------
+    Path
+        Ruta del modelo guardado, con extensión ``.ubj``
+
+    Raises
+    ------
+    NonValidModel
+        Si algún parámetro no se puede escribir en json
+    """
+    import sklearn
+    import xgboost
+
+    ruta_modelo = model_path.with_suffix(".ubj")
+    manifiesto = {
+        "formato": FORMATO_XGBOOST,
+        "modelo": ruta_modelo.name,
+        "clase": f"{type(modelo).__module__}.{type(modelo).__qualname__}",
+        "parametros": _parametros_json(modelo),
+        "clases": np.asarray(modelo.classes_).tolist(),
+        "clases_etiquetas": clases_etiquetas,
+        "feature_names": (
+            list(modelo.feature_names_in_)
+            if hasattr(modelo, "feature_names_in_")
+            else None
+        ),
+        "versiones": {
+            "python": platform.python_version(),
+            "xgboost": xgboost.__version__,
+            "scikit-learn": sklearn.__version__,
+            "numpy": np.__version__,
+        },
+    }
+    modelo.save_model(ruta_modelo)
+    with open(model_path.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2)
+    return ruta_modelo
+
+
+def _cargar_xgboost(model_path: Path) -> Any:
+    """Reconstruye el modelo de xgboost a partir de su
+    manifiesto y del archivo UBJSON
+
+    Raises
+    ------
+    NonValidModel
+        Si el modelo se guardó con una versión de xgboost más
+        nueva que la instalada o sus clases o features no
+        coinciden con las del manifiesto
+    """
+    import xgboost
+
+    with open(model_path.with_suffix(".json"), encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    # xgboost carga modelos de versiones anteriores pero no de posteriores
+    version = manifiesto["versiones"]["xgboost"]
+    if _version(version) > _version(xgboost.__version__):
+        raise NonValidModel(
+            f"{model_path.name} se guardó con xgboost {version} "
+            f"y está instalado {xgboost.__version__}"
+        )
+    modulo, clase = manifiesto["clase"].rsplit(".", 1)
+    modelo = getattr(importlib.import_module(modulo), clase)(**manifiesto["parametros"])
+    modelo.load_model(model_path.parent / manifiesto["modelo"])
+
+    if not np.array_equal(modelo.classes_, manifiesto["clases"]):
+        raise NonValidModel(
+            f"Las clases de {model_path.name} no coinciden con las del manifiesto"
+        )
+    feature_names = getattr(modelo, "feature_names_in_", None)
+    if feature_names is not None:
+        feature_names = list(feature_names)
+    if feature_names != manifiesto["feature_names"]:
+        raise NonValidModel(
+            f"Las features de {model_path.name} no coinciden con las del manifiesto"
+        )
+    return modelo
+
 
 class SerializableMixin:
     """Clase que implementa el método save
     para serializar un modelo"""
 
-    def save(self, model_path: Path) -> None:
-        """Serializa el modelo usando joblib"""
-        with open(model_path, "wb") as f:
-            joblib.dump(self, f)
+    def save(self, model_path: Path, clases_etiquetas: list[Any] | None = None) -> Path:
+        """Serializa el modelo.
+
+        Los clasificadores de xgboost se guardan en su formato nativo
+        UBJSON (``.ubj``) junto con un manifiesto ``.json`` con la
+        clase, los parámetros, las clases, los nombres de las features
+        y las versiones de las librerías. Es más compacto, más rápido
+        de cargar y no depende de la versión exacta de las librerías.
+        Sus parámetros se guardan tal cual en el manifiesto, así que
+        tienen que poder escribirse en json. Al cargarlo se comprueba
+        la versión de xgboost y que las clases y las features sean
+        las del manifiesto.
+
+        El resto se serializa con joblib sin comprimir, con los arrays
+        de numpy alineados para poder cargarlos con ``mmap_mode``.
+
+        Parameters
+        ----------
+        model_path : Path
+            _description_
+        clases_etiquetas : list[Any] | None, optional
+            Etiquetas originales del label encoder, se guardan
+            en el manifiesto de xgboost, by default None
+
+        Returns
+        -------
+        Path
+            Ruta del archivo guardado
+        """
+        classifier = vars(self).get("classifier")
+        if _es_xgboost(classifier):
+            return _guardar_xgboost(classifier, Path(model_path), clases_etiquetas)
+        joblib.dump(self, model_path)
+        return Path(model_path)
 
 
 class DeserializableMixin(SerializableMixin):
@@ -51,9 +219,39 @@ class DeserializableMixin(SerializableMixin):
     """
 
     @classmethod
-    def load(cls, model_path: str | Path) -> "SerializableClassifier":
-        with open(model_path, "rb") as f:
-            classifier = cast(SerializableClassifier, joblib.load(f))
+    def load(
+        cls, model_path: str | Path, mmap_mode: str | None = None
+    ) -> "SerializableClassifier":
+        """Carga el modelo. Con ``mmap_mode="r"`` los arrays de numpy
+        no se leen en memoria sino que se mapean desde el archivo, de
+        modo que varios procesos comparten la caché de páginas del
+        sistema operativo en lugar de tener cada uno su copia.
+
+        Los árboles de sklearn y el booster de xgboost copian sus nodos
+        a estructuras propias al cargarse, así que con ellos solo se
+        evita la copia intermedia y baja el pico de memoria de la carga.
+
+        Los modelos ``.ubj`` se cargan con el formato nativo de xgboost
+        a partir de su manifiesto y ``mmap_mode`` no se usa.
+
+        Parameters
+        ----------
+        model_path : str | Path
+            _description_
+        mmap_mode : str | None, optional
+            _description_, by default None
+
+        Returns
+        -------
+        SerializableClassifier
+            _description_
+        """
+        if Path(model_path).suffix == ".ubj":
+            return SerializableClassifier(_cargar_xgboost(Path(model_path)))
+        # joblib solo mapea los arrays si recibe la ruta, no un archivo abierto
+        classifier = cast(
+            SerializableClassifier, joblib.load(model_path, mmap_mode=mmap_mode)
+        )
         return classifier
 
 
@@ -127,8 +325,9 @@ class SerializableClassifier(
         self,
         X: NDArray[np.float64] | pd.DataFrame,
         y: NDArray[np.float64] | pd.DataFrame,
+        **fit_params: Any,
     ) -> "SerializableClassifier":
-        self.classifier.fit(X, y)
+        self.classifier.fit(X, y, **fit_params)
         return self
 
     def predict(self, X: NDArray[np.float64] | pd.DataFrame) -> NDArray[np.int64]:
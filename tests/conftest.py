@@ -12,23 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import pandas as pd
 import pytest
 
 from aidtecsolutions.models.predict_model import PredictModel
+from aidtecsolutions.utils import leer_dataset
 import settings
 
 
 @pytest.fixture(scope="session")
 def train_raw():
     # Cargamos el dataset
-    df_train_raw = pd.read_csv(settings.FOLDER_DATA_RAW / 'train.csv', index_col=0)
+    df_train_raw = leer_dataset(settings.FOLDER_DATA_RAW / 'train.csv')
     return df_train_raw
 
 @pytest.fixture(scope="session")
 def test_raw():
     # Cargamos el dataset
-    df_test_raw = pd.read_csv(settings.FOLDER_DATA_RAW / 'test.csv', index_col=0)
+    df_test_raw = leer_dataset(settings.FOLDER_DATA_RAW / 'test.csv')
     return df_test_raw
 
 @pytest.fixture(scope="session")
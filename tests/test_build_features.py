@@ -13,14 +13,34 @@
 # limitations under the License.
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
 
 import numpy as np
 import pandas as pd
 import pytest
+from sklearn.exceptions import NotFittedError
 
-from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
-from aidtecsolutions.features.build_features import setup_parser
-from aidtecsolutions.features.utils import generate_dataset_name, parse_col_name
+import settings
+
+from aidtecsolutions.features.custom_transformers import (
+    RBF_CENTROS,
+    RBF_GAMMAS,
+    WineDatasetTransformer,
+    _muestreo_reservorio,
+)
+from aidtecsolutions.features.build_features import main, setup_parser
+from aidtecsolutions.features.cache import (
+    AlmacenColumnas,
+    CacheDatasets,
+    hash_archivo,
+)
+from aidtecsolutions.features.utils import (
+    generate_dataset_name,
+    parse_col_name,
+    transformar_dataset_por_chunks,
+)
 from aidtecsolutions.custom_exceptions import (
     WrongColumnName,
     WrongColumnType
@@ -421,3 +441,661 @@ def good_parsed_col_name() -> None:
     list_col_names = ['color', 'alcohol', 'dioxido_de_azufre_libre ']  # Extra espacio al final  
     expected = ['color', 'alcohol', 'dioxido de azufre libre']
     assert parse_col_name(list_col_names) == expected
+
+
+def test_corregir_alcohol_vectorizado_identico_al_original(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer()
+    original = wt._corregir_valores_alcohol_pandas(train_raw['alcohol'])
+    vectorizado = wt._corregir_valores_alcohol(train_raw['alcohol'])
+    assert vectorizado.index.equals(original.index)
+    # Comparamos bit a bit
+    assert np.array_equal(vectorizado.to_numpy().view('int64'), original.to_numpy().view('int64'))
+
+
+def test_corregir_alcohol_vectorizado_valores_aleatorios():
+    rng = np.random.default_rng(42)
+    valores = []
+    for _ in range(5000):
+        if rng.random() < 0.5:
+            valores.append(str(round(rng.uniform(8, 15), int(rng.integers(0, 3)))))
+        else:
+            valor = ''.join(rng.choice(list('0123456789'), int(rng.integers(6, 16))))
+            for _ in range(int(rng.integers(0, 5))):
+                pos = int(rng.integers(0, len(valor) + 1))
+                valor = valor[:pos] + '.' + valor[pos:]
+            valores.append(valor)
+    feature = pd.Series(valores, index=rng.permutation(len(valores)), name='alcohol')
+    wt = WineDatasetTransformer()
+    original = wt._corregir_valores_alcohol_pandas(feature)
+    vectorizado = wt._corregir_valores_alcohol(feature)
+    assert vectorizado.index.equals(original.index)
+    assert np.array_equal(vectorizado.to_numpy(), original.to_numpy())
+
+
+def test_corregir_alcohol_tipo_numerico():
+    wt = WineDatasetTransformer()
+    corregido = wt._corregir_valores_alcohol(pd.Series([11.2, 9.8]))
+    assert corregido.dtype == 'float64'
+    assert corregido.tolist() == [11.2, 9.8]
+
+
+def test_corregir_alcohol_tipo_no_valido():
+    wt = WineDatasetTransformer()
+    with pytest.raises(ValueError):
+        wt._corregir_valores_alcohol(pd.Series(pd.to_datetime(['2024-01-01'])))
+
+
+def dividir_por_diez(valor: float) -> float:
+    """Implementación original de la corrección de densidad"""
+    while valor >= 10:
+        valor /= 10
+    return valor
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_corregir_densidad_vectorizado_igual_al_bucle(semilla: int):
+    rng = np.random.default_rng(semilla)
+    n = 20000
+    # Densidades correctas, valores entre 2 y 10 y densidades multiplicadas por 10^k
+    valores = np.round(rng.uniform(0.98, 1.01, n), int(rng.integers(3, 7)))
+    escala = 10.0 ** rng.integers(0, 8, n)
+    valores = np.where(rng.random(n) < 0.1, rng.uniform(2, 10, n), valores * escala)
+    valores = np.where(rng.random(n) < 0.05, rng.uniform(0, 1e12, n), valores)
+    feature = pd.Series(valores, index=rng.permutation(n), name='densidad')
+
+    wt = WineDatasetTransformer()
+    esperado = feature.apply(dividir_por_diez)
+    corregido = wt._corregir_valores_densidad(feature)
+    assert corregido.index.equals(feature.index)
+    assert np.array_equal(corregido.to_numpy(), esperado.to_numpy())
+
+
+def test_corregir_densidad_valores_entre_2_y_10_sin_cambios():
+    feature = pd.Series([2.5, 9.99, 10.0, 0.995, 99.5])
+    corregido = WineDatasetTransformer()._corregir_valores_densidad(feature)
+    assert corregido.tolist() == [2.5, 9.99, 1.0, 0.995, 9.95]
+
+
+def test_feature_parser_chunksize() -> None:
+    parser = setup_parser()
+    args = parser.parse_args(['--con', 'train.csv', '--chunksize', '1000', '--save'])
+    assert args.chunksize == 1000
+
+
+@pytest.mark.parametrize('remove_outliers, standardize', [
+    (False, False),
+    (True, False),
+    (False, True),
+    (True, True),
+])
+def test_transformar_por_chunks_igual_que_en_memoria(
+    train_raw: pd.DataFrame, tmp_path, remove_outliers, standardize
+):
+    parametros = dict(
+        remove_outliers=remove_outliers, standardize=standardize, shuffle=False
+    )
+    ruta_salida = tmp_path / 'train_procesado.csv'
+    filas = transformar_dataset_por_chunks(
+        WineDatasetTransformer(**parametros),
+        settings.FOLDER_DATA_RAW / 'train.csv',
+        ruta_salida,
+        chunksize=1000,
+    )
+    por_chunks = pd.read_csv(ruta_salida, index_col=0)
+    en_memoria = WineDatasetTransformer(**parametros).fit_transform(train_raw)
+
+    assert filas == len(en_memoria)
+    assert list(por_chunks.columns) == list(en_memoria.columns)
+    assert (por_chunks.index == en_memoria.index).all()
+    assert np.allclose(por_chunks.to_numpy(), en_memoria.to_numpy(), rtol=1e-9)
+
+
+def test_transformar_por_chunks_shuffle(train_raw: pd.DataFrame, tmp_path):
+    ruta_salida = tmp_path / 'train_procesado.csv'
+    filas = transformar_dataset_por_chunks(
+        WineDatasetTransformer(shuffle=True),
+        settings.FOLDER_DATA_RAW / 'train.csv',
+        ruta_salida,
+        chunksize=1000,
+    )
+    barajado = pd.read_csv(ruta_salida, index_col=0)
+    assert filas == len(train_raw) == len(barajado)
+    # Mismas filas en distinto orden
+    assert sorted(barajado.index) == sorted(train_raw.index)
+    assert (barajado.index != train_raw.index).any()
+
+
+def test_muestreo_reservorio_tamano_y_tipos(train_raw: pd.DataFrame):
+    bloques = (train_raw.iloc[i:i + 500] for i in range(0, len(train_raw), 500))
+    muestra = _muestreo_reservorio(bloques, 1000)
+    assert len(muestra) == 1000
+    assert muestra.index.is_unique
+    assert set(muestra.index) <= set(train_raw.index)
+    assert (muestra.dtypes == train_raw.dtypes).all()
+
+
+def test_transform_sin_fit():
+    wt = WineDatasetTransformer()
+    with pytest.raises(NotFittedError):
+        wt.transform(pd.DataFrame())
+
+
+def test_transform_lotes_pequenos_igual_que_dataset_completo(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(
+        remove_outliers=False, standardize=True, shuffle=False
+    ).fit(train_raw)
+    completo = wt.transform(train_raw)
+    # Llamadas repetidas con lotes de distinto tamaño, incluido 1 fila
+    for inicio, fin in [(0, 1), (1, 2), (10, 110), (0, len(train_raw))]:
+        lote = wt.transform(train_raw.iloc[inicio:fin])
+        pd.testing.assert_frame_equal(lote, completo.iloc[inicio:fin])
+
+
+def test_transform_no_modifica_estado(train_raw: pd.DataFrame, test_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(standardize=True, shuffle=False).fit(train_raw)
+    media = wt.sc.mean_.copy()
+    wt.transform(test_raw)
+    # El dataset de test se estandariza con la media de train
+    assert np.array_equal(wt.sc.mean_, media)
+
+
+def test_remove_outliers_transform_usa_modelo_ajustado(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(remove_outliers=True, shuffle=False).fit(train_raw)
+    estimadores = wt.isolation_forest.estimators_
+    primera = wt.transform(train_raw.iloc[:200])
+    segunda = wt.transform(train_raw.iloc[:200])
+    assert wt.isolation_forest.estimators_ is estimadores
+    pd.testing.assert_frame_equal(primera, segunda)
+
+
+def test_generate_dataset_name_formato():
+    parser = setup_parser()
+    args = parser.parse_args(['--con', 'train.csv', '--alcohol', '--formato', 'parquet'])
+    assert generate_dataset_name(args) == 'train.csv-corregir_alcohol.parquet'
+
+
+def test_transformar_por_chunks_parquet(train_raw: pd.DataFrame, tmp_path):
+    pytest.importorskip('pyarrow')
+    ruta_salida = tmp_path / 'train_procesado.parquet'
+    transformar_dataset_por_chunks(
+        WineDatasetTransformer(shuffle=True),
+        settings.FOLDER_DATA_RAW / 'train.csv',
+        ruta_salida,
+        chunksize=1000,
+    )
+    barajado = pd.read_parquet(ruta_salida)
+    en_memoria = WineDatasetTransformer(shuffle=False).fit_transform(train_raw)
+    pd.testing.assert_frame_equal(barajado.loc[en_memoria.index], en_memoria)
+
+
+def test_cache_clave_depende_de_parametros_y_origen():
+    params = WineDatasetTransformer(corregir_alcohol=True).get_params()
+    otros_params = WineDatasetTransformer(corregir_alcohol=False).get_params()
+    clave = CacheDatasets.clave('a' * 64, params)
+    assert clave == CacheDatasets.clave('a' * 64, dict(reversed(params.items())))
+    assert clave != CacheDatasets.clave('a' * 64, otros_params)
+    assert clave != CacheDatasets.clave('b' * 64, params)
+
+
+def test_cache_hash_origen_cambia_con_el_contenido(tmp_path):
+    ruta = tmp_path / 'origen.csv'
+    ruta.write_text('a,b\n1,2\n')
+    cache = CacheDatasets(tmp_path)
+    hash_inicial = cache.hash_origen(ruta)
+    assert hash_inicial == hash_archivo(ruta)
+    ruta.write_text('a,b\n1,3\n')
+    assert cache.hash_origen(ruta) != hash_inicial
+
+
+def test_cache_buscar_y_registrar(tmp_path):
+    cache = CacheDatasets(tmp_path)
+    assert cache.buscar('clave') is None
+    ruta = tmp_path / 'procesado.csv'
+    ruta.write_text('x\n1\n')
+    cache.registrar('clave', ruta, 'a' * 64, {'shuffle': True}, 1, 0.5)
+    # El índice se conserva entre instancias
+    assert CacheDatasets(tmp_path).buscar('clave') == ruta
+    # Si se modifica el dataset guardado la entrada deja de ser válida
+    time.sleep(0.01)
+    ruta.write_text('x\n2\n')
+    assert cache.buscar('clave') is None
+
+
+def test_cache_desalojar_menos_usados(tmp_path):
+    cache = CacheDatasets(tmp_path)
+    for nombre in ['a', 'b', 'c']:
+        ruta = tmp_path / f'{nombre}.csv'
+        ruta.write_text('x' * 100)
+        cache.registrar(nombre, ruta, 'a' * 64, {}, 1, 0.1)
+    # a pasa a ser el más usado recientemente
+    cache.buscar('a')
+    borrados = cache.desalojar(max_bytes=200)
+    assert borrados == [tmp_path / 'b.csv']
+    assert not (tmp_path / 'b.csv').exists()
+    assert cache.desalojar(max_entradas=1) == [tmp_path / 'c.csv']
+    assert cache.buscar('a') == tmp_path / 'a.csv'
+
+
+def test_cache_escrituras_concurrentes(tmp_path):
+    rutas = []
+    for i in range(20):
+        ruta = tmp_path / f'{i}.csv'
+        ruta.write_text('x\n1\n')
+        rutas.append(ruta)
+
+    def registrar(i):
+        with CacheDatasets(tmp_path) as cache:
+            cache.registrar(str(i), rutas[i], 'a' * 64, {}, 1, 0.1)
+            assert cache.buscar(str(i)) == rutas[i]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(registrar, range(20)))
+    with CacheDatasets(tmp_path) as cache:
+        assert all(cache.buscar(str(i)) == rutas[i] for i in range(20))
+
+
+def test_build_features_acierto_no_lee_el_original(
+    train_raw: pd.DataFrame, tmp_path, monkeypatch, capfd, mocker
+):
+    carpeta_raw = tmp_path / 'raw'
+    carpeta_processed = tmp_path / 'processed'
+    carpeta_raw.mkdir()
+    carpeta_processed.mkdir()
+    train_raw.head(500).to_csv(carpeta_raw / 'train.csv')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', carpeta_raw)
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', carpeta_processed)
+    monkeypatch.setattr(
+        sys, 'argv', ['build_features', '--con', 'train.csv', '--alcohol', '--save']
+    )
+    main()
+    capfd.readouterr()
+
+    lectura = mocker.patch(
+        'aidtecsolutions.features.build_features.is_valid_dataframe',
+        side_effect=AssertionError('no debe leer el original'),
+    )
+    hash_archivo = mocker.patch(
+        'aidtecsolutions.features.cache.hash_archivo',
+        side_effect=AssertionError('no debe volver a calcular el hash'),
+    )
+    main()
+    salida = capfd.readouterr().out
+    assert 'recuperado de la caché' in salida
+    assert 'densidad' in salida
+    lectura.assert_not_called()
+    hash_archivo.assert_not_called()
+
+
+def test_build_features_reutiliza_dataset_cacheado(
+    train_raw: pd.DataFrame, tmp_path, monkeypatch, capfd
+):
+    carpeta_raw = tmp_path / 'raw'
+    carpeta_processed = tmp_path / 'processed'
+    carpeta_raw.mkdir()
+    carpeta_processed.mkdir()
+    train_raw.head(500).to_csv(carpeta_raw / 'train.csv')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', carpeta_raw)
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', carpeta_processed)
+    monkeypatch.setattr(
+        sys, 'argv', ['build_features', '--con', 'train.csv', '--alcohol', '--save']
+    )
+
+    main()
+    assert 'caché' not in capfd.readouterr().out
+    ruta = carpeta_processed / 'train.csv-corregir_alcohol.csv'
+    contenido = ruta.read_bytes()
+
+    main()
+    assert 'recuperado de la caché' in capfd.readouterr().out
+    assert ruta.read_bytes() == contenido
+
+    monkeypatch.setattr(sys, 'argv', sys.argv + ['--no_cache'])
+    main()
+    assert 'caché' not in capfd.readouterr().out
+
+
+def test_profile_desactivado_por_defecto(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer().fit(train_raw)
+    assert not hasattr(wt, 'perfil_')
+    with pytest.raises(NotFittedError):
+        wt.informe_perfil()
+
+
+def test_profile_mide_cada_paso(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(
+        remove_outliers=True, standardize=True, drop_columns=['year'], profile=True
+    )
+    sin_perfil = WineDatasetTransformer(
+        remove_outliers=True, standardize=True, drop_columns=['year']
+    )
+    df = wt.fit_transform(train_raw)
+    assert df.equals(sin_perfil.fit_transform(train_raw))
+
+    informe = wt.informe_perfil()
+    pasos = informe.set_index('paso')
+    assert set(informe['fase']) == {'fit_transform'}
+    for paso in ('corregir_alcohol', 'rbf_diox', 'ajustar_outliers', 'shuffle'):
+        assert paso in pasos.index
+    assert pasos.loc['copia', 'filas_entrada'] == len(train_raw)
+    assert pasos.loc['remove_outliers', 'filas_salida'] == len(df)
+    assert (informe['segundos'] >= 0).all()
+    assert (informe['memoria_pico_mb'] > 0).any()
+
+    wt.transform(train_raw.head(10))
+    assert set(wt.informe_perfil()['fase']) == {'fit_transform', 'transform'}
+    # Un fit nuevo empieza un perfil nuevo
+    wt.fit(train_raw)
+    assert set(wt.informe_perfil()['fase']) == {'fit'}
+
+
+def test_profile_callbacks(train_raw: pd.DataFrame):
+    medidas = []
+    wt = WineDatasetTransformer(profile=True, profile_callbacks=[medidas.append])
+    wt.fit(train_raw).transform(train_raw)
+    assert len(medidas) == len(wt.perfil_.medidas)
+    assert {m.fase for m in medidas} == {'fit', 'transform'}
+
+
+def test_profile_por_chunks(train_raw: pd.DataFrame, tmp_path):
+    ruta = tmp_path / 'train.csv'
+    train_raw.to_csv(ruta)
+    wt = WineDatasetTransformer(remove_outliers=True, standardize=True, profile=True)
+    transformar_dataset_por_chunks(wt, ruta, tmp_path / 'salida.csv', 2000)
+    informe = wt.informe_perfil().set_index(['fase', 'paso'])
+    assert informe.loc[('transform', 'copia'), 'llamadas'] == 3
+    assert informe.loc[('transform', 'copia'), 'filas_entrada'] == len(train_raw)
+
+
+def test_build_features_profile_no_usa_cache(
+    train_raw: pd.DataFrame, tmp_path, monkeypatch, capfd
+):
+    carpeta_raw = tmp_path / 'raw'
+    carpeta_processed = tmp_path / 'processed'
+    carpeta_raw.mkdir()
+    carpeta_processed.mkdir()
+    train_raw.head(500).to_csv(carpeta_raw / 'train.csv')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', carpeta_raw)
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', carpeta_processed)
+    monkeypatch.setattr(
+        sys, 'argv', ['build_features', '--con', 'train.csv', '--alcohol', '--save']
+    )
+    main()
+    capfd.readouterr()
+
+    monkeypatch.setattr(sys, 'argv', sys.argv + ['--profile'])
+    main()
+    salida = capfd.readouterr().out
+    assert 'caché' not in salida
+    assert 'Perfil de las transformaciones' in salida
+    assert 'corregir_alcohol' in salida
+
+
+@pytest.mark.parametrize(
+    'parametros',
+    [
+        dict(shuffle=False),
+        dict(remove_outliers=True, standardize=True, log_transformation=['sulfatos']),
+        dict(standardize=True, drop_columns=['year', 'color']),
+    ],
+)
+def test_transform_no_comparte_memoria_con_la_entrada(
+    train_raw: pd.DataFrame, parametros: dict
+):
+    original = train_raw.copy()
+    wt = WineDatasetTransformer(**parametros).fit(train_raw)
+    for df in (wt.transform(train_raw), wt.fit_transform(train_raw)):
+        pd.testing.assert_frame_equal(train_raw, original)
+        for columna in df.columns:
+            for entrada in train_raw.columns:
+                assert not np.may_share_memory(
+                    df[columna].to_numpy(), train_raw[entrada].to_numpy()
+                )
+
+
+@pytest.mark.parametrize(
+    'parametros',
+    [
+        dict(shuffle=False),
+        dict(remove_outliers=True, standardize=True, log_transformation=['sulfatos']),
+    ],
+)
+def test_copy_false_mismo_resultado(train_raw: pd.DataFrame, parametros: dict):
+    wt = WineDatasetTransformer(**parametros).fit(train_raw)
+    esperado = wt.transform(train_raw)
+    en_sitio = wt.set_params(copy=False).transform(train_raw.copy())
+    pd.testing.assert_frame_equal(en_sitio, esperado)
+    assert list(en_sitio.dtypes) == list(esperado.dtypes)
+
+    fit_transform = WineDatasetTransformer(**parametros).fit_transform(train_raw)
+    en_sitio = WineDatasetTransformer(copy=False, **parametros).fit_transform(
+        train_raw.copy()
+    )
+    pd.testing.assert_frame_equal(en_sitio, fit_transform)
+
+
+def test_fit_no_modifica_la_entrada_con_copy_false(train_raw: pd.DataFrame):
+    original = train_raw.copy()
+    WineDatasetTransformer(copy=False, standardize=True).fit(train_raw)
+    pd.testing.assert_frame_equal(train_raw, original)
+
+
+@pytest.mark.parametrize(
+    'parametros',
+    [
+        dict(shuffle=False),
+        dict(shuffle=True, log_transformation=['sulfatos'], drop_columns=['year']),
+        dict(remove_outliers=True, standardize=True, shuffle=True),
+    ],
+)
+@pytest.mark.parametrize('n_jobs', [2, 3])
+def test_transform_n_jobs_igual_que_en_serie(
+    train_raw: pd.DataFrame, parametros: dict, n_jobs: int
+):
+    wt = WineDatasetTransformer(**parametros).fit(train_raw)
+    esperado = wt.transform(train_raw)
+    wt.set_params(n_jobs=n_jobs).min_filas_particion = 100
+    assert wt._particiones(len(train_raw)) == n_jobs
+    pd.testing.assert_frame_equal(
+        wt.transform(train_raw), esperado, check_exact=True, check_index_type=True
+    )
+
+
+def test_transform_n_jobs_lotes_pequenos_en_serie(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(n_jobs=4).fit(train_raw)
+    # Por debajo de min_filas_particion no merece la pena repartir
+    assert wt._particiones(wt.min_filas_particion - 1) == 1
+    assert WineDatasetTransformer()._particiones(10**9) == 1
+
+
+def test_transform_n_jobs_profile(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(remove_outliers=True, profile=True).fit(train_raw)
+    wt.set_params(n_jobs=2).min_filas_particion = 100
+    wt.transform(train_raw)
+    pasos = wt.informe_perfil().set_index(['fase', 'paso'])
+    # Cada paso se mide una vez por partición y el barajado una sola vez
+    assert pasos.loc[('transform', 'remove_outliers'), 'llamadas'] == 2
+    assert pasos.loc[('transform', 'shuffle'), 'llamadas'] == 1
+
+
+def test_almacen_columnas_guardar_y_cargar(tmp_path):
+    almacen = AlmacenColumnas(tmp_path, 'a' * 64)
+    valores = np.arange(5, dtype='float64')
+    assert almacen.cargar('x', {'paso': 'p'}, 5) is None
+    almacen.guardar('x', {'paso': 'p'}, valores)
+    np.testing.assert_array_equal(almacen.cargar('x', {'paso': 'p'}, 5), valores)
+    # Otras dependencias, otro número de filas u otro dataset original
+    assert almacen.cargar('x', {'paso': 'p', 'gamma': 1}, 5) is None
+    assert almacen.cargar('x', {'paso': 'p'}, 6) is None
+    assert AlmacenColumnas(tmp_path, 'b' * 64).cargar('x', {'paso': 'p'}, 5) is None
+    assert almacen.calculadas == ['x']
+    assert almacen.leidas == ['x']
+
+
+def test_almacen_registra_columnas_en_la_cache(tmp_path):
+    cache = CacheDatasets(tmp_path)
+    almacen = AlmacenColumnas(tmp_path / 'columnas', 'a' * 64, cache=cache)
+    almacen.guardar('x', {'paso': 'p'}, np.arange(1000, dtype='float64'))
+    ruta = almacen._ruta('x', {'paso': 'p'})
+    assert list(ruta.parent.iterdir()) == [ruta]
+
+    dataset = tmp_path / 'procesado.csv'
+    dataset.write_text('x' * 100)
+    cache.registrar('dataset', dataset, 'a' * 64, {}, 1, 0.1)
+    # La columna cuenta en el tamaño y es la usada hace más tiempo
+    assert cache.desalojar(max_bytes=1000) == [ruta]
+    assert almacen.cargar('x', {'paso': 'p'}, 1000) is None
+
+
+def test_fit_transform_con_almacen_solo_calcula_columnas_nuevas(
+    train_raw: pd.DataFrame, tmp_path
+):
+    base = dict(corregir_alcohol=True, corregir_densidad=True, rbf_diox=False)
+    primero = AlmacenColumnas(tmp_path, 'a' * 64)
+    WineDatasetTransformer(**base).fit_transform(train_raw, almacen=primero)
+    assert primero.leidas == []
+    assert {'alcohol', 'densidad', 'SO2_l / SO2_tot'} <= set(primero.calculadas)
+
+    parametros = dict(base, rbf_diox=True, remove_outliers=True, standardize=True)
+    segundo = AlmacenColumnas(tmp_path, 'a' * 64)
+    df = WineDatasetTransformer(**parametros).fit_transform(train_raw, almacen=segundo)
+    assert set(segundo.calculadas) == {'diox_simil_1', 'diox_simil_2'}
+    assert set(primero.calculadas) == set(segundo.leidas)
+    pd.testing.assert_frame_equal(
+        df, WineDatasetTransformer(**parametros).fit_transform(train_raw)
+    )
+
+
+def test_almacen_recalcula_si_cambian_las_dependencias(
+    train_raw: pd.DataFrame, tmp_path
+):
+    WineDatasetTransformer(corregir_densidad=False).fit(
+        train_raw, almacen=AlmacenColumnas(tmp_path, 'a' * 64)
+    )
+    almacen = AlmacenColumnas(tmp_path, 'a' * 64)
+    WineDatasetTransformer(corregir_densidad=True).fit(train_raw, almacen=almacen)
+    # densidad_alcohol depende de la corrección de densidad
+    assert 'densidad_alcohol' in almacen.calculadas
+    assert 'SO2_l / SO2_tot' in almacen.leidas
+
+
+def test_build_features_lee_columnas_del_almacen(
+    train_raw: pd.DataFrame, tmp_path, monkeypatch, capfd
+):
+    carpeta_raw = tmp_path / 'raw'
+    carpeta_processed = tmp_path / 'processed'
+    carpeta_raw.mkdir()
+    carpeta_processed.mkdir()
+    train_raw.head(500).to_csv(carpeta_raw / 'train.csv')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', carpeta_raw)
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', carpeta_processed)
+    argumentos = ['build_features', '--con', 'train.csv', '--alcohol']
+    monkeypatch.setattr(sys, 'argv', argumentos)
+    main()
+    salida = capfd.readouterr().out
+    assert 'leídas del almacén' not in salida
+    assert (carpeta_processed / settings.FEATURE_STORE_FOLDER).is_dir()
+
+    monkeypatch.setattr(sys, 'argv', argumentos + ['--densidad'])
+    main()
+    salida = capfd.readouterr().out
+    assert 'Columnas leídas del almacén: alcohol' in salida
+    assert 'Columnas calculadas y guardadas: densidad' in salida
+
+    monkeypatch.setattr(sys, 'argv', argumentos + ['--no_cache'])
+    main()
+    assert 'almacén' not in capfd.readouterr().out
+
+
+def test_rbf_igual_que_rbf_kernel(train_raw: pd.DataFrame):
+    from sklearn.metrics.pairwise import rbf_kernel
+
+    df = WineDatasetTransformer(shuffle=False).fit_transform(train_raw)
+    diox = train_raw[['dioxido de azufre total']]
+    for i, (centro, gamma) in enumerate(zip(RBF_CENTROS, RBF_GAMMAS), start=1):
+        esperado = rbf_kernel(diox, [[centro]], gamma=gamma)[:, 0]
+        np.testing.assert_allclose(df[f'diox_simil_{i}'], esperado, rtol=1e-12)
+
+
+def test_rbf_centros_y_gammas_propios(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(
+        rbf_centros=[10, 50, 150], rbf_gammas=0.01, shuffle=False
+    )
+    df = wt.fit_transform(train_raw)
+    assert [c for c in df if c.startswith('diox_simil')] == [
+        'diox_simil_1',
+        'diox_simil_2',
+        'diox_simil_3',
+    ]
+    diox = train_raw['dioxido de azufre total'].to_numpy()
+    np.testing.assert_allclose(df['diox_simil_2'], np.exp(-0.01 * (diox - 50) ** 2))
+
+    # Sin gammas se estiman con la densidad
+    wt = WineDatasetTransformer(rbf_centros=[27, 126]).fit(train_raw)
+    assert wt.rbf_gammas_.shape == (2,)
+    assert (wt.rbf_gammas_ > 0).all()
+
+
+def test_rbf_centros_kde(train_raw: pd.DataFrame, tmp_path):
+    wt = WineDatasetTransformer(rbf_centros='kde').fit(train_raw)
+    # Los modos de la densidad están cerca de los elegidos a mano
+    np.testing.assert_allclose(wt.rbf_centros_, RBF_CENTROS, rtol=0.15)
+    assert (wt.rbf_gammas_ > 0).all()
+
+    ruta = tmp_path / 'train.csv'
+    train_raw.to_csv(ruta)
+    por_chunks = WineDatasetTransformer(rbf_centros='kde', rbf_n_modos=1)
+    transformar_dataset_por_chunks(por_chunks, ruta, tmp_path / 'salida.csv', 2000)
+    assert len(por_chunks.rbf_centros_) == 1
+    assert 'diox_simil_2' not in pd.read_csv(tmp_path / 'salida.csv')
+
+
+@pytest.mark.parametrize(
+    'parametros',
+    [
+        dict(rbf_centros='modas'),
+        dict(rbf_centros=[10, 20], rbf_gammas=[0.1, 0.2, 0.3]),
+        dict(rbf_centros='kde', rbf_n_modos=50),
+    ],
+)
+def test_rbf_parametros_no_validos(train_raw: pd.DataFrame, parametros: dict):
+    with pytest.raises(ValueError):
+        WineDatasetTransformer(**parametros).fit(train_raw)
+
+
+def test_outliers_ajustados_con_muestra_acotada(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(remove_outliers=True, outliers_n_jobs=2)
+    wt.max_muestras_outliers = 1000
+    wt.fit(train_raw)
+    assert wt.isolation_forest.n_jobs == 2
+    assert wt.isolation_forest.max_samples_ == 256
+    assert wt.umbral_outliers_ == wt.isolation_forest.offset_
+
+    # fit_por_chunks toma la misma muestra y ajusta el mismo bosque
+    por_chunks = WineDatasetTransformer(remove_outliers=True)
+    por_chunks.max_muestras_outliers = 1000
+    por_chunks.fit_por_chunks(
+        lambda: (train_raw.iloc[i : i + 700] for i in range(0, len(train_raw), 700))
+    )
+    X_ = wt._crear_features(train_raw)
+    np.testing.assert_array_equal(
+        wt._predecir_outliers(X_), por_chunks._predecir_outliers(X_)
+    )
+
+    wt = WineDatasetTransformer(remove_outliers=True, outliers_max_samples=100)
+    assert wt.fit(train_raw).isolation_forest.max_samples_ == 100
+
+
+def test_outliers_puntuados_por_bloques(train_raw: pd.DataFrame):
+    wt = WineDatasetTransformer(remove_outliers=True, shuffle=False).fit(train_raw)
+    X_ = wt._crear_features(train_raw)
+    esperado = wt.isolation_forest.predict(X_)
+    wt.filas_por_bloque_outliers = 333
+    np.testing.assert_array_equal(wt._predecir_outliers(X_), esperado)
+
+    # Los lotes pequeños toman las mismas decisiones que el dataset completo
+    completo = wt.transform(train_raw)
+    lotes = pd.concat(
+        [wt.transform(train_raw.iloc[i : i + 50]) for i in range(0, 500, 50)],
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(lotes, completo.iloc[: len(lotes)])
@@ -0,0 +1,217 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+from aidtecsolutions import catalogo as catalogo_modulo
+from aidtecsolutions.catalogo import (
+    CatalogoDatasets,
+    abrir_catalogo,
+    registrar_dataset,
+)
+from aidtecsolutions.features.build_features import main
+from aidtecsolutions.utils import is_valid_dataframe, is_valid_dataset
+import settings
+
+
+def escribir(ruta, contenido=b'a,b\n1,2\n'):
+    ruta.write_bytes(contenido)
+    return ruta
+
+
+def modificar(ruta, contenido):
+    # Otro contenido y otra fecha de modificación
+    estado = ruta.stat()
+    ruta.write_bytes(contenido)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10**9))
+
+
+def test_existe_registra_y_borra(tmp_path):
+    escribir(tmp_path / 'train.csv')
+    with CatalogoDatasets(tmp_path) as catalogo:
+        assert catalogo.buscar('train.csv') is None
+        assert catalogo.existe('train.csv')
+        entrada = catalogo.buscar('train.csv')
+        assert entrada.tamano == 8
+        assert entrada.sha256 is None
+
+        assert not catalogo.existe('no_existe.csv')
+        (tmp_path / 'train.csv').unlink()
+        assert not catalogo.existe('train.csv')
+        assert catalogo.buscar('train.csv') is None
+
+
+def test_existe_no_cuenta_carpetas(tmp_path):
+    (tmp_path / 'carpeta.csv').mkdir()
+    with CatalogoDatasets(tmp_path) as catalogo:
+        assert not catalogo.existe('carpeta.csv')
+
+
+def test_registrar_conserva_hash_hasta_que_cambia(tmp_path):
+    ruta = escribir(tmp_path / 'train.csv')
+    with CatalogoDatasets(tmp_path) as catalogo:
+        entrada = catalogo.registrar('train.csv', filas=1, columnas={'a': 'int64'})
+        # El hash solo se calcula cuando se pide
+        assert entrada.sha256 is None
+        assert catalogo.sha256('train.csv') == hashlib.sha256(ruta.read_bytes()).hexdigest()
+        entrada = catalogo.buscar('train.csv')
+        assert entrada.filas == 1
+        assert catalogo.registrar('train.csv') == entrada
+        assert catalogo.obsoletas() == []
+
+        modificar(ruta, b'a,b\n1,2\n3,4\n')
+        assert not catalogo.vigente(catalogo.buscar('train.csv'))
+        assert [e.nombre for e in catalogo.obsoletas()] == ['train.csv']
+
+        # Los datos del archivo anterior no se conservan
+        nueva = catalogo.registrar('train.csv')
+        assert nueva.filas is None
+        assert nueva.sha256 is None
+        assert catalogo.sha256('train.csv') == hashlib.sha256(ruta.read_bytes()).hexdigest()
+        assert catalogo.obsoletas() == []
+
+
+def test_consultar_prefijo_y_flags(tmp_path):
+    nombres = [
+        'train.csv',
+        'train.csv-corregir_alcohol.csv',
+        'train.csv-corregir_alcohol-shuffle.parquet',
+        'train.csv-shuffle.csv',
+        'test.csv-corregir_alcohol.csv',
+    ]
+    with CatalogoDatasets(tmp_path) as catalogo:
+        for nombre in nombres:
+            escribir(tmp_path / nombre)
+            catalogo.existe(nombre)
+
+        def consultar(*args, **kwargs):
+            return [e.nombre for e in catalogo.consultar(*args, **kwargs)]
+
+        assert consultar() == sorted(nombres)
+        assert consultar('train.csv-') == [
+            'train.csv-corregir_alcohol-shuffle.parquet',
+            'train.csv-corregir_alcohol.csv',
+            'train.csv-shuffle.csv',
+        ]
+        assert consultar('train.csv', flags=['corregir_alcohol', 'shuffle']) == [
+            'train.csv-corregir_alcohol-shuffle.parquet'
+        ]
+        assert consultar(flags=['corregir_alcohol']) == [
+            'test.csv-corregir_alcohol.csv',
+            'train.csv-corregir_alcohol-shuffle.parquet',
+            'train.csv-corregir_alcohol.csv',
+        ]
+
+
+def test_sincronizar(tmp_path):
+    escribir(tmp_path / 'borrado.csv')
+    escribir(tmp_path / 'modificado.csv')
+    with CatalogoDatasets(tmp_path) as catalogo:
+        catalogo.registrar('borrado.csv')
+        catalogo.registrar('modificado.csv', filas=1)
+        (tmp_path / 'borrado.csv').unlink()
+        modificar(tmp_path / 'modificado.csv', b'a\n')
+        escribir(tmp_path / 'nuevo.csv')
+        escribir(tmp_path / 'descarga.csv.part')
+        escribir(tmp_path / '.oculto.json')
+
+        assert catalogo.sincronizar() == (['modificado.csv', 'nuevo.csv'], ['borrado.csv'])
+        assert [e.nombre for e in catalogo.consultar()] == ['modificado.csv', 'nuevo.csv']
+        assert catalogo.buscar('modificado.csv').filas is None
+        assert catalogo.sincronizar() == ([], [])
+
+
+def test_is_valid_dataset_no_lista_la_carpeta(tmp_path, monkeypatch):
+    escribir(tmp_path / 'train.csv')
+
+    def iterdir(self):
+        raise AssertionError('No se debe listar la carpeta')
+
+    monkeypatch.setattr(Path, 'iterdir', iterdir)
+    monkeypatch.setattr(os, 'scandir', iterdir)
+    assert is_valid_dataset('train.csv', tmp_path)
+    assert not is_valid_dataset('test.csv', tmp_path)
+    assert not is_valid_dataset('train.csv', tmp_path / 'no_existe')
+
+
+def test_is_valid_dataset_no_crea_el_indice(tmp_path):
+    escribir(tmp_path / 'train.csv')
+    indice = tmp_path / settings.DATASET_CATALOG_INDEX
+
+    assert is_valid_dataset('train.csv', tmp_path)
+    assert not is_valid_dataset('test.csv', tmp_path)
+    assert not indice.exists()
+    registrar_dataset(tmp_path / 'train.csv')
+    assert is_valid_dataset('train.csv', tmp_path)
+    assert indice.exists()
+
+
+def test_is_valid_dataframe_registra_filas_y_columnas(tmp_path):
+    pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']}).to_csv(tmp_path / 'train.csv')
+    df = is_valid_dataframe(tmp_path, 'train.csv')
+    with CatalogoDatasets(tmp_path) as catalogo:
+        entrada = catalogo.buscar('train.csv')
+    assert entrada.filas == len(df) == 3
+    assert entrada.columnas == {'a': 'int64', 'b': 'object'}
+
+
+def test_carga_no_calcula_hash_y_reutiliza_conexion(tmp_path, mocker):
+    pd.DataFrame({'a': [1, 2, 3]}).to_csv(tmp_path / 'train.csv')
+    hash_archivo = mocker.spy(catalogo_modulo, 'hash_archivo')
+    conectar = mocker.spy(catalogo_modulo.sqlite3, 'connect')
+
+    for _ in range(3):
+        assert is_valid_dataset('train.csv', tmp_path)
+        is_valid_dataframe(tmp_path, 'train.csv')
+    hash_archivo.assert_not_called()
+    assert conectar.call_count == 1
+    assert abrir_catalogo(tmp_path) is abrir_catalogo(tmp_path)
+
+
+def test_registrar_dataset(tmp_path):
+    ruta = escribir(tmp_path / 'train.csv')
+    entrada = registrar_dataset(ruta, filas=1)
+    assert entrada.filas == 1
+    assert (tmp_path / settings.DATASET_CATALOG_INDEX).exists()
+
+
+def test_build_features_registra_en_catalogo(
+    train_raw: pd.DataFrame, tmp_path, monkeypatch
+):
+    carpeta_raw = tmp_path / 'raw'
+    carpeta_processed = tmp_path / 'processed'
+    carpeta_raw.mkdir()
+    carpeta_processed.mkdir()
+    train_raw.head(500).to_csv(carpeta_raw / 'train.csv')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', carpeta_raw)
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', carpeta_processed)
+    monkeypatch.setattr(
+        sys, 'argv', ['build_features', '--con', 'train.csv', '--alcohol', '--save']
+    )
+    main()
+
+    nombre = 'train.csv-corregir_alcohol.csv'
+    with CatalogoDatasets(carpeta_processed) as catalogo:
+        entrada = catalogo.buscar(nombre)
+        assert [e.nombre for e in catalogo.consultar('train.csv', ['corregir_alcohol'])] == [
+            nombre
+        ]
+    assert entrada.sha256 is None
+    assert entrada.filas == 500
+    assert entrada.columnas['alcohol'] == 'float64'
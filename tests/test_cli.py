@@ -0,0 +1,133 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import pytest
+
+from aidtecsolutions.cli import COMANDOS, main
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# Módulos que ningún comando debe importar para --help ni para
+# rechazar unos argumentos erróneos
+MODULOS_PESADOS = ('pandas', 'numpy', 'scipy', 'sklearn', 'xgboost', 'requests')
+
+# --help puede tardar como mucho este múltiplo de arrancar python sin
+# nada. Hoy tarda unas dos veces; importar pandas ya son más de diez
+MULTIPLO_ARRANQUE = 5
+
+# Ejecuta aidtec con los argumentos y escribe en stderr, en la última
+# línea, los módulos pesados que quedan en sys.modules
+SCRIPT = """
+import json, sys
+from aidtecsolutions.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+pesados = sorted(
+    m for m in sys.modules if m.split('.')[0] in {pesados!r}
+)
+print(json.dumps(pesados), file=sys.stderr)
+""".format(pesados=MODULOS_PESADOS)
+
+
+def ejecutar(*argumentos, cwd=RAIZ):
+    """Lanza aidtec en otro proceso y devuelve el resultado y
+    los módulos pesados importados"""
+    entorno = dict(os.environ)
+    entorno['PYTHONPATH'] = os.pathsep.join([str(RAIZ), str(RAIZ / 'src')])
+    resultado = subprocess.run(
+        [sys.executable, '-c', SCRIPT, *argumentos],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=entorno,
+    )
+    return resultado, json.loads(resultado.stderr.splitlines()[-1])
+
+
+def mejor_tiempo(funcion, repeticiones=3):
+    """Menor tiempo de reloj de varias ejecuciones, el menos
+    afectado por la carga de la máquina"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def test_help_sin_importar_pesados():
+    resultado, pesados = ejecutar('--help')
+    assert 'usage: aidtec' in resultado.stdout
+    assert pesados == []
+
+
+@pytest.mark.parametrize('comando', list(COMANDOS))
+def test_help_comando_sin_importar_pesados(comando):
+    resultado, pesados = ejecutar(comando, '--help')
+    assert f'usage: aidtec {comando}' in resultado.stdout
+    assert pesados == []
+
+
+@pytest.mark.parametrize('comando', list(COMANDOS))
+def test_help_comando_arranca_rapido(comando):
+    base = mejor_tiempo(
+        lambda: subprocess.run([sys.executable, '-c', 'pass'], capture_output=True)
+    )
+    tiempo = mejor_tiempo(lambda: ejecutar(comando, '--help'))
+    assert tiempo < MULTIPLO_ARRANQUE * base, (
+        f'aidtec {comando} --help tarda {tiempo:.3f} s '
+        f'y python sin nada {base:.3f} s'
+    )
+
+
+@pytest.mark.parametrize(
+    'argumentos, mensaje',
+    [
+        (['features', '--con', 'no_existe.csv'], 'no se encuentra'),
+        (['train', '--data', 'no_existe.csv', 'xgb'], 'No se encuentra'),
+        (['predict', '--data', 'no_existe.csv', '--model', 'm'], 'No se encuentra'),
+        (['serve', '--model', 'no_existe.joblib'], 'No se encuentra'),
+    ],
+)
+def test_validacion_sin_importar_pesados(tmp_path, argumentos, mensaje):
+    for carpeta in ('data/raw', 'data/processed', 'models'):
+        (tmp_path / carpeta).mkdir(parents=True)
+    resultado, pesados = ejecutar(*argumentos, cwd=tmp_path)
+    assert resultado.returncode == 0
+    assert mensaje in resultado.stdout
+    assert pesados == []
+
+
+def test_main_comando_invalido(capsys):
+    with pytest.raises(SystemExit):
+        main(['no_existe'])
+    assert 'invalid choice' in capsys.readouterr().err
+
+
+def test_main_pasa_argumentos(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['aidtec'])
+    with pytest.raises(SystemExit):
+        main(['convert', '--help'])
+    salida = capsys.readouterr().out
+    assert salida.startswith('usage: aidtec convert')
+    assert '--origen' in salida
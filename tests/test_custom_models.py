@@ -0,0 +1,147 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.exceptions import NotFittedError
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+from aidtecsolutions.models.custom_models import MultiStageClassifier
+
+
+@pytest.fixture(scope="module")
+def datos():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 5))
+    # Calidades de 3 a 9 que dependen de las dos primeras columnas
+    y = np.clip(np.round(6 + 1.5 * X[:, 0] + X[:, 1]), 3, 9).astype(int)
+    return X, y
+
+
+def multistage(n_jobs=None) -> MultiStageClassifier:
+    return MultiStageClassifier(
+        model_stage1=DecisionTreeClassifier(max_depth=6, random_state=0),
+        model_extreme=DecisionTreeClassifier(max_depth=6, random_state=0),
+        model_middle=DecisionTreeClassifier(max_depth=6, random_state=0),
+        n_jobs=n_jobs,
+    )
+
+
+def test_predict_igual_que_predecir_todas_las_filas(datos):
+    X, y = datos
+    modelo = multistage().fit(X, y)
+    esperado = np.where(
+        modelo.model_stage1_.predict(X),
+        modelo.clases_extreme_[modelo.model_extreme_.predict(X)],
+        modelo.clases_middle_[modelo.model_middle_.predict(X)],
+    )
+    assert np.array_equal(modelo.predict(X), esperado)
+
+
+def test_predict_solo_envia_filas_enrutadas(datos, mocker):
+    X, y = datos
+    modelo = multistage().fit(X, y)
+    n_extremos = modelo.model_stage1_.predict(X).sum()
+    spy_extreme = mocker.spy(modelo.model_extreme_, 'predict')
+    spy_middle = mocker.spy(modelo.model_middle_, 'predict')
+    modelo.predict(X)
+    assert len(spy_extreme.call_args.args[0]) == n_extremos
+    assert len(spy_middle.call_args.args[0]) == len(X) - n_extremos
+
+
+def test_predict_sin_filas_en_una_etapa(datos):
+    X, y = datos
+    modelo = multistage().fit(X, y)
+    medios = X[~modelo.model_stage1_.predict(X).astype(bool)]
+    assert set(modelo.predict(medios)) <= {5, 6, 7}
+
+
+def test_predict_hilos_y_dataframe(datos):
+    X, y = datos
+    modelo = multistage().fit(X, y)
+    modelo_hilos = multistage(n_jobs=2).fit(X, y)
+    df = pd.DataFrame(X, columns=[f'x{i}' for i in range(5)])
+    assert np.array_equal(modelo_hilos.predict(X), modelo.predict(X))
+    modelo_df = multistage().fit(df, y)
+    assert np.array_equal(modelo_df.predict(df), modelo.predict(X))
+
+
+def test_predict_proba_combina_etapas(datos):
+    X, y = datos
+    modelo = multistage(n_jobs=2).fit(X, y)
+    proba = modelo.predict_proba(X)
+    assert list(modelo.classes_) == sorted(set(y))
+    assert proba.shape == (len(X), len(modelo.classes_))
+    assert np.allclose(proba.sum(axis=1), 1)
+
+    p_extremo = modelo.model_stage1_.predict_proba(X)[:, 1]
+    columnas_extremas = np.isin(modelo.classes_, modelo.clases_extreme_)
+    assert np.allclose(proba[:, columnas_extremas].sum(axis=1), p_extremo)
+
+
+def test_predict_proba_con_xgboost(datos):
+    X, y = datos
+    modelo = MultiStageClassifier(
+        model_stage1=XGBClassifier(n_estimators=10),
+        model_extreme=DecisionTreeClassifier(random_state=0),
+        model_middle=DecisionTreeClassifier(random_state=0),
+    ).fit(X, y)
+    assert np.allclose(modelo.predict_proba(X).sum(axis=1), 1)
+
+
+def test_predict_sin_fit(datos):
+    X, _ = datos
+    with pytest.raises(NotFittedError):
+        multistage().predict(X)
+
+
+def test_fit_hilos_igual_que_secuencial(datos):
+    X, y = datos
+    modelo = multistage().fit(X, y)
+    modelo_hilos = multistage(n_jobs=3).fit(pd.DataFrame(X), pd.Series(y))
+    assert np.array_equal(
+        modelo_hilos.predict_proba(X), modelo.predict_proba(X)
+    )
+
+
+def test_fit_no_modifica_los_modelos_pasados(datos):
+    X, y = datos
+    arbol = DecisionTreeClassifier(max_depth=3, random_state=0)
+    # El mismo modelo en las tres etapas no se pisa entre hilos
+    modelo = MultiStageClassifier(arbol, arbol, arbol, n_jobs=3).fit(X, y)
+    assert not hasattr(arbol, 'classes_')
+    assert list(modelo.clases_extreme_) == [3, 4, 8, 9]
+    assert list(modelo.clases_middle_) == [5, 6, 7]
+
+
+def test_fit_con_xgboost_en_todas_las_etapas(datos):
+    X, y = datos
+    modelo = MultiStageClassifier(
+        model_stage1=XGBClassifier(n_estimators=10),
+        model_extreme=XGBClassifier(n_estimators=10),
+        model_middle=XGBClassifier(n_estimators=10),
+        n_jobs=3,
+    ).fit(X, y)
+    assert set(modelo.predict(X)) <= set(y)
+
+
+def test_limites_configurables(datos):
+    X, y = datos
+    # Con las etiquetas codificadas de 0 a 6 como en train_model
+    modelo = multistage().set_params(limite_inferior=2, limite_superior=4)
+    modelo.fit(X, y - 3)
+    assert list(modelo.clases_middle_) == [2, 3, 4]
+    assert np.array_equal(modelo.predict(X), multistage().fit(X, y).predict(X) - 3)
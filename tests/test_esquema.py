@@ -0,0 +1,117 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pandas as pd
+import pytest
+
+from aidtecsolutions import esquema
+from aidtecsolutions.custom_exceptions import NonValidDataset, NonValidSchema
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from aidtecsolutions.models.train_model import setup_parser
+from aidtecsolutions.utils import (
+    columnas_dataset,
+    guardar_dataset,
+    is_valid_dataframe,
+    leer_dataset,
+)
+import settings
+
+
+def test_leer_raw_con_esquema(train_raw: pd.DataFrame):
+    df = leer_dataset(settings.FOLDER_DATA_RAW / 'train.csv', esquema=esquema.RAW)
+
+    assert df['color'].dtype == 'category'
+    assert df['alcohol'].dtype == 'object'
+    assert df['year'].dtype == 'int64'
+    assert df.index.name == esquema.INDICE
+    pd.testing.assert_frame_equal(df.astype({'color': 'object'}), train_raw)
+
+
+def test_transform_igual_con_color_category(train_raw: pd.DataFrame):
+    df = leer_dataset(settings.FOLDER_DATA_RAW / 'train.csv', esquema=esquema.RAW)
+    parametros = dict(corregir_alcohol=True, standardize=True)
+
+    pd.testing.assert_frame_equal(
+        WineDatasetTransformer(**parametros).fit_transform(df),
+        WineDatasetTransformer(**parametros).fit_transform(train_raw),
+        check_exact=True,
+    )
+
+
+@pytest.mark.parametrize('formato', ['.csv', '.parquet', '.feather'])
+def test_leer_columnas_y_float32(train_raw: pd.DataFrame, tmp_path, formato):
+    if formato != '.csv':
+        pytest.importorskip('pyarrow')
+    ruta = tmp_path / f'train{formato}'
+    guardar_dataset(train_raw, ruta)
+
+    assert columnas_dataset(ruta) == ([esquema.INDICE], list(train_raw.columns))
+    df = leer_dataset(
+        ruta, esquema=esquema.RAW, columnas=['pH', 'alcohol'], float32=True
+    )
+    assert list(df.columns) == ['pH', 'alcohol']
+    assert df['pH'].dtype == 'float32'
+    assert df['alcohol'].dtype == 'object'
+    assert (df.index == train_raw.index).all()
+
+
+def test_falta_columna_obligatoria(train_raw: pd.DataFrame, tmp_path, mocker):
+    guardar_dataset(train_raw.drop(columns=['color', 'pH']), tmp_path / 'train.csv')
+    read_csv = mocker.spy(pd, 'read_csv')
+
+    with pytest.raises(NonValidSchema, match='pH, color'):
+        leer_dataset(tmp_path / 'train.csv', esquema=esquema.RAW)
+    with pytest.raises(NonValidDataset, match='pH, color'):
+        is_valid_dataframe(tmp_path, 'train.csv', esquema.RAW)
+    # Falla con la cabecera, sin leer el archivo entero
+    read_csv.assert_not_called()
+
+
+def test_falta_columna_seleccionada(train_raw: pd.DataFrame, tmp_path):
+    guardar_dataset(train_raw, tmp_path / 'train.csv')
+    with pytest.raises(NonValidSchema, match='no_existe'):
+        leer_dataset(tmp_path / 'train.csv', columnas=['pH', 'no_existe'])
+
+
+def test_processed_train_exige_target(tmp_path):
+    df = pd.DataFrame(
+        {'densidad_alcohol': [1.5, 2.5], 'diox_simil_1': [0.1, 0.2], 'pH': [3.0, 3.1]},
+        index=pd.Index([1, 2], name=esquema.INDICE),
+    )
+    guardar_dataset(df, tmp_path / 'procesado.csv')
+
+    with pytest.raises(NonValidSchema, match=settings.TARGET_FEATURE):
+        leer_dataset(tmp_path / 'procesado.csv', esquema=esquema.PROCESSED_TRAIN)
+    leido = leer_dataset(
+        tmp_path / 'procesado.csv', esquema=esquema.PROCESSED, float32=True
+    )
+    assert (leido.dtypes == 'float32').all()
+
+
+def test_tipo_columna_mal_formada(tmp_path):
+    (tmp_path / 'procesado.csv').write_text('muestra_id,pH\n1,3.0\n2,abc\n')
+    with pytest.raises(NonValidDataset):
+        is_valid_dataframe(tmp_path, 'procesado.csv', esquema.PROCESSED)
+
+
+def test_tipos_columnas():
+    tipos = esquema.PROCESSED.tipos_columnas(
+        ['pH', 'diox_simil_3', 'alcohol', settings.TARGET_FEATURE], float32=True
+    )
+    assert tipos == {'pH': 'float32', 'diox_simil_3': 'float32'}
+
+
+def test_parser_float32() -> None:
+    args = setup_parser().parse_args(['--data', 'train.csv', '--float32', 'xgb'])
+    assert args.float32
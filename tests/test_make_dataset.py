@@ -12,15 +12,112 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sys
+import threading
 
 import pytest
+import requests
 import requests_mock
 
 from aidtecsolutions.custom_exceptions import DatasetDownloadError
-from aidtecsolutions.data.utils import download_dataset
+from aidtecsolutions.data.make_dataset import main
+from aidtecsolutions.data.utils import (
+    Descarga,
+    descargar_archivo,
+    descargar_datasets,
+    download_dataset,
+)
 import settings
 
 
+class ServidorArchivos(ThreadingHTTPServer):
+    """Servidor local que sirve archivos en memoria con soporte de
+    Range. ``cortes`` indica cuántos bytes se mandan de cada archivo
+    antes de cerrar la conexión en la siguiente petición"""
+
+    daemon_threads = True
+
+    def __init__(self, archivos):
+        super().__init__(('127.0.0.1', 0), ManejadorArchivos)
+        self.archivos = archivos
+        self.cortes = {}
+        self.ignorar_range = False
+        self.peticiones = []
+
+    def url(self, nombre):
+        return f'http://127.0.0.1:{self.server_port}/{nombre}'
+
+
+class ManejadorArchivos(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        nombre = self.path.lstrip('/')
+        rango = self.headers.get('Range')
+        self.server.peticiones.append((nombre, rango))
+        if nombre not in self.server.archivos:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        contenido = self.server.archivos[nombre]
+        inicio = 0
+        if rango and not self.server.ignorar_range:
+            inicio = int(rango.removeprefix('bytes=').rstrip('-'))
+            if inicio >= len(contenido):
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                'Content-Range', f'bytes {inicio}-{len(contenido) - 1}/{len(contenido)}'
+            )
+        else:
+            self.send_response(200)
+        cuerpo = contenido[inicio:]
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        corte = self.server.cortes.pop(nombre, None)
+        if corte is not None:
+            # Cortamos la conexión a mitad del cuerpo
+            self.wfile.write(cuerpo[:corte])
+            self.close_connection = True
+            return
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sha256(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(settings, 'DOWNLOAD_BACKOFF_SECONDS', 0)
+    archivos = {
+        'train.csv': bytes(range(256)) * 4000,
+        'test.csv': b'muestra_id,calidad\n' * 5000,
+    }
+    servidor = ServidorArchivos(archivos)
+    hilo = threading.Thread(
+        target=servidor.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True
+    )
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def descarga(servidor, nombre, **kwargs):
+    kwargs.setdefault('sha256', sha256(servidor.archivos[nombre]))
+    return Descarga(servidor.url(nombre), nombre, **kwargs)
+
+
 def test_download_dataset_success(tmp_path, train_url, monkeypatch):
     # Configura una URL de prueba y el nombre del archivo
     file_name = "train.csv"
@@ -59,3 +156,123 @@ def test_download_dataset_failure(train_url):
         with pytest.raises(DatasetDownloadError) as excinfo:
             download_dataset(train_url, file_name)
         assert "Error al descargar el archivo. Estado: 404" in str(excinfo.value)
+
+
+def test_descargar_datasets_en_paralelo(servidor, tmp_path):
+    resultados = descargar_datasets(
+        [descarga(servidor, 'train.csv'), descarga(servidor, 'test.csv')],
+        carpeta=tmp_path,
+        workers=2,
+    )
+    assert resultados == {'train.csv': True, 'test.csv': True}
+    for nombre, contenido in servidor.archivos.items():
+        assert (tmp_path / nombre).read_bytes() == contenido
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_descargar_archivo_reanuda_parcial(servidor, tmp_path):
+    contenido = servidor.archivos['train.csv']
+    (tmp_path / 'train.csv.part').write_bytes(contenido[:1000])
+    with requests.Session() as sesion:
+        descargar_archivo(sesion, descarga(servidor, 'train.csv'), tmp_path)
+    assert servidor.peticiones == [('train.csv', 'bytes=1000-')]
+    assert (tmp_path / 'train.csv').read_bytes() == contenido
+
+
+def test_descargar_archivo_reintenta_tras_corte(servidor, tmp_path):
+    servidor.cortes['train.csv'] = 5000
+    with requests.Session() as sesion:
+        descargar_archivo(
+            sesion, descarga(servidor, 'train.csv'), tmp_path, tamano_bloque=1024
+        )
+    # Se reanuda desde el último bloque completo que llegó antes del corte
+    (_, primero), (_, segundo) = servidor.peticiones
+    assert primero is None
+    assert 0 < int(segundo.removeprefix('bytes=').rstrip('-')) <= 5000
+    assert (tmp_path / 'train.csv').read_bytes() == servidor.archivos['train.csv']
+
+
+def test_descargar_archivo_servidor_sin_range(servidor, tmp_path):
+    servidor.ignorar_range = True
+    (tmp_path / 'train.csv.part').write_bytes(b'basura')
+    with requests.Session() as sesion:
+        descargar_archivo(sesion, descarga(servidor, 'train.csv'), tmp_path)
+    assert (tmp_path / 'train.csv').read_bytes() == servidor.archivos['train.csv']
+
+
+def test_descargar_archivo_parcial_completo(servidor, tmp_path):
+    # Si el corte llegó tras el último byte el servidor responde 416
+    contenido = servidor.archivos['test.csv']
+    (tmp_path / 'test.csv.part').write_bytes(contenido)
+    with requests.Session() as sesion:
+        descargar_archivo(sesion, descarga(servidor, 'test.csv'), tmp_path)
+    assert (tmp_path / 'test.csv').read_bytes() == contenido
+
+
+def test_descargar_archivo_ya_verificado(servidor, tmp_path):
+    (tmp_path / 'test.csv').write_bytes(servidor.archivos['test.csv'])
+    with requests.Session() as sesion:
+        descargado = descargar_archivo(
+            sesion, descarga(servidor, 'test.csv'), tmp_path
+        )
+    assert not descargado
+    assert servidor.peticiones == []
+
+
+def test_descargar_archivo_sha256_erroneo(servidor, tmp_path):
+    # Un archivo con otro contenido se vuelve a descargar y se verifica
+    (tmp_path / 'test.csv').write_bytes(b'otro contenido')
+    with requests.Session() as sesion:
+        with pytest.raises(DatasetDownloadError, match='sha256'):
+            descargar_archivo(
+                sesion,
+                descarga(servidor, 'test.csv', sha256='0' * 64),
+                tmp_path,
+                reintentos=1,
+            )
+    assert len(servidor.peticiones) == 2
+    assert (tmp_path / 'test.csv').read_bytes() == b'otro contenido'
+    assert not (tmp_path / 'test.csv.part').exists()
+
+
+def test_descargar_datasets_errores_tras_terminar(servidor, tmp_path):
+    with pytest.raises(DatasetDownloadError) as excinfo:
+        descargar_datasets(
+            [Descarga(servidor.url('no_existe.csv'), 'no_existe.csv'),
+             descarga(servidor, 'test.csv')],
+            carpeta=tmp_path,
+        )
+    assert 'no_existe.csv: Error al descargar el archivo. Estado: 404' in str(
+        excinfo.value
+    )
+    # La descarga que no falla termina igualmente
+    assert (tmp_path / 'test.csv').read_bytes() == servidor.archivos['test.csv']
+    assert servidor.peticiones.count(('no_existe.csv', None)) == 1
+
+
+def test_main_train_y_test(servidor, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', tmp_path)
+    monkeypatch.setattr(
+        settings,
+        'DATASET_MANIFEST',
+        {
+            nombre: {'url': servidor.url(nombre), 'sha256': sha256(contenido)}
+            for nombre, contenido in servidor.archivos.items()
+        },
+    )
+    monkeypatch.setattr(sys, 'argv', ['make_dataset', '--train', '--test'])
+    main()
+    for nombre, contenido in servidor.archivos.items():
+        assert (tmp_path / nombre).read_bytes() == contenido
+
+    # Una segunda ejecución no descarga nada
+    servidor.peticiones.clear()
+    main()
+    assert servidor.peticiones == []
+    assert 'ya está descargado y verificado' in capsys.readouterr().out
+
+
+def test_manifiesto_coincide_con_data_raw():
+    for nombre, entrada in settings.DATASET_MANIFEST.items():
+        contenido = (settings.FOLDER_DATA_RAW / nombre).read_bytes()
+        assert sha256(contenido) == entrada['sha256']
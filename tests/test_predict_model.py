@@ -40,9 +40,14 @@ def test_parser_with_all_args():
     assert args.data == 'data.csv'
     assert args.model == 'model.joblib'
 
-def test_file_check_and_predictions(predict_model, mocker):
+def test_file_check_and_predictions(predict_model, mocker, tmp_path, monkeypatch):
+    # Carpetas temporales para no escribir en data/
+    monkeypatch.setattr(settings, 'FOLDER_DATA_PROCESSED', tmp_path / 'processed')
+    monkeypatch.setattr(settings, 'FOLDER_DATA_RAW', tmp_path / 'raw')
     # Mocks para los checks de archivos y para cargar datos/modelos
-    mocker.patch('aidtecsolutions.utils.is_valid_dataset', return_value=True)
+    mocker.patch(
+        'aidtecsolutions.models.predict_model.is_valid_dataset', return_value=True
+    )
     mocker.patch('aidtecsolutions.utils.is_valid_dataframe', return_value=pd.DataFrame())
     mocker.patch('pathlib.Path.exists', return_value=True)
     mocker.patch('builtins.print')  # suprimir la salida de print
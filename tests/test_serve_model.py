@@ -0,0 +1,149 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from aidtecsolutions.features.custom_transformers import WineDatasetTransformer
+from aidtecsolutions.models.serve_model import (
+    MicroBatcher,
+    ServicioPrediccion,
+    ServidorPrediccion,
+    setup_parser,
+)
+from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+import settings
+
+
+@pytest.fixture(scope="module")
+def servicio(train_raw: pd.DataFrame) -> ServicioPrediccion:
+    df = train_raw.head(2000)
+    wt = WineDatasetTransformer(
+        remove_outliers=True, standardize=True, shuffle=True
+    )
+    df_transformed = wt.fit_transform(df)
+    X = df_transformed.drop(columns=[settings.TARGET_FEATURE])
+    label_encoder = SerializableTransformer(LabelEncoder())
+    y = label_encoder.fit_transform(df_transformed[settings.TARGET_FEATURE])
+    model = SerializableClassifier(
+        RandomForestClassifier(n_estimators=10, random_state=0)
+    ).fit(X, y)
+    return ServicioPrediccion(model, label_encoder, SerializableTransformer(wt))
+
+
+def test_parser_serve_model():
+    parser = setup_parser()
+    args = parser.parse_args(['--model', 'model.joblib', '--max_lote', '64'])
+    assert args.model == 'model.joblib'
+    assert args.transformer is None
+    assert args.max_lote == 64
+    assert args.espera_ms == settings.SERVE_MAX_WAIT_MS
+
+
+def test_micro_batcher_agrupa_peticiones():
+    lotes = []
+
+    def predecir(X: pd.DataFrame) -> np.ndarray:
+        lotes.append(len(X))
+        return X['x'].to_numpy() * 2
+
+    batcher = MicroBatcher(predecir, max_filas=1000, espera_ms=50)
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        resultados = list(pool.map(
+            lambda i: batcher.predecir(pd.DataFrame({'x': [i, i + 1]})), range(20)
+        ))
+    batcher.cerrar()
+
+    for i, resultado in enumerate(resultados):
+        assert resultado.tolist() == [2 * i, 2 * (i + 1)]
+    assert sum(lotes) == 40
+    assert len(lotes) < 20
+    metricas = batcher.metricas()
+    assert metricas['peticiones'] == 20
+    assert metricas['filas'] == 40
+    assert metricas['p99_ms'] >= metricas['p50_ms'] > 0
+
+
+def test_micro_batcher_error_solo_en_peticion_erronea():
+    def predecir(X: pd.DataFrame) -> np.ndarray:
+        if (X['x'] < 0).any():
+            raise ValueError('Valor negativo')
+        return X['x'].to_numpy()
+
+    batcher = MicroBatcher(predecir, max_filas=1000, espera_ms=50)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futuros = [
+            pool.submit(batcher.predecir, pd.DataFrame({'x': [valor]}))
+            for valor in [1, -1, 2]
+        ]
+    batcher.cerrar()
+    assert futuros[0].result().tolist() == [1]
+    assert futuros[2].result().tolist() == [2]
+    with pytest.raises(ValueError):
+        futuros[1].result()
+
+
+def test_servicio_una_prediccion_por_fila(servicio, test_raw: pd.DataFrame):
+    # El servicio no baraja ni elimina outliers aunque el transformer sí lo hiciera
+    filas = test_raw.head(50)
+    preds = servicio.predecir(filas)
+    assert len(preds) == 50
+    assert set(preds) <= set(range(3, 10))
+    # Las columnas pueden llegar en cualquier orden y sin la calidad
+    desordenadas = filas.drop(columns=[settings.TARGET_FEATURE]).iloc[:, ::-1]
+    assert np.array_equal(servicio.predecir(desordenadas), preds)
+
+
+def test_servidor_http_json_y_csv(servicio, test_raw: pd.DataFrame):
+    batcher = MicroBatcher(servicio.predecir)
+    servidor = ServidorPrediccion(('127.0.0.1', 0), batcher)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    url = f'http://127.0.0.1:{servidor.server_address[1]}'
+    filas = test_raw.head(5)
+    try:
+        respuesta_json = requests.post(
+            f'{url}/predict',
+            data=filas.to_json(orient='records'),
+            headers={'Content-Type': 'application/json'},
+        )
+        respuesta_csv = requests.post(
+            f'{url}/predict',
+            data=filas.to_csv(index=False),
+            headers={'Content-Type': 'text/csv'},
+        )
+        respuesta_mala = requests.post(
+            f'{url}/predict',
+            data='{"filas": [{"color": "rojo"}]}',
+            headers={'Content-Type': 'application/json'},
+        )
+        metricas = requests.get(f'{url}/metricas').json()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        batcher.cerrar()
+
+    assert respuesta_json.status_code == 200
+    preds = respuesta_json.json()['predicciones']
+    assert preds == servicio.predecir(filas).tolist()
+    assert respuesta_csv.json()['predicciones'] == preds
+    assert respuesta_mala.status_code == 422
+    assert metricas['peticiones'] == 2
@@ -12,18 +12,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import json
+
 import pytest
 
 import numpy as np
+import pandas as pd
 from sklearn.datasets import load_iris
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.exceptions import NotFittedError
-from sklearn.model_selection import cross_val_score, cross_val_predict
+from sklearn.model_selection import (
+    StratifiedKFold,
+    cross_val_predict,
+    cross_val_score,
+)
 from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
 
-from aidtecsolutions.models.train_model import setup_parser
-from aidtecsolutions.models.utils import generate_model_name
-from aidtecsolutions.wrappers import SerializableClassifier
+from aidtecsolutions.custom_exceptions import NonValidModel, NonValidSpec
+from aidtecsolutions.models.sweep import (
+    MODELOS,
+    cargar_spec,
+    ejecutar_sweep,
+    generar_configuraciones,
+    repartir_cpus,
+)
+from aidtecsolutions.models.custom_models import MultiStageClassifier
+from aidtecsolutions.models.train_model import (
+    crear_multistage,
+    parsear_parametros,
+    setup_parser,
+)
+from aidtecsolutions.models.validacion import validar_cv
+from aidtecsolutions.models.utils import (
+    MAX_LONGITUD_NOMBRE,
+    NOMBRES_MODELOS,
+    generate_model_name,
+)
+from aidtecsolutions.wrappers import SerializableClassifier, SerializableTransformer
+import settings
 
 def test_model_parser_with_valid_args() -> None:
     parser = setup_parser()
@@ -159,4 +187,422 @@ def test_cross_val_predict_integration():
 
     # Probar que no hay errores al usar cross_val_predict
     predictions = cross_val_predict(wrapper, X, y, cv=3)
-    assert len(predictions) == len(y)
\ No newline at end of file
+    assert len(predictions) == len(y)
+
+def test_parser_multistage() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv',
+        'multistage',
+        '--extreme', 'randomforest',
+        '--stage1_params', 'max_depth=4', 'n_jobs=2',
+        '--n_jobs', '3',
+    ])
+    assert args.model == 'multistage'
+    assert (args.stage1, args.extreme, args.middle) == ('xgb', 'randomforest', 'xgb')
+    assert args.stage1_params == ['max_depth=4', 'n_jobs=2']
+    assert args.extreme_params is None
+    assert args.n_jobs == 3
+
+def test_parser_multistage_parametro_no_valido() -> None:
+    parser = setup_parser()
+    with pytest.raises(SystemExit):
+        parser.parse_args([
+            '--data', 'data.csv', 'multistage', '--middle_params', 'max_depth'
+        ])
+
+def test_parsear_parametros() -> None:
+    assert parsear_parametros(None) == {}
+    assert parsear_parametros(
+        ['max_depth=4', 'learning_rate=0.05', 'class_weight=balanced', 'x=null']
+    ) == {
+        'max_depth': 4, 'learning_rate': 0.05, 'class_weight': 'balanced', 'x': None
+    }
+
+def test_crear_multistage_limites_codificados() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv',
+        'multistage',
+        '--middle', 'randomforest',
+        '--middle_params', 'n_estimators=7',
+    ])
+    modelo = crear_multistage(args, np.arange(3, 10))
+    assert isinstance(modelo, MultiStageClassifier)
+    assert isinstance(modelo.model_middle, RandomForestClassifier)
+    assert modelo.model_middle.n_estimators == 7
+    assert (modelo.limite_inferior, modelo.limite_superior) == (2, 4)
+
+def test_crear_multistage_limite_no_es_clase() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv', 'multistage', '--limite_superior', '7',
+    ])
+    # Sin clase 7 searchsorted caería en la 8
+    with pytest.raises(ValueError, match='limite_superior 7'):
+        crear_multistage(args, np.array([3, 4, 5, 6, 8, 9]))
+    args = parser.parse_args([
+        '--data', 'data.csv', 'multistage', '--limite_superior', '10',
+    ])
+    with pytest.raises(ValueError, match='limite_superior 10'):
+        crear_multistage(args, np.arange(3, 10))
+
+def test_crear_multistage_limite_igual_a_ultima_clase() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv', 'multistage',
+        '--limite_inferior', '3', '--limite_superior', '9',
+    ])
+    modelo = crear_multistage(args, np.arange(3, 10))
+    assert (modelo.limite_inferior, modelo.limite_superior) == (0, 6)
+
+def test_multistage_en_validar_cv() -> None:
+    X, y = load_iris(return_X_y=True)
+    modelo = SerializableClassifier(MultiStageClassifier(
+        DecisionTreeClassifier(random_state=0),
+        DecisionTreeClassifier(random_state=0),
+        DecisionTreeClassifier(random_state=0),
+        n_jobs=3,
+        limite_inferior=1,
+        limite_superior=1,
+    ))
+    resultado = validar_cv(modelo, X, y, n_splits=3, n_jobs=1)
+    assert len(resultado.y_pred) == len(y)
+    assert resultado.scores.mean() > 0.8
+
+def test_multistage_model_name() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'train.csv',
+        'multistage',
+        '--stage1_params', 'max_depth=4', 'n_jobs=2',
+    ])
+    name = generate_model_name(args)
+    assert name == (
+        'model_data=train.csv_model=multistage_stage1=xgb_'
+        'stage1_params=max_depth=4-n_jobs=2_extreme=xgb_middle=xgb_'
+        'limite_inferior=5_limite_superior=7.joblib'
+    )
+
+def test_parser_sweep() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv',
+        'sweep',
+        '--spec', 'spec.yaml',
+        '--workers', '2',
+    ])
+    assert args.model == 'sweep'
+    assert str(args.spec) == 'spec.yaml'
+    assert args.workers == 2
+
+def test_cargar_spec_yaml_y_json(tmp_path) -> None:
+    ruta_yaml = tmp_path / 'spec.yaml'
+    ruta_yaml.write_text(
+        'modelo: randomforest\nparametros:\n  n_estimators: [10, 20]\n'
+    )
+    ruta_json = tmp_path / 'spec.json'
+    ruta_json.write_text(json.dumps([{
+        'modelo': 'xgb', 'parametros': {'max_depth': [3, 6]}
+    }]))
+    assert cargar_spec(ruta_yaml)[0]['modelo'] == 'randomforest'
+    assert cargar_spec(ruta_json)[0]['parametros'] == {'max_depth': [3, 6]}
+
+def test_cargar_spec_modelo_no_valido(tmp_path) -> None:
+    ruta = tmp_path / 'spec.json'
+    ruta.write_text(json.dumps({'modelo': 'svm'}))
+    with pytest.raises(NonValidSpec):
+        cargar_spec(ruta)
+
+def test_cargar_spec_rechaza_n_jobs(tmp_path) -> None:
+    ruta = tmp_path / 'spec.json'
+    ruta.write_text(
+        json.dumps({'modelo': 'randomforest', 'parametros': {'n_jobs': [2]}})
+    )
+    with pytest.raises(NonValidSpec, match='n_jobs'):
+        cargar_spec(ruta)
+
+def test_generar_configuraciones_grid_y_random() -> None:
+    configuraciones = generar_configuraciones([
+        {'modelo': 'xgb', 'parametros': {'max_depth': [3, 6], 'gamma': [0, 1]}},
+        {
+            'modelo': 'randomforest',
+            'busqueda': 'random',
+            'n_iter': 3,
+            'parametros': {
+                'n_estimators': {'distribucion': 'randint', 'min': 10, 'max': 50},
+                'criterion': ['gini', 'entropy'],
+            },
+        },
+    ])
+    assert len(configuraciones) == 7
+    assert configuraciones[0] == ('xgb', {'gamma': 0, 'max_depth': 3})
+    for modelo, parametros in configuraciones[4:]:
+        assert modelo == 'randomforest'
+        assert isinstance(parametros['n_estimators'], int)
+        assert 10 <= parametros['n_estimators'] <= 50
+
+def test_generar_configuraciones_grid_con_distribucion() -> None:
+    with pytest.raises(NonValidSpec):
+        generar_configuraciones([{
+            'modelo': 'xgb',
+            'parametros': {'gamma': {'distribucion': 'uniform', 'min': 0, 'max': 1}},
+        }])
+
+def test_repartir_cpus_no_supera_cpus(mocker) -> None:
+    mocker.patch('os.cpu_count', return_value=8)
+    assert repartir_cpus(100, None) == (8, 1)
+    assert repartir_cpus(100, 2) == (2, 4)
+    assert repartir_cpus(3, None) == (3, 2)
+
+def test_ejecutar_sweep_tabla_resultados() -> None:
+    data = load_iris()
+    X = pd.DataFrame(data.data)
+    configuraciones = [
+        ('randomforest', {'n_estimators': 5, 'random_state': 0}),
+        ('randomforest', {'n_estimators': 10, 'random_state': 0}),
+        ('randomforest', {'criterion': 'no_existe'}),
+    ]
+    resultados = ejecutar_sweep(X, data.target, configuraciones, workers=2)
+    assert len(resultados) == 3
+    assert {'accuracy_media', 'fold_1', 'fold_5', 'segundos'} <= set(resultados.columns)
+    assert resultados['accuracy_media'].iloc[0] > 0.8
+    # La configuración errónea queda registrada al final
+    assert resultados['error'].notna().sum() == 1
+    assert np.isnan(resultados['accuracy_media'].iloc[-1])
+
+def test_validar_cv_igual_que_cross_val_score_y_predict():
+    """Una sola pasada da los mismos resultados que las dos llamadas de sklearn."""
+    data = load_iris()
+    X, y = data.data, data.target
+    wrapper = SerializableClassifier(DecisionTreeClassifier(random_state=0))
+    cv = StratifiedKFold(n_splits=5)
+
+    resultado = validar_cv(wrapper, X, y, n_splits=5)
+    assert np.allclose(resultado.scores, cross_val_score(wrapper, X, y, cv=cv))
+    assert np.array_equal(resultado.y_pred, cross_val_predict(wrapper, X, y, cv=cv))
+    assert resultado.tiempos_fit.shape == (5,)
+    assert resultado.tiempos_predict.shape == (5,)
+    assert resultado.modelos == []
+
+def test_validar_cv_entrena_cada_fold_una_vez(mocker):
+    data = load_iris()
+    X = pd.DataFrame(data.data)
+    fit = mocker.spy(DecisionTreeClassifier, 'fit')
+    validar_cv(DecisionTreeClassifier(), X, data.target, n_splits=3, n_jobs=1)
+    assert fit.call_count == 3
+
+def test_validar_cv_folds_en_serie_por_defecto(mocker):
+    from aidtecsolutions.models import validacion
+
+    data = load_iris()
+    parallel = mocker.spy(validacion, 'Parallel')
+    validar_cv(DecisionTreeClassifier(), data.data, data.target, n_splits=3)
+    assert parallel.call_args.kwargs['n_jobs'] is None
+
+def test_validar_cv_devuelve_modelos_ajustados():
+    data = load_iris()
+    modelo = RandomForestClassifier(n_estimators=5, random_state=0)
+    resultado = validar_cv(
+        modelo, data.data, data.target, n_splits=3, devolver_modelos=True
+    )
+    assert len(resultado.modelos) == 3
+    for modelo_fold in resultado.modelos:
+        assert modelo_fold is not modelo
+        assert modelo_fold.predict(data.data).shape == data.target.shape
+    with pytest.raises(NotFittedError):
+        modelo.predict(data.data)
+
+def test_parser_xgb_early_stopping() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'data.csv',
+        'xgb',
+        '--early_stopping_rounds', '10',
+        '--eval_metric', 'merror',
+        '--tree_method', 'hist',
+        '--nthread', '2',
+    ])
+    assert args.early_stopping_rounds == 10
+    assert args.eval_metric == 'merror'
+    assert args.tree_method == 'hist'
+    assert args.nthread == 2
+    assert args.validacion is None
+
+def test_model_name_xgb_sin_early_stopping() -> None:
+    """Las opciones nuevas no cambian el nombre si no se pasan."""
+    parser = setup_parser()
+    args = parser.parse_args(['--data', 'train.csv', 'xgb'])
+    name = generate_model_name(args)
+    assert name == (
+        'model_data=train.csv_model=xgb_gamma=0_max_depth=6_alpha=0'
+        '_learning_rate=0.1_n_estimators=100.joblib'
+    )
+
+def test_validar_cv_early_stopping_xgb():
+    data = load_iris()
+    modelo = SerializableClassifier(
+        XGBClassifier(n_estimators=300, early_stopping_rounds=5, tree_method='hist')
+    )
+    resultado = validar_cv(
+        modelo, data.data, data.target, n_splits=3, fraccion_validacion=0.2
+    )
+    assert len(resultado.mejores_iteraciones) == 3
+    assert all(0 <= it < 300 for it in resultado.mejores_iteraciones)
+    assert resultado.scores.mean() > 0.8
+
+def test_validar_cv_sin_early_stopping_no_guarda_iteraciones():
+    data = load_iris()
+    resultado = validar_cv(
+        XGBClassifier(n_estimators=5), data.data, data.target, n_splits=3
+    )
+    assert resultado.mejores_iteraciones == []
+
+def test_save_load_mmap_mismas_predicciones(tmp_path):
+    data = load_iris()
+    wrapper = SerializableClassifier(
+        RandomForestClassifier(n_estimators=10, random_state=0)
+    ).fit(data.data, data.target)
+    ruta = tmp_path / 'model.joblib'
+    wrapper.save(ruta)
+
+    cargado = SerializableClassifier.load(ruta)
+    cargado_mmap = SerializableClassifier.load(ruta, mmap_mode='r')
+    assert np.array_equal(cargado.predict(data.data), wrapper.predict(data.data))
+    assert np.array_equal(cargado_mmap.predict(data.data), wrapper.predict(data.data))
+
+def test_load_mmap_mapea_arrays(tmp_path):
+    from sklearn.preprocessing import LabelEncoder
+
+    label_encoder = SerializableTransformer(LabelEncoder())
+    label_encoder.fit(np.arange(3, 10))
+    ruta = tmp_path / 'label_encoder.joblib'
+    label_encoder.save(ruta)
+
+    cargado = SerializableTransformer.load(ruta, mmap_mode='r')
+    assert isinstance(cargado.classes_, np.memmap)
+    assert np.array_equal(cargado.inverse_transform(np.array([0, 6])), [3, 9])
+
+def test_load_mmap_baja_pico_de_memoria(tmp_path):
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(2000, 5)), rng.integers(0, 3, 2000)
+    wrapper = SerializableClassifier(
+        RandomForestClassifier(n_estimators=10, random_state=0)
+    ).fit(X, y)
+    ruta = wrapper.save(tmp_path / 'model.joblib')
+
+    picos = {}
+    for mmap_mode in (None, settings.MODEL_MMAP_MODE):
+        tracemalloc.start()
+        SerializableClassifier.load(ruta, mmap_mode=mmap_mode)
+        picos[mmap_mode] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # Sin mmap joblib lee cada array de los árboles antes de copiarlo
+    assert picos[None] > ruta.stat().st_size / 2
+    assert picos[settings.MODEL_MMAP_MODE] < picos[None] / 4
+
+def test_save_xgboost_formato_nativo(tmp_path):
+    data = load_iris(as_frame=True)
+    wrapper = SerializableClassifier(
+        XGBClassifier(n_estimators=5, max_depth=2)
+    ).fit(data.data, data.target)
+    ruta = wrapper.save(tmp_path / 'model.joblib', clases_etiquetas=['a', 'b', 'c'])
+
+    assert ruta == tmp_path / 'model.ubj'
+    assert not (tmp_path / 'model.joblib').exists()
+    with open(tmp_path / 'model.json') as f:
+        manifiesto = json.load(f)
+    assert manifiesto['clase'] == 'xgboost.sklearn.XGBClassifier'
+    assert manifiesto['parametros']['n_estimators'] == 5
+    assert manifiesto['clases'] == [0, 1, 2]
+    assert manifiesto['clases_etiquetas'] == ['a', 'b', 'c']
+    assert manifiesto['feature_names'] == list(data.data.columns)
+    assert 'xgboost' in manifiesto['versiones']
+
+    cargado = SerializableClassifier.load(ruta)
+    assert isinstance(cargado.classifier, XGBClassifier)
+    assert cargado.n_estimators == 5
+    assert list(cargado.feature_names_in_) == list(data.data.columns)
+    assert np.array_equal(cargado.predict(data.data), wrapper.predict(data.data))
+    assert np.allclose(
+        cargado.predict_proba(data.data), wrapper.predict_proba(data.data)
+    )
+
+def test_save_xgboost_rechaza_parametros_no_json(tmp_path):
+    data = load_iris()
+    wrapper = SerializableClassifier(
+        XGBClassifier(n_estimators=2, eval_metric=lambda y, p: 0.0)
+    ).fit(data.data, data.target)
+    with pytest.raises(NonValidModel, match='eval_metric'):
+        wrapper.save(tmp_path / 'model.joblib')
+    assert not (tmp_path / 'model.ubj').exists()
+
+def test_load_xgboost_valida_el_manifiesto(tmp_path):
+    data = load_iris(as_frame=True)
+    wrapper = SerializableClassifier(XGBClassifier(n_estimators=2)).fit(
+        data.data, data.target
+    )
+    ruta = wrapper.save(tmp_path / 'model.joblib')
+    ruta_manifiesto = tmp_path / 'model.json'
+    original = json.loads(ruta_manifiesto.read_text())
+
+    for cambio, error in [
+        ({'versiones': {**original['versiones'], 'xgboost': '99.0.0'}}, 'xgboost 99'),
+        ({'clases': [0, 1, 2, 3]}, 'clases'),
+        ({'feature_names': ['a', 'b', 'c', 'd']}, 'features'),
+    ]:
+        ruta_manifiesto.write_text(json.dumps({**original, **cambio}))
+        with pytest.raises(NonValidModel, match=error):
+            SerializableClassifier.load(ruta)
+
+def test_save_no_xgboost_usa_joblib(tmp_path):
+    data = load_iris()
+    wrapper = SerializableClassifier(DecisionTreeClassifier()).fit(
+        data.data, data.target
+    )
+    ruta = wrapper.save(tmp_path / 'model.joblib')
+    assert ruta == tmp_path / 'model.joblib'
+    assert not (tmp_path / 'model.json').exists()
+    assert isinstance(SerializableClassifier.load(ruta), SerializableClassifier)
+
+def test_nombres_modelos_coinciden_con_sweep():
+    # El parser usa NOMBRES_MODELOS para no importar sklearn ni xgboost
+    assert NOMBRES_MODELOS == tuple(MODELOS)
+
+def test_model_name_sin_opciones_de_ejecucion() -> None:
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', 'train.csv',
+        'xgb',
+        '--early_stopping_rounds', '10',
+        '--eval_metric', 'merror',
+        '--nthread', '2',
+        '--validacion', '0.2',
+    ])
+    name = generate_model_name(args)
+    assert 'nthread' not in name
+    assert 'eval_metric' not in name
+    assert 'validacion' not in name
+
+def test_model_name_no_supera_limite() -> None:
+    data = 'train.csv-' + '-'.join(['corregir_alcohol', 'corregir_densidad', 'shuffle'] * 12) + '.csv'
+    parser = setup_parser()
+    args = parser.parse_args([
+        '--data', data,
+        'xgb',
+        '--n_estimators', '300',
+        '--early_stopping_rounds', '10',
+        '--tree_method', 'hist',
+    ])
+    args.n_estimators = 89
+    args.early_stopping_rounds = None
+    name = generate_model_name(args)
+    otro = generate_model_name(argparse.Namespace(**{**vars(args), 'data': data + 'x'}))
+
+    assert len(name.encode('utf-8')) <= MAX_LONGITUD_NOMBRE
+    assert name.startswith('model_data=train.csv-corregir_alcohol')
+    assert 'n_estimators=89' in name
+    assert 'early_stopping_rounds' not in name
+    assert name != otro
@@ -0,0 +1,77 @@
+# Copyright 2024 Sergio Tejedor Moreno
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pandas as pd
+import pytest
+
+from aidtecsolutions.custom_exceptions import NonValidDataset, UnsupportedFileFormat
+from aidtecsolutions.utils import (
+    EscritorDataset,
+    convertir_dataset,
+    guardar_dataset,
+    is_valid_dataframe,
+    leer_dataset,
+    leer_dataset_por_chunks,
+)
+import settings
+
+
+@pytest.mark.parametrize('formato', ['.parquet', '.feather'])
+def test_convertir_dataset_conserva_tipos_e_indice(train_raw: pd.DataFrame, tmp_path, formato):
+    pytest.importorskip('pyarrow')
+    ruta = tmp_path / f'train{formato}'
+    convertir_dataset(settings.FOLDER_DATA_RAW / 'train.csv', ruta)
+    df = leer_dataset(ruta)
+
+    assert df['color'].dtype == 'category'
+    assert df['year'].dtype == 'int64'
+    assert df['acidez fija'].dtype == 'float64'
+    assert df.index.name == train_raw.index.name
+    assert (df.index == train_raw.index).all()
+    pd.testing.assert_frame_equal(df.astype({'color': 'object'}), train_raw)
+
+
+def test_guardar_y_leer_csv(train_raw: pd.DataFrame, tmp_path):
+    ruta = tmp_path / 'train.csv'
+    guardar_dataset(train_raw, ruta)
+    pd.testing.assert_frame_equal(leer_dataset(ruta), train_raw)
+
+
+def test_formato_no_soportado(train_raw: pd.DataFrame, tmp_path):
+    with pytest.raises(UnsupportedFileFormat):
+        guardar_dataset(train_raw, tmp_path / 'train.xlsx')
+    with pytest.raises(NonValidDataset):
+        is_valid_dataframe(tmp_path, 'train.xlsx')
+
+
+@pytest.mark.parametrize('formato', ['.csv', '.parquet', '.feather'])
+def test_escribir_y_leer_por_chunks(train_raw: pd.DataFrame, tmp_path, formato):
+    if formato != '.csv':
+        pytest.importorskip('pyarrow')
+    ruta = tmp_path / f'train{formato}'
+    with EscritorDataset(ruta) as escritor:
+        for inicio in range(0, len(train_raw), 2000):
+            escritor.escribir(train_raw.iloc[inicio:inicio + 2000])
+    assert escritor.filas == len(train_raw)
+
+    chunks = list(leer_dataset_por_chunks(ruta, 1000, dtype={'alcohol': 'object'}))
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks), train_raw)
+
+
+def test_is_valid_dataframe_parquet(train_raw: pd.DataFrame, tmp_path):
+    pytest.importorskip('pyarrow')
+    guardar_dataset(train_raw, tmp_path / 'train.parquet')
+    df = is_valid_dataframe(tmp_path, 'train.parquet')
+    pd.testing.assert_frame_equal(df, train_raw)